@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de arranque en frío de la app.
+
+Cada escenario se ejecuta en un intérprete nuevo (sin cachés de importación en
+memoria) y mide el tiempo hasta tener el modelo listo para predecir:
+
+    app_ligero   importar streamlit_app.py y cargar el modelo desde el artefacto ligero (.json)
+    app_pkl      lo mismo forzando la carga del .pkl (MODELO_LIGERO=0)
+    modelo       solo `src.model` + cargar_modelo(), sin Streamlit
+
+Se informa la mediana de --repeticiones ejecuciones y qué módulos pesados
+(sklearn, scipy, joblib) se llegaron a importar. Si app_ligero supera
+--presupuesto-ms el script termina con código 1, para poder usarlo en CI.
+
+Uso:
+    python benchmarks/arranque.py --repeticiones 5 --presupuesto-ms 2500 --json arranque.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+MODULOS_PESADOS = ['sklearn', 'scipy', 'joblib']
+
+_CODIGO_APP = """
+import importlib.util, json, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, '.')
+spec = importlib.util.spec_from_file_location('streamlit_app', 'streamlit_app.py')
+app = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(app)
+modelo, _ = app.cargar_modelo()
+app.cargar_puntuador()
+assert modelo is not None, 'no se pudo cargar el modelo'
+t1 = time.perf_counter()
+print(json.dumps({'interno': t1 - t0, 'modulos': [m for m in %r if m in sys.modules]}))
+"""
+
+_CODIGO_MODELO = """
+import json, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, '.')
+from src.model import cargar_modelo
+modelo, _ = cargar_modelo()
+assert modelo is not None, 'no se pudo cargar el modelo'
+t1 = time.perf_counter()
+print(json.dumps({'interno': t1 - t0, 'modulos': [m for m in %r if m in sys.modules]}))
+"""
+
+ESCENARIOS = {
+    'app_ligero': (_CODIGO_APP, {'MODELO_LIGERO': '1'}),
+    'app_pkl': (_CODIGO_APP, {'MODELO_LIGERO': '0'}),
+    'modelo': (_CODIGO_MODELO, {'MODELO_LIGERO': '1'}),
+}
+
+
+def medir(codigo, entorno_extra):
+    entorno = dict(os.environ, **entorno_extra)
+    inicio = time.perf_counter()
+    salida = subprocess.run(
+        [sys.executable, '-c', codigo % (MODULOS_PESADOS,)],
+        cwd=PROJECT_ROOT, env=entorno, capture_output=True, text=True, check=True
+    )
+    total = time.perf_counter() - inicio
+    resultado = json.loads(salida.stdout.strip().splitlines()[-1])
+    resultado['total'] = total
+    return resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--presupuesto-ms', type=float, default=None,
+                        help="Tiempo máximo (mediana, proceso completo) para app_ligero")
+    parser.add_argument('--json', help="Guardar los resultados en este archivo")
+    args = parser.parse_args(argv)
+
+    resultados = {}
+    for nombre, (codigo, entorno) in ESCENARIOS.items():
+        medidas = [medir(codigo, entorno) for _ in range(args.repeticiones)]
+        resultados[nombre] = {
+            'total_ms': statistics.median(m['total'] for m in medidas) * 1000,
+            'interno_ms': statistics.median(m['interno'] for m in medidas) * 1000,
+            'modulos_pesados': medidas[-1]['modulos'],
+        }
+        r = resultados[nombre]
+        print(f"{nombre:<11} total {r['total_ms']:8.1f} ms · imports+carga {r['interno_ms']:8.1f} ms · "
+              f"pesados: {', '.join(r['modulos_pesados']) or 'ninguno'}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, indent=2)
+
+    if args.presupuesto_ms is not None:
+        real = resultados['app_ligero']['total_ms']
+        if real > args.presupuesto_ms:
+            print(f"❌ Arranque {real:.0f} ms supera el presupuesto de {args.presupuesto_ms:.0f} ms")
+            return 1
+        print(f"✅ Arranque {real:.0f} ms dentro del presupuesto de {args.presupuesto_ms:.0f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prueba de carga del servicio de predicción (src/service.py) en localhost.
+
+Arranca el servicio en un subproceso (o usa uno ya levantado con --url) y lanza
+peticiones POST /predecir concurrentes con conexiones keep-alive durante
+--duracion segundos. Muestra peticiones por segundo y latencias p50/p95/p99.
+
+Uso:
+    python benchmarks/carga_servicio.py --procesos 4 --hilos 16 --duracion 10
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+REGISTRO = {
+    "gender": "male", "lunch": "standard", "test_preparation_course": "none",
+    "reading_score": 72, "writing_score": 74,
+    "race_ethnicity_group_E": "group B", "parental_level_of_education_high_school": "high school",
+}
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _esperar_servicio(host, port, timeout=60):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        try:
+            conexion = http.client.HTTPConnection(host, port, timeout=1)
+            conexion.request('GET', '/salud')
+            if conexion.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("El servicio no respondió a tiempo")
+
+
+def _cliente(host, port, duracion, cuerpo, latencias, errores):
+    conexion = http.client.HTTPConnection(host, port, timeout=10)
+    cabeceras = {'Content-Type': 'application/json'}
+    fin = time.perf_counter() + duracion
+    while True:
+        inicio = time.perf_counter()
+        if inicio >= fin:
+            break
+        try:
+            conexion.request('POST', '/predecir', body=cuerpo, headers=cabeceras)
+            respuesta = conexion.getresponse()
+            respuesta.read()
+            if respuesta.status != 200:
+                errores.append(respuesta.status)
+                continue
+        except (OSError, http.client.HTTPException):
+            errores.append('conexion')
+            conexion.close()
+            conexion = http.client.HTTPConnection(host, port, timeout=10)
+            continue
+        latencias.append(time.perf_counter() - inicio)
+    conexion.close()
+
+
+def _proceso_cliente(args):
+    host, port, hilos, duracion = args
+    cuerpo = json.dumps(REGISTRO).encode('utf-8')
+    latencias, errores = [], []
+    trabajadores = [
+        threading.Thread(target=_cliente, args=(host, port, duracion, cuerpo, latencias, errores))
+        for _ in range(hilos)
+    ]
+    for t in trabajadores:
+        t.start()
+    for t in trabajadores:
+        t.join()
+    return latencias, len(errores)
+
+
+def _percentil(valores, p):
+    if not valores:
+        return float('nan')
+    return valores[min(len(valores) - 1, int(len(valores) * p / 100))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help="URL de un servicio ya levantado (por defecto se arranca uno local)")
+    parser.add_argument('--procesos', type=int, default=max(1, multiprocessing.cpu_count()))
+    parser.add_argument('--hilos', type=int, default=16, help="Conexiones concurrentes por proceso")
+    parser.add_argument('--duracion', type=float, default=10.0, help="Segundos de carga")
+    args = parser.parse_args(argv)
+
+    servicio = None
+    if args.url:
+        destino = urlparse(args.url)
+        host, port = destino.hostname, destino.port or 80
+    else:
+        host, port = '127.0.0.1', _puerto_libre()
+        servicio = subprocess.Popen(
+            [sys.executable, '-m', 'src.service', '--host', host, '--port', str(port)],
+            cwd=PROJECT_ROOT, stdout=subprocess.DEVNULL
+        )
+
+    try:
+        _esperar_servicio(host, port)
+        inicio = time.perf_counter()
+        with multiprocessing.Pool(args.procesos) as pool:
+            resultados = pool.map(_proceso_cliente, [(host, port, args.hilos, args.duracion)] * args.procesos)
+        transcurrido = time.perf_counter() - inicio
+    finally:
+        if servicio is not None:
+            servicio.terminate()
+            servicio.wait()
+
+    latencias = sorted(l for lat, _ in resultados for l in lat)
+    errores = sum(e for _, e in resultados)
+    print(f"Conexiones concurrentes: {args.procesos * args.hilos}")
+    print(f"Peticiones correctas:    {len(latencias)} ({errores} errores)")
+    print(f"Peticiones por segundo:  {len(latencias) / transcurrido:,.0f}")
+    print(f"Latencia p50/p95/p99:    {_percentil(latencias, 50) * 1000:.2f} / "
+          f"{_percentil(latencias, 95) * 1000:.2f} / {_percentil(latencias, 99) * 1000:.2f} ms")
+    return 0 if errores == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
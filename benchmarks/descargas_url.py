@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Comprobaciones de la carga de CSV por URL contra un servidor HTTP local.
+
+Levanta un http.server en un hilo que sirve CSV generados con ETag (responde
+304 a If-None-Match) y con un retraso configurable por archivo, y comprueba que:
+  - cargar_datos_desde_url_por_bloques lee el cuerpo en bloques de como mucho
+    `tamano_bloque` filas, con la huella del contenido completo, y sus predicciones
+    coinciden con las de puntuar_dataframe sobre el DataFrame cargado entero
+  - cargar_datos_desde_url revalida la copia en caché en lugar de volver a descargarla
+  - cargar_datos_desde_urls descarga a la vez: el tiempo total sigue al archivo más
+    lento y no a la suma, y una URL que falla se informa sin detener al resto
+La caché de descargas se crea en un directorio temporal para no tocar la de la app.
+
+Uso:
+    python benchmarks/descargas_url.py
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+
+def generar_csv(filas, semilla=0):
+    lineas = ['gender,race/ethnicity,parental level of education,lunch,test preparation course,'
+              'reading score,writing score']
+    for i in range(filas):
+        genero = 'female' if (i + semilla) % 2 else 'male'
+        lineas.append(f'{genero},group {"ABCDE"[(i + semilla) % 5]},high school,standard,none,'
+                      f'{(i * 7 + semilla) % 101},{(i * 11 + semilla) % 101}')
+    return ('\n'.join(lineas) + '\n').encode('utf-8')
+
+
+class ServidorCSV(ThreadingHTTPServer):
+    """
+    Servidor de prueba: `archivos` es {ruta: contenido}, `retrasos` {ruta: segundos}
+    antes de responder y cada respuesta queda en `peticiones` como (ruta, estado)
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _ManejadorCSV)
+        self.archivos = {}
+        self.retrasos = {}
+        self.peticiones = []
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def registrar(self, ruta, estado):
+        with self._lock:
+            self.peticiones.append((ruta, estado))
+
+    def estados(self, ruta):
+        with self._lock:
+            return [estado for r, estado in self.peticiones if r == ruta]
+
+
+class _ManejadorCSV(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, formato, *args):
+        pass
+
+    def _responder(self, estado, contenido=b'', cabeceras=()):
+        self.server.registrar(self.path, estado)
+        self.send_response(estado)
+        for nombre, valor in cabeceras:
+            self.send_header(nombre, valor)
+        self.send_header('Content-Length', str(len(contenido)))
+        self.end_headers()
+        self.wfile.write(contenido)
+
+    def do_GET(self):
+        time.sleep(self.server.retrasos.get(self.path, 0))
+        contenido = self.server.archivos.get(self.path)
+        if contenido is None:
+            self._responder(404)
+            return
+        etag = f'"{hashlib.sha256(contenido).hexdigest()[:16]}"'
+        if self.headers.get('If-None-Match') == etag:
+            self._responder(304, cabeceras=[('ETag', etag)])
+            return
+        self._responder(200, contenido, [('Content-Type', 'text/csv'), ('ETag', etag)])
+
+
+def comprobar(condicion, mensaje):
+    if not condicion:
+        raise AssertionError(mensaje)
+    print(f"  ✅ {mensaje}")
+
+
+def comprobar_streaming(servidor, tamano_bloque=1000):
+    """
+    CSV de varios bloques leído en streaming y puntuado a medida que llega
+    """
+    import io
+
+    import numpy as np
+    import pandas as pd
+
+    from src.data import cargar_datos_desde_url_por_bloques
+    from src.model import cargar_puntuador, predecir_por_bloques, puntuar_dataframe
+
+    print("📶 Carga en streaming por bloques")
+    filas = tamano_bloque * 10 + tamano_bloque // 4
+    contenido = generar_csv(filas, semilla=7)
+    servidor.archivos['/grande.csv'] = contenido
+    puntuador = cargar_puntuador()
+
+    huella = hashlib.sha256()
+    bloques = cargar_datos_desde_url_por_bloques(f"{servidor.url}/grande.csv", tamano_bloque=tamano_bloque,
+                                                 huella=huella)
+    puntuados = list(predecir_por_bloques(bloques, puntuador))
+    tamanos = [len(bloque) for bloque in puntuados]
+    comprobar(max(tamanos) <= tamano_bloque and len(tamanos) == -(-filas // tamano_bloque),
+              f"{len(tamanos)} bloques de como mucho {tamano_bloque} filas")
+    comprobar(sum(tamanos) == filas, f"se leen las {filas:,} filas")
+    comprobar(huella.hexdigest() == hashlib.sha256(contenido).hexdigest(),
+              "la huella es el sha256 del contenido completo")
+
+    esperado = puntuar_dataframe(pd.read_csv(io.BytesIO(contenido)), puntuador)['math_score_predicted']
+    obtenido = pd.concat(puntuados)['math_score_predicted']
+    comprobar(np.array_equal(obtenido.to_numpy(), esperado.to_numpy(), equal_nan=True),
+              "las predicciones coinciden con puntuar_dataframe sobre el DataFrame completo")
+
+
+def comprobar_revalidacion(servidor):
+    """
+    Segunda carga de un CSV sin cambios: el servidor responde 304 y se usa la copia
+    local; si el CSV cambia, se descarga y se reemplaza
+    """
+    from src.data import cargar_datos_desde_url
+
+    print("🔁 Revalidación con ETag")
+    servidor.archivos['/notas.csv'] = generar_csv(500)
+    url = f"{servidor.url}/notas.csv"
+
+    primero, _ = cargar_datos_desde_url(url)
+    segundo, mensaje = cargar_datos_desde_url(url)
+    comprobar(servidor.estados('/notas.csv') == [200, 304], "la segunda carga recibe 304")
+    comprobar('caché' in mensaje, "la respuesta 304 se sirve desde la caché en disco")
+    comprobar(segundo.equals(primero) and segundo.attrs['sha256'] == primero.attrs['sha256'],
+              "los datos y el sha256 de la caché son los de la primera descarga")
+
+    servidor.archivos['/notas.csv'] = generar_csv(500, semilla=3)
+    tercero, _ = cargar_datos_desde_url(url)
+    comprobar(servidor.estados('/notas.csv')[-1] == 200, "si el CSV cambia se vuelve a descargar")
+    comprobar(not tercero.equals(primero) and tercero.attrs['sha256'] != primero.attrs['sha256'],
+              "la caché se actualiza con el contenido nuevo")
+
+
+def comprobar_concurrencia(servidor, retraso_max):
+    """
+    Varias URLs con retrasos distintos y una inexistente: el total se acerca al
+    retraso mayor y el error de una URL no impide combinar las demás
+    """
+    from src.data import COLUMNA_ORIGEN, cargar_datos_desde_urls
+
+    print("🌐 Descarga concurrente de varias URLs")
+    retrasos = [retraso_max * (i + 1) / 5 for i in range(5)]
+    urls = []
+    for i, retraso in enumerate(retrasos):
+        ruta = f'/clase{i}.csv'
+        servidor.archivos[ruta] = generar_csv(200 + i, semilla=i)
+        servidor.retrasos[ruta] = retraso
+        urls.append(f"{servidor.url}{ruta}")
+    urls.insert(2, f"{servidor.url}/no_existe.csv")
+
+    inicio = time.perf_counter()
+    df, errores, _ = cargar_datos_desde_urls(urls, usar_cache=False)
+    transcurrido = time.perf_counter() - inicio
+    print(f"  ⏱️ {transcurrido:.2f} s (archivo más lento: {max(retrasos):.2f} s, suma: {sum(retrasos):.2f} s)")
+
+    comprobar(transcurrido < max(retrasos) + 0.5 and transcurrido < 0.6 * sum(retrasos),
+              "el tiempo total sigue a la URL más lenta y no a la suma")
+    comprobar(list(errores) == [urls[2]], "solo la URL inexistente aparece en los errores")
+    validas = [u for u in urls if u != urls[2]]
+    comprobar(list(dict.fromkeys(df[COLUMNA_ORIGEN])) == validas,
+              "las filas se combinan en el orden de las URLs")
+    comprobar(len(df) == sum(200 + i for i in range(len(retrasos))), "se cargan todas las filas de las URLs válidas")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--retraso', type=float, default=1.0,
+                        help="Retraso en segundos de la URL más lenta en la prueba concurrente")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directorio:
+        # Antes de importar src.data, que crea la caché de descargas al cargarse
+        os.environ['CACHE_DATOS_DIR'] = directorio
+        servidor = ServidorCSV()
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        try:
+            comprobar_streaming(servidor)
+            comprobar_revalidacion(servidor)
+            comprobar_concurrencia(servidor, args.retraso)
+        except AssertionError as e:
+            print(f"  ❌ {e}")
+            return 1
+        finally:
+            servidor.shutdown()
+            servidor.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Comprobaciones de la exportación por bloques (src/export.py).
+
+Exporta varios DataFrames en cada formato disponible, con y sin gzip y con
+bloques pequeños para forzar varios bloques, y comprueba que al leer el
+archivo se recuperan los mismos datos. Incluye una columna object vacía en el
+primer bloque y con texto después (el esquema debe ser el del DataFrame entero)
+y un DataFrame sin filas.
+
+Uso:
+    python benchmarks/exportacion.py
+"""
+
+import argparse
+import gzip
+import io
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import numpy as np
+import pandas as pd
+
+from src.export import exportar_por_bloques, formatos_disponibles
+
+
+def casos():
+    filas = 1001
+    puntuado = pd.DataFrame({
+        'gender': np.where(np.arange(filas) % 2, 'female', 'male'),
+        'reading score': np.arange(filas) % 101,
+        'math_score_predicted': np.where(np.arange(filas) % 97 == 0, np.nan, np.arange(filas) % 101 / 1.5),
+    })
+    return {
+        'lote puntuado': puntuado,
+        'object vacía en el primer bloque': pd.DataFrame({
+            'fila': np.arange(6),
+            'comentario': pd.Series([None, None, None, 'repetir', None, 'ok'], dtype=object),
+        }),
+        'sin filas': puntuado.iloc[:0],
+    }
+
+
+def leer(datos, formato, comprimir):
+    if comprimir and formato != 'parquet':
+        datos = gzip.decompress(datos)
+    if formato == 'csv':
+        return pd.read_csv(io.BytesIO(datos))
+    import pyarrow as pa
+    if formato == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.read_table(io.BytesIO(datos)).to_pandas()
+    return pa.ipc.open_stream(io.BytesIO(datos)).read_all().to_pandas()
+
+
+def _valores(df):
+    # Mismos valores aunque el texto vuelva como str en vez de object y los nulos como NaN en vez de None
+    df = df.reset_index(drop=True).astype(object)
+    return df.where(df.notna(), None)
+
+
+def iguales(leido, original):
+    if list(leido.columns) != list(original.columns) or len(leido) != len(original):
+        return False
+    try:
+        pd.testing.assert_frame_equal(_valores(leido), _valores(original), check_dtype=False)
+        return True
+    except AssertionError:
+        return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas-por-bloque', type=int, default=2)
+    args = parser.parse_args(argv)
+
+    fallos = 0
+    for nombre, df in casos().items():
+        for formato in formatos_disponibles():
+            for comprimir in (False, True):
+                etiqueta = f"{nombre} · {formato}{' + gzip' if comprimir else ''}"
+                try:
+                    datos = b''.join(exportar_por_bloques(df, formato, comprimir, args.filas_por_bloque))
+                    correcto = iguales(leer(datos, formato, comprimir), df)
+                    detalle = "" if correcto else " (los datos leídos no coinciden)"
+                except Exception as e:
+                    correcto, detalle = False, f" ({type(e).__name__}: {e})"
+                print(f"  {'✅' if correcto else '❌'} {etiqueta}{detalle}")
+                fallos += not correcto
+    return 1 if fallos else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
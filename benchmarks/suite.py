@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Suite de benchmarks del preprocesado, la validación y la predicción.
+
+Mide la latencia por registro de cada etapa del formulario:
+    procesar_datos_desde_dataframe, validar_datos, hacer_prediccion
+y el rendimiento (filas/s) de las etapas por lotes para cada tamaño:
+    procesar_lote_desde_dataframe, validar_lote, predecir_lote
+    url_lote: el camino completo de main() para una URL (descarga desde un
+              servidor HTTP local + procesado + predicción + copia del DataFrame)
+    urls_lote: lo mismo con el lote repartido en PARTES_URL archivos descargados a la vez
+
+Los datos se generan repitiendo data/raw/StudentsPerformance.csv hasta el
+tamaño pedido. Los resultados se guardan en JSON y se comparan con una línea
+base: cualquier métrica que empeore más de --umbral (por defecto 20 %) se
+marca como regresión y el script termina con código 1. Si el archivo de
+--baseline todavía no existe, la ejecución se guarda en él como línea base (y
+termina con código 0); benchmarks/baseline.json es la de la rama principal.
+
+Uso:
+    python benchmarks/suite.py --salida resultados.json --baseline benchmarks/baseline.json
+    python benchmarks/suite.py --tamanos 1000,100000 --guardar-baseline benchmarks/baseline.json
+"""
+
+import argparse
+import contextlib
+import http.server
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from functools import partial
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import numpy as np
+import pandas as pd
+
+from src.data import (
+    cargar_datos_desde_url, cargar_datos_desde_urls, procesar_datos_desde_dataframe, procesar_lote_desde_dataframe, validar_datos,
+    validar_lote
+)
+from src.model import cargar_puntuador, hacer_prediccion, predecir_lote, puntuar_dataframe
+
+RUTA_DATOS = PROJECT_ROOT / 'data' / 'raw' / 'StudentsPerformance.csv'
+TAMANOS = [1_000, 100_000, 10_000_000]
+PARTES_URL = 8
+
+
+def generar_datos(n_filas):
+    """
+    Repetir el CSV original hasta tener n_filas (las cadenas se comparten, no se copian)
+    """
+    base = pd.read_csv(RUTA_DATOS)
+    repeticiones = -(-n_filas // len(base))
+    indices = np.tile(np.arange(len(base)), repeticiones)[:n_filas]
+    return base.iloc[indices].reset_index(drop=True)
+
+
+def medir_latencia(funcion, repeticiones=5, llamadas=200):
+    """
+    Mediana del tiempo por llamada (segundos) en `repeticiones` tandas de `llamadas`
+    """
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for _ in range(llamadas):
+            funcion()
+        tiempos.append((time.perf_counter() - inicio) / llamadas)
+    return float(np.median(tiempos))
+
+
+def medir_lote(funcion, repeticiones=3):
+    """
+    Mejor tiempo (segundos) de `repeticiones` ejecuciones
+    """
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+
+@contextlib.contextmanager
+def servidor_http_local(directorio):
+    class Manejador(http.server.SimpleHTTPRequestHandler):
+        def guess_type(self, path):
+            return 'text/csv'
+
+        def log_message(self, formato, *args):
+            pass
+
+    servidor = http.server.ThreadingHTTPServer(('127.0.0.1', 0), partial(Manejador, directory=directorio))
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    try:
+        yield f"http://127.0.0.1:{servidor.server_address[1]}"
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+
+
+def ejecutar_suite(tamanos, max_filas_url=None, repeticiones=3):
+    puntuador = cargar_puntuador()
+    if puntuador is None:
+        raise RuntimeError("No se pudo cargar el modelo")
+    resultados = {}
+
+    # Latencia por registro (camino del formulario)
+    fila = generar_datos(1)
+    datos = procesar_datos_desde_dataframe(fila)
+    datos_validados, _ = validar_datos(datos)
+    for nombre, funcion in [
+        ('registro.procesar_datos_desde_dataframe', lambda: procesar_datos_desde_dataframe(fila)),
+        ('registro.validar_datos', lambda: validar_datos(datos)),
+        ('registro.hacer_prediccion', lambda: hacer_prediccion(datos_validados, puntuador)),
+    ]:
+        segundos = medir_latencia(funcion, repeticiones=repeticiones)
+        resultados[nombre] = {'segundos': segundos}
+        print(f"{nombre:<45} {segundos * 1e6:12.1f} µs/registro")
+
+    # Rendimiento por lotes
+    with tempfile.TemporaryDirectory() as temporal, servidor_http_local(temporal) as url_base:
+        for n in tamanos:
+            df = generar_datos(n)
+            datos_lote = procesar_lote_desde_dataframe(df)
+            etapas = [
+                ('procesar_lote_desde_dataframe', lambda: procesar_lote_desde_dataframe(df)),
+                ('validar_lote', lambda: validar_lote(datos_lote)),
+                ('predecir_lote', lambda: predecir_lote(datos_lote, puntuador)),
+            ]
+            if max_filas_url is None or n <= max_filas_url:
+                df.to_csv(Path(temporal) / f"datos_{n}.csv", index=False)
+                url = f"{url_base}/datos_{n}.csv"
+                etapas.append(('url_lote', lambda: puntuar_dataframe(cargar_datos_desde_url(url, usar_cache=False)[0], puntuador)))
+                # Una URL por clase: mismas filas en PARTES_URL archivos
+                urls = []
+                for i, parte in enumerate(np.array_split(np.arange(n), PARTES_URL)):
+                    df.iloc[parte].to_csv(Path(temporal) / f"datos_{n}_{i}.csv", index=False)
+                    urls.append(f"{url_base}/datos_{n}_{i}.csv")
+                etapas.append(('urls_lote', lambda: puntuar_dataframe(cargar_datos_desde_urls(urls, usar_cache=False)[0], puntuador)))
+
+            for etapa, funcion in etapas:
+                nombre = f"lote.{etapa}.{n}"
+                segundos = medir_lote(funcion, repeticiones=repeticiones)
+                resultados[nombre] = {'segundos': segundos, 'filas': n, 'filas_por_segundo': n / segundos}
+                print(f"{nombre:<45} {n / segundos:14,.0f} filas/s ({segundos * 1000:.1f} ms)")
+            del df, datos_lote
+
+    return resultados
+
+
+def _metadatos():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'fecha': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'plataforma': platform.platform(),
+    }
+
+
+def comparar(resultados, baseline, umbral):
+    """
+    Devolver las métricas cuyo tiempo empeora más de `umbral` respecto a la línea base
+    """
+    regresiones = []
+    for nombre, actual in resultados.items():
+        anterior = baseline.get(nombre)
+        if anterior is None:
+            continue
+        cambio = actual['segundos'] / anterior['segundos'] - 1
+        if cambio > umbral:
+            regresiones.append((nombre, anterior['segundos'], actual['segundos'], cambio))
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanos', default=','.join(str(t) for t in TAMANOS),
+                        help="Tamaños de lote separados por comas (por defecto 1000,100000,10000000)")
+    parser.add_argument('--max-filas-url', type=int, default=None,
+                        help="No medir url_lote por encima de este número de filas")
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--salida', help="Guardar los resultados en este JSON")
+    parser.add_argument('--baseline', help="JSON de línea base con el que comparar (si no existe, se crea con esta ejecución)")
+    parser.add_argument('--umbral', type=float, default=0.20, help="Empeoramiento tolerado (0.20 = 20 %%)")
+    parser.add_argument('--guardar-baseline', help="Guardar estos resultados como nueva línea base")
+    args = parser.parse_args(argv)
+
+    tamanos = [int(t) for t in args.tamanos.split(',') if t]
+    informe = {'metadatos': _metadatos(), 'resultados': ejecutar_suite(tamanos, args.max_filas_url, args.repeticiones)}
+
+    # Sin línea base previa no hay con qué comparar: esta ejecución pasa a serlo
+    registrar = args.baseline and not Path(args.baseline).exists()
+    for ruta in (args.salida, args.guardar_baseline, args.baseline if registrar else None):
+        if ruta:
+            with open(ruta, 'w', encoding='utf-8') as f:
+                json.dump(informe, f, indent=2)
+
+    if registrar:
+        print(f"\n📌 No existía {args.baseline}: se guarda esta ejecución como línea base")
+    elif args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['resultados']
+        nuevas = sorted(set(informe['resultados']) - set(baseline))
+        if nuevas:
+            print(f"\nℹ️ Métricas sin línea base (no se comparan): {', '.join(nuevas)}")
+        regresiones = comparar(informe['resultados'], baseline, args.umbral)
+        if regresiones:
+            print(f"\n❌ {len(regresiones)} regresión(es) por encima del {args.umbral:.0%}:")
+            for nombre, antes, ahora, cambio in regresiones:
+                print(f"  {nombre}: {antes * 1000:.3f} ms -> {ahora * 1000:.3f} ms (+{cambio:.0%})")
+            return 1
+        print(f"\n✅ Sin regresiones respecto a {args.baseline} (umbral {args.umbral:.0%})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
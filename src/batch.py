@@ -0,0 +1,250 @@
+"""
+Puntuación por lotes de archivos CSV grandes desde la línea de comandos.
+
+Cada archivo se divide en fragmentos (rangos de bytes alineados a fin de línea)
+que se reparten entre un pool de procesos. Cada proceso carga el modelo una vez,
+resuelve las columnas con la misma tabla de alias que procesar_datos_desde_dataframe
+y escribe su fragmento con la columna math_score_predicted. Los fragmentos
+terminados se guardan en disco, así que una ejecución interrumpida se puede
+reanudar con --reanudar sin repetir el trabajo hecho.
+
+Se asume un CSV sin saltos de línea dentro de campos entre comillas (como
+StudentsPerformance.csv).
+
+Uso:
+    python -m src.batch datos/ otro.csv --salida resultados/ --procesos 8
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+# Asegurar que la raíz del proyecto esté en el sys.path para importar `src`
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import pandas as pd
+
+from src.data import procesar_lote_desde_dataframe
+from src.model import cargar_modelo, compilar_modelo, predecir_lote_validado
+
+COLUMNA_PREDICCION = 'math_score_predicted'
+# Subdirectorio de la salida con los fragmentos terminados de cada archivo
+DIR_PARTES = '.partes'
+
+# Modelo cargado una vez por proceso trabajador
+_modelo_trabajador = None
+
+
+def _excluido(ruta, relativa, excluir):
+    # Los fragmentos en curso (.partes) y lo que está bajo `excluir` no son entradas
+    if DIR_PARTES in relativa.parts:
+        return True
+    ruta = ruta.resolve()
+    return any(ruta.is_relative_to(directorio) for directorio in excluir)
+
+
+def listar_csv(rutas, excluir=()):
+    """
+    Expandir archivos y directorios a la lista de CSV a puntuar.
+    Devuelve pares (ruta, ruta relativa): la relativa es la del CSV dentro del
+    directorio indicado, o solo su nombre si se indicó el archivo. Al recorrer
+    directorios se omiten los de `excluir` (p. ej. el de salida, si está dentro
+    de una entrada) y los directorios de fragmentos .partes.
+    """
+    excluir = [Path(directorio).resolve() for directorio in excluir]
+    archivos = []
+    for ruta in rutas:
+        ruta = Path(ruta)
+        if ruta.is_dir():
+            archivos.extend(
+                (p, p.relative_to(ruta)) for p in sorted(ruta.rglob('*.csv'))
+                if p.is_file() and not _excluido(p, p.relative_to(ruta), excluir)
+            )
+        elif ruta.is_file():
+            archivos.append((ruta, Path(ruta.name)))
+        else:
+            raise ValueError(f"No existe el archivo o directorio: {ruta}")
+    return archivos
+
+
+def planificar_fragmentos(ruta, tamano_fragmento):
+    """
+    Dividir un CSV en rangos de bytes [inicio, fin) que empiezan y terminan en un salto de línea
+    """
+    tamano = os.path.getsize(ruta)
+    with open(ruta, 'rb') as f:
+        cabecera = f.readline()
+        inicio = len(cabecera)
+        fragmentos = []
+        while inicio < tamano:
+            f.seek(min(inicio + tamano_fragmento, tamano))
+            f.readline()  # avanzar hasta el final de la línea en curso
+            fin = min(f.tell(), tamano)
+            fragmentos.append((inicio, fin))
+            inicio = fin
+    return cabecera.decode('utf-8'), fragmentos
+
+
+def _inicializar_trabajador():
+    global _modelo_trabajador
+    modelo, _ = cargar_modelo()
+    if modelo is None:
+        raise RuntimeError("No se pudo cargar el modelo")
+    _modelo_trabajador = compilar_modelo(modelo)
+
+
+def _puntuar_fragmento(ruta, cabecera, inicio, fin, ruta_salida, con_cabecera):
+    with open(ruta, 'rb') as f:
+        f.seek(inicio)
+        contenido = f.read(fin - inicio)
+
+    df = pd.read_csv(io.BytesIO(cabecera.encode('utf-8') + contenido))
+    # Las filas que no superan la validación quedan sin predicción
+    predicciones, validacion = predecir_lote_validado(procesar_lote_desde_dataframe(df), _modelo_trabajador)
+    df[COLUMNA_PREDICCION] = predicciones
+
+    # Escritura atómica: solo existe el archivo final si el fragmento terminó
+    temporal = f"{ruta_salida}.tmp"
+    df.to_csv(temporal, index=False, header=con_cabecera)
+    os.replace(temporal, ruta_salida)
+    return len(df), len(validacion['filas_invalidas'])
+
+
+def _firma_archivo(ruta, tamano_fragmento):
+    estado = os.stat(ruta)
+    return f"{Path(ruta).resolve()}:{estado.st_size}:{estado.st_mtime_ns}:{tamano_fragmento}"
+
+
+def ruta_salida(directorio_salida, relativa):
+    """
+    'notas/a.csv' -> <salida>/notas/a_predicciones.csv (se conservan los subdirectorios)
+    """
+    return Path(directorio_salida) / relativa.parent / f"{relativa.stem}_predicciones.csv"
+
+
+def _preparar_trabajo(ruta, relativa, directorio_salida, tamano_fragmento, reanudar):
+    firma = _firma_archivo(ruta, tamano_fragmento)
+    directorio_partes = directorio_salida / DIR_PARTES / hashlib.sha1(firma.encode('utf-8')).hexdigest()[:16]
+    ruta_plan = directorio_partes / 'plan.json'
+
+    if reanudar and ruta_plan.exists():
+        with open(ruta_plan, 'r', encoding='utf-8') as f:
+            plan = json.load(f)
+    else:
+        shutil.rmtree(directorio_partes, ignore_errors=True)
+        directorio_partes.mkdir(parents=True)
+        cabecera, fragmentos = planificar_fragmentos(ruta, tamano_fragmento)
+        plan = {'firma': firma, 'cabecera': cabecera, 'fragmentos': fragmentos}
+        with open(ruta_plan, 'w', encoding='utf-8') as f:
+            json.dump(plan, f)
+
+    return {
+        'ruta': str(ruta),
+        'salida': ruta_salida(directorio_salida, relativa),
+        'partes': directorio_partes,
+        'cabecera': plan['cabecera'],
+        'fragmentos': [tuple(x) for x in plan['fragmentos']],
+    }
+
+
+def _unir_partes(trabajo):
+    trabajo['salida'].parent.mkdir(parents=True, exist_ok=True)
+    temporal = f"{trabajo['salida']}.tmp"
+    if trabajo['fragmentos']:
+        with open(temporal, 'wb') as destino:
+            for i in range(len(trabajo['fragmentos'])):
+                with open(trabajo['partes'] / f"{i:06d}.csv", 'rb') as origen:
+                    shutil.copyfileobj(origen, destino, 1024 * 1024)
+    else:
+        # CSV con solo la cabecera: la salida también la lleva, con la columna de predicción
+        df = pd.read_csv(io.StringIO(trabajo['cabecera']))
+        df[COLUMNA_PREDICCION] = pd.Series(dtype='float64')
+        df.to_csv(temporal, index=False)
+    os.replace(temporal, trabajo['salida'])
+    shutil.rmtree(trabajo['partes'], ignore_errors=True)
+
+
+def puntuar_archivos(rutas, directorio_salida, procesos=None, tamano_fragmento=32 * 1024 * 1024,
+                     reanudar=False, informar=print):
+    """
+    Puntuar todos los CSV de `rutas` con un pool de procesos.
+    Devuelve (filas puntuadas en esta ejecución, segundos transcurridos).
+    """
+    directorio_salida = Path(directorio_salida)
+    directorio_salida.mkdir(parents=True, exist_ok=True)
+    # Si la salida está dentro de una entrada, sus resultados no se vuelven a puntuar
+    archivos = listar_csv(rutas, excluir=[directorio_salida])
+
+    # Dos entradas con la misma ruta de salida se pisarían: se rechazan antes de empezar
+    origenes = {}
+    for ruta, relativa in archivos:
+        salida = ruta_salida(directorio_salida, relativa)
+        if salida in origenes:
+            raise ValueError(f"{origenes[salida]} y {ruta} escribirían el mismo archivo de salida: {salida}")
+        origenes[salida] = ruta
+
+    trabajos = [_preparar_trabajo(r, rel, directorio_salida, tamano_fragmento, reanudar) for r, rel in archivos]
+
+    pendientes = []
+    for trabajo in trabajos:
+        for i, (inicio, fin) in enumerate(trabajo['fragmentos']):
+            ruta_parte = trabajo['partes'] / f"{i:06d}.csv"
+            if not ruta_parte.exists():
+                pendientes.append((trabajo, i, inicio, fin, ruta_parte))
+    total_fragmentos = sum(len(t['fragmentos']) for t in trabajos)
+    informar(f"📂 {len(archivos)} archivo(s), {total_fragmentos} fragmento(s), "
+             f"{total_fragmentos - len(pendientes)} ya terminados")
+
+    filas = 0
+    invalidas = 0
+    inicio_reloj = time.perf_counter()
+    if pendientes:
+        with ProcessPoolExecutor(max_workers=procesos, initializer=_inicializar_trabajador) as pool:
+            futuros = [
+                pool.submit(_puntuar_fragmento, t['ruta'], t['cabecera'], inicio, fin, str(parte), i == 0)
+                for t, i, inicio, fin, parte in pendientes
+            ]
+            for hechos, futuro in enumerate(as_completed(futuros), 1):
+                filas_fragmento, invalidas_fragmento = futuro.result()
+                filas += filas_fragmento
+                invalidas += invalidas_fragmento
+                transcurrido = time.perf_counter() - inicio_reloj
+                informar(f"  {hechos}/{len(futuros)} fragmentos · {filas:,} filas · "
+                         f"{filas / max(transcurrido, 1e-9):,.0f} filas/s")
+
+    if invalidas:
+        informar(f"⚠️ {invalidas:,} filas no superaron la validación y quedaron sin predicción")
+    for trabajo in trabajos:
+        _unir_partes(trabajo)
+        informar(f"✅ {trabajo['salida']}")
+
+    return filas, time.perf_counter() - inicio_reloj
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Puntuar archivos CSV con el modelo lin_reg_model_opt")
+    parser.add_argument('entradas', nargs='+', help="Archivos CSV o directorios con CSV")
+    parser.add_argument('--salida', required=True, help="Directorio donde escribir los CSV con predicciones")
+    parser.add_argument('--procesos', type=int, default=None, help="Procesos trabajadores (por defecto, uno por núcleo)")
+    parser.add_argument('--tamano-fragmento-mb', type=float, default=32, help="Tamaño de cada fragmento en MB")
+    parser.add_argument('--reanudar', action='store_true', help="Reutilizar los fragmentos ya terminados")
+    args = parser.parse_args(argv)
+
+    filas, segundos = puntuar_archivos(
+        args.entradas, args.salida, procesos=args.procesos,
+        tamano_fragmento=int(args.tamano_fragmento_mb * 1024 * 1024), reanudar=args.reanudar
+    )
+    print(f"🎯 {filas:,} filas puntuadas en {segundos:.2f} s ({filas / max(segundos, 1e-9):,.0f} filas/s)")
+
+
+if __name__ == '__main__':
+    main()
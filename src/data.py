@@ -1,9 +1,213 @@
 # Funciones para cargar y procesar datos
 
 # Validar los datos introducidos CSV o formulario
+import functools
+import hashlib
+import os
+import threading
+from io import BytesIO
+
+import numpy as np
 import pandas as pd
 
+from src.features import (
+    BINARIAS, COLUMNAS_CATEGORICAS, MULTICLASE, PUNTUACIONES, cargar_pipeline, codificar_categoricas,
+    mapear_valor_categorico, normalizar_nombre_columna
+)
+from src.metrics import contar, medir
+from src.utils import CacheDisco, CacheMemoria, logger, sha256_archivo
+
+
+# Reglas de cada variable del modelo (en el orden de VARIABLES_ORDEN): (mínimo, máximo, solo 0/1)
+REGLAS_VARIABLES = {
+    'gender': (0, 1, True),
+    'lunch': (0, 1, True),
+    'test_preparation_course': (0, 1, True),
+    'reading_score': (0, 100, False),
+    'writing_score': (0, 100, False),
+    'race_ethnicity_group_E': (0, 1, True),
+    'parental_level_of_education_high_school': (0, 1, True),
+}
+
+# Códigos de error por celda; el de una fila es el OR de los de sus celdas (0 = válida)
+ERROR_NULO = 1
+ERROR_TIPO = 2
+ERROR_RANGO = 4
+ERROR_BINARIA = 8
+DESCRIPCION_ERRORES = {
+    ERROR_NULO: "valor vacío o no reconocido",
+    ERROR_TIPO: "no es numérico",
+    ERROR_RANGO: "fuera de rango",
+    ERROR_BINARIA: "debe ser 0 o 1",
+}
+MAX_FILAS_INFORME = 1000
+
+
+def _codigo_error_valor(valor, regla):
+    # Código de error de un único valor (camino del formulario)
+    minimo, maximo, binaria = regla
+    if valor is None:
+        return ERROR_NULO
+    try:
+        valor = float(valor)
+    except (TypeError, ValueError):
+        return ERROR_TIPO
+    if np.isnan(valor):
+        return ERROR_NULO
+    if binaria:
+        return 0 if valor in (0.0, 1.0) else ERROR_BINARIA
+    return 0 if minimo <= valor <= maximo else ERROR_RANGO
+
+
+def comprobar_registro(datos):
+    """
+    Aplicar a un único registro (formulario, servicio HTTP) las mismas reglas que a
+    los lotes; lanza ValueError con la variable y la descripción del error
+    """
+    for var, regla in REGLAS_VARIABLES.items():
+        if var not in datos:
+            raise ValueError(f"Variable faltante: {var}")
+        codigo = _codigo_error_valor(datos[var], regla)
+        if codigo:
+            raise ValueError(f"{var}: {DESCRIPCION_ERRORES[codigo]} ({datos[var]!r})")
+
+
+class EsquemaCompilado:
+    """
+    Reglas de validación compiladas a arrays para comprobar un lote entero con
+    máscaras de NumPy, columna a columna y sin bucles por fila. Las columnas
+    numéricas se comprueban en su tipo original (sin copiarlas) y los códigos por
+    celda solo se calculan para las filas que no son válidas.
+    """
+
+    def __init__(self, reglas):
+        self.columnas = list(reglas)
+        self.minimos = np.array([reglas[c][0] for c in self.columnas], dtype=np.float64)
+        self.maximos = np.array([reglas[c][1] for c in self.columnas], dtype=np.float64)
+        self.binarias = np.array([reglas[c][2] for c in self.columnas], dtype=bool)
+
+    @staticmethod
+    def _valores(serie):
+        # (array numérico de la columna, máscara de valores no numéricos o None)
+        if pd.api.types.is_numeric_dtype(serie):
+            if isinstance(serie.dtype, np.dtype):
+                return serie.to_numpy(), None
+            # Tipos con pd.NA (Int64, Float64, boolean)
+            return serie.to_numpy(dtype=np.float64, na_value=np.nan), None
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            serie = serie.astype(object)
+        valores = pd.to_numeric(serie, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        return valores, np.isnan(valores) & serie.notna().to_numpy()
+
+    def _codigos(self, valores, tipo, j):
+        # Código de error de cada valor de la columna j (solo se usa con las celdas no válidas)
+        codigos = np.full(len(valores), ERROR_BINARIA if self.binarias[j] else ERROR_RANGO, dtype=np.uint8)
+        if valores.dtype.kind == 'f':
+            codigos[np.isnan(valores)] = ERROR_NULO
+        if tipo is not None:
+            codigos[tipo] = ERROR_TIPO
+        return codigos
+
+    def validar(self, df):
+        """
+        Validar todas las filas de `df` (columnas con los nombres del modelo). Devuelve un dict:
+            validos: máscara booleana por fila
+            codigos: uint8 por fila (OR de los ERROR_* de sus celdas, 0 = válida)
+            filas_invalidas: posiciones de las filas no válidas
+            celdas_invalidas: códigos por celda de esas filas (n_invalidas x n_variables)
+            valores: array numérico de cada variable (para predecir sin volver a convertir)
+        """
+        faltantes = [c for c in self.columnas if c not in df.columns]
+        if faltantes:
+            raise ValueError(f"Variables faltantes: {faltantes}")
+
+        n = len(df)
+        codigos = np.zeros(n, dtype=np.uint8)
+        valores_columnas = []
+        errores_columnas = []
+        for j, columna in enumerate(self.columnas):
+            valores, tipo = self._valores(df[columna])
+            valores_columnas.append(valores)
+            # Las comparaciones con NaN son falsas: los nulos y no numéricos salen como no válidos
+            if self.binarias[j]:
+                correctos = (valores == 0) | (valores == 1)
+            else:
+                correctos = (valores >= self.minimos[j]) & (valores <= self.maximos[j])
+            if not correctos.all():
+                posiciones = np.flatnonzero(~correctos)
+                codigos_columna = self._codigos(valores[posiciones], None if tipo is None else tipo[posiciones], j)
+                codigos[posiciones] |= codigos_columna
+                errores_columnas.append((j, posiciones, codigos_columna))
+
+        filas_invalidas = np.flatnonzero(codigos)
+        celdas = np.zeros((len(filas_invalidas), len(self.columnas)), dtype=np.uint8)
+        for j, posiciones, codigos_columna in errores_columnas:
+            celdas[np.searchsorted(filas_invalidas, posiciones), j] = codigos_columna
+        return {
+            'columnas': self.columnas,
+            'validos': codigos == 0,
+            'codigos': codigos,
+            'filas_invalidas': filas_invalidas,
+            'celdas_invalidas': celdas,
+            'valores': valores_columnas,
+        }
+
+
+ESQUEMA_VARIABLES = EsquemaCompilado(REGLAS_VARIABLES)
+
+
+def validar_lote(datos_lote):
+    """
+    Validar un lote ya codificado (ver procesar_lote_desde_dataframe) con ESQUEMA_VARIABLES
+    """
+    with medir('validacion_lote'):
+        validacion = ESQUEMA_VARIABLES.validar(datos_lote)
+    contar('filas_invalidas', len(validacion['filas_invalidas']))
+    return validacion
+
+
+def matriz_validada(validacion, dtype=np.float64, rellenar=False):
+    """
+    Matriz (filas x variables) de las filas válidas; con `rellenar` se incluyen
+    todas las filas y las no válidas quedan con NaN
+    """
+    valores = validacion['valores']
+    # Orden Fortran: cada columna se copia a memoria contigua
+    matriz = np.empty((len(validacion['validos']), len(valores)), dtype=dtype, order='F')
+    for j, columna in enumerate(valores):
+        matriz[:, j] = columna
+    if len(validacion['filas_invalidas']) == 0:
+        return matriz
+    if rellenar:
+        matriz[validacion['filas_invalidas']] = np.nan
+        return matriz
+    return matriz[validacion['validos']]
+
+
+def describir_errores(validacion, indice=None, max_filas=MAX_FILAS_INFORME):
+    """
+    DataFrame con las primeras `max_filas` filas no válidas: fila (etiqueta de `indice`
+    o posición), código y descripción de cada variable con error
+    """
+    filas = validacion['filas_invalidas'][:max_filas]
+    detalles = [
+        "; ".join(f"{columna}: {DESCRIPCION_ERRORES[codigo]}"
+                  for columna, codigo in zip(validacion['columnas'], celdas) if codigo)
+        for celdas in validacion['celdas_invalidas'][:max_filas]
+    ]
+    return pd.DataFrame({
+        'fila': filas if indice is None else np.asarray(indice)[filas],
+        'codigo': validacion['codigos'][filas],
+        'errores': detalles,
+    })
+
+
 def validar_datos(datos):
+    with medir('validacion'):
+        return _validar_datos(datos)
+
+
+def _validar_datos(datos):
     try:
         # Variables requeridas del formulario (en el orden correcto del modelo)
         variables_requeridas = [
@@ -17,10 +221,9 @@ def validar_datos(datos):
             if var not in datos:
                 raise ValueError(f"Variable faltante: {var}")
         
-        # Validar y convertir las variables a float
+        # Validar cada variable con las mismas reglas que los lotes
+        comprobar_registro(datos)
         resultado = datos.copy()
-        for var in variables_requeridas:
-            resultado[var] = datos[var]
         
         # Agregar información sobre las variables validadas
         resultado['_variables_validadas'] = variables_requeridas
@@ -34,32 +237,103 @@ def validar_datos(datos):
     except Exception as e:
         raise ValueError(f"Error al validar datos: {str(e)}")
 
-def cargar_datos_desde_url(url):
+def _validar_url_csv(url):
+    # Validar que la URL no esté vacía
+    if not url or not url.strip():
+        raise ValueError("La URL no puede estar vacía")
+    
+    # Validar que la URL termine en .csv
+    if not url.lower().endswith('.csv'):
+        raise ValueError("Solo se permiten archivos CSV. La URL debe terminar en .csv")
+
+
+def _verificar_content_type(response):
+    # Verificar que el content-type sea CSV
+    content_type = response.headers.get('content-type', '').lower()
+    if 'csv' not in content_type and 'text/plain' not in content_type:
+        raise ValueError(f"El archivo no parece ser un CSV válido. Content-Type: {content_type}")
+
+
+# Caché en disco de los CSV descargados (clave: URL)
+CACHE_URL = CacheDisco(
+    os.environ.get('CACHE_DATOS_DIR', '.cache/datos_url'),
+    tamano_maximo=int(os.environ.get('CACHE_DATOS_MAX_MB', '512')) * 1024 * 1024
+)
+
+# Lotes ya puntuados en memoria (clave: URL, sha256 del contenido y versión del modelo).
+# Se comparten entre sesiones y reruns de Streamlit; al superar el tamaño se expulsan los menos usados.
+CACHE_LOTES = CacheMemoria(int(os.environ.get('CACHE_LOTES_MAX_MB', '256')) * 1024 * 1024)
+
+_sesion = None
+_sesion_lock = threading.Lock()
+
+
+def obtener_sesion():
+    """
+    Sesión HTTP compartida, con pool de conexiones reutilizables
+    """
+    global _sesion
+    if _sesion is None:
+        with _sesion_lock:
+            if _sesion is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                sesion = requests.Session()
+                adaptador = HTTPAdapter(pool_connections=16, pool_maxsize=32)
+                sesion.mount('http://', adaptador)
+                sesion.mount('https://', adaptador)
+                _sesion = sesion
+    return _sesion
+
+
+def cargar_datos_desde_url(url, usar_cache=True, timeout=30):
     """
-    Cargar datos desde una URL (solo archivos CSV)
+    Cargar datos desde una URL (solo archivos CSV).
+    `timeout` son los segundos de espera de conexión y de lectura de la petición.
+    Con `usar_cache` la respuesta se guarda en disco y en las siguientes cargas se
+    revalida con ETag/Last-Modified: si el archivo no cambió (304) se usa la copia local.
+    El sha256 del contenido queda en df.attrs['sha256'].
     """
+    import requests
     try:
-        # Validar que la URL no esté vacía
-        if not url or not url.strip():
-            raise ValueError("La URL no puede estar vacía")
+        _validar_url_csv(url)
         
-        # Validar que la URL termine en .csv
-        if not url.lower().endswith('.csv'):
-            raise ValueError("Solo se permiten archivos CSV. La URL debe terminar en .csv")
+        sesion = obtener_sesion()
+        meta = CACHE_URL.leer_meta(url) if usar_cache else None
+        cabeceras = {}
+        if meta and meta.get('sha256'):
+            if meta.get('etag'):
+                cabeceras['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                cabeceras['If-Modified-Since'] = meta['last_modified']
         
         # Hacer petición HTTP
-        import requests
-        response = requests.get(url, timeout=30)
+        with medir('descarga'):
+            response = sesion.get(url, timeout=timeout, headers=cabeceras)
+        if response.status_code == 304:
+            df = CACHE_URL.leer(url)
+            if df is not None:
+                df.attrs['sha256'] = meta['sha256']
+                return df, f"Datos CSV cargados desde caché (sin cambios en origen): {url}"
+            # La copia local desapareció: descargar de nuevo sin condiciones
+            with medir('descarga'):
+                response = sesion.get(url, timeout=timeout)
         response.raise_for_status()  # Lanza excepción si hay error HTTP
         
-        # Verificar que el content-type sea CSV
-        content_type = response.headers.get('content-type', '').lower()
-        if 'csv' not in content_type and 'text/plain' not in content_type:
-            raise ValueError(f"El archivo no parece ser un CSV válido. Content-Type: {content_type}")
+        _verificar_content_type(response)
         
         # Cargar como CSV
         from io import StringIO
-        df = pd.read_csv(StringIO(response.text))
+        with medir('parseo'):
+            df = pd.read_csv(StringIO(response.text))
+        contar('filas_cargadas', len(df))
+        sha256 = hashlib.sha256(response.content).hexdigest()
+        df.attrs['sha256'] = sha256
+        
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if usar_cache and (etag or last_modified):
+            CACHE_URL.guardar(url, df, {'etag': etag, 'last_modified': last_modified, 'sha256': sha256})
         
         return df, f"Datos CSV cargados desde: {url}"
         
@@ -72,61 +346,357 @@ def cargar_datos_desde_url(url):
     except Exception as e:
         raise ValueError(f"Error inesperado al cargar datos: {str(e)}")
 
-def procesar_datos_desde_dataframe(df):
+
+# Columna con la URL de procedencia de cada fila al combinar varios CSV
+COLUMNA_ORIGEN = 'url_origen'
+MAX_DESCARGAS_SIMULTANEAS = int(os.environ.get('MAX_DESCARGAS_SIMULTANEAS', '8'))
+
+
+def cargar_datos_desde_urls(urls, usar_cache=True, timeout=30, max_hilos=MAX_DESCARGAS_SIMULTANEAS,
+                            al_completar=None):
     """
-    Procesar un DataFrame para extraer los datos necesarios para el modelo
+    Cargar varios CSV a la vez con un pool de hilos acotado y combinarlos en un DataFrame.
+    Cada fila lleva su URL en COLUMNA_ORIGEN y las filas conservan el orden de `urls`.
+    `al_completar(url, completadas, total, error)` se llama desde el hilo que invoca esta
+    función (útil para mostrar progreso en Streamlit) cada vez que termina una descarga.
+    Las URLs que fallan no detienen al resto: devuelve (df, errores {url: mensaje}, mensaje)
+    y solo lanza ValueError si no se pudo cargar ninguna.
     """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    # Sin duplicados y en el orden dado
+    urls = list(dict.fromkeys(u.strip() for u in urls if u and u.strip()))
+    if not urls:
+        raise ValueError("La lista de URLs no puede estar vacía")
+    if max_hilos <= 0:
+        raise ValueError("El número de hilos debe ser mayor que 0")
+
+    resultados = {}
+    errores = {}
+    with ThreadPoolExecutor(max_workers=min(max_hilos, len(urls))) as pool:
+        futuros = {pool.submit(cargar_datos_desde_url, url, usar_cache, timeout): url for url in urls}
+        for completadas, futuro in enumerate(as_completed(futuros), 1):
+            url = futuros[futuro]
+            try:
+                resultados[url] = futuro.result()[0]
+            except ValueError as e:
+                errores[url] = str(e)
+            if al_completar is not None:
+                al_completar(url, completadas, len(urls), errores.get(url))
+
+    if not resultados:
+        raise ValueError("No se pudo cargar ninguna URL: " + "; ".join(f"{u}: {m}" for u, m in errores.items()))
+
+    partes = []
+    huella = hashlib.sha256()
+    for url in urls:
+        if url in resultados:
+            df = resultados[url]
+            partes.append(df.assign(**{COLUMNA_ORIGEN: url}))
+            huella.update(f"{url}\n{df.attrs.get('sha256')}\n".encode('utf-8'))
+    df = pd.concat(partes, ignore_index=True)
+    # Identifica el contenido combinado (clave de CACHE_LOTES)
+    df.attrs['sha256'] = huella.hexdigest()
+    return df, errores, f"Datos CSV cargados desde {len(resultados)} de {len(urls)} URLs"
+
+
+class _LectorConHuella:
+    # Envuelve el cuerpo HTTP y va actualizando un hash con los bytes leídos
+    def __init__(self, crudo, huella):
+        self.crudo = crudo
+        self.huella = huella
+
+    def read(self, n=-1):
+        datos = self.crudo.read(n)
+        self.huella.update(datos)
+        return datos
+
+
+def cargar_datos_desde_url_por_bloques(url, tamano_bloque=50_000, huella=None):
+    """
+    Cargar un CSV desde una URL en modo streaming.
+    El cuerpo HTTP se lee de forma incremental y se parsea en bloques de
+    `tamano_bloque` filas, que se van devolviendo a medida que llegan, así que
+    la memoria queda acotada por el tamaño del bloque y no por el del archivo.
+    Si se pasa `huella` (p. ej. hashlib.sha256()), se actualiza con el contenido.
+    """
+    import requests
+    if tamano_bloque <= 0:
+        raise ValueError("El tamaño de bloque debe ser mayor que 0")
     try:
-        # Mapear nombres de columnas comunes
-        column_mapping = {
-            'reading_score': ['reading score','reading_score', 'reading', 'read_score', 'lectura'],
-            'writing_score': ['writing score','writing_score', 'writing', 'write_score', 'escritura'],
-            'gender': ['gender', 'sex', 'genero', 'género'],
-            'lunch': ['lunch', 'almuerzo', 'lunch_type'],
-            'test_preparation_course': ['test preparation course','test_preparation_course', 'preparation', 'curso_preparacion'],
-            'race_ethnicity_group_E': ['race_ethnicity_group_E', 'race', 'ethnicity', "race/ethnicity"],
-            'parental_level_of_education_high_school': ['parental_level_of_education_high_school', 'parental_level_of_education', 'parental level of education', 'parent_education', 'educacion_padres']
-        }
+        _validar_url_csv(url)
         
-        # Buscar columnas que coincidan
-        datos_extraidos = {}
-        for key, posibles_nombres in column_mapping.items():
-            columna_encontrada = None
-            for nombre in posibles_nombres:
-                if nombre in df.columns:
-                    columna_encontrada = nombre
-                    break
+        with medir('descarga'):
+            response = obtener_sesion().get(url, stream=True, timeout=30)
+        with response:
+            response.raise_for_status()
+            _verificar_content_type(response)
             
-            if columna_encontrada is not None:
-                # Tomar el primer valor del DataFrame
-                valor = df[columna_encontrada].iloc[0]
-                
-                # Convertir valores categóricos a numéricos si es necesario
-                if key in ['gender', 'lunch', 'test_preparation_course', 'race_ethnicity_group_E', 'parental_level_of_education_high_school']:
-                    if isinstance(valor, str):
-                        # Mapear valores de texto a números
-                        if key == 'gender':
-                            valor = 1 if valor.lower() in ['male', 'masculino', 'm'] else 0
-                        elif key == 'lunch':
-                            valor = 1 if valor.lower() in ['standard', 'estándar', 'estandar'] else 0
-                        elif key == 'test_preparation_course':
-                            valor = 1 if valor.lower() in ['completed', 'completado', 'yes', 'sí', 'si'] else 0
-                        elif key == 'race_ethnicity_group_E':
-                            valor = 1.0 if valor.lower() in ['group e', 'group E', 'grupo e', 'grupo E', 'e', 'yes', 'sí', 'si'] else 0.0
-                        elif key == 'parental_level_of_education_high_school':
-                            valor = 1.0 if valor.lower() in ['high school', 'secundaria', 'high_school'] else 0.0
-                
-                datos_extraidos[key] = valor
+            # Descomprimir gzip/deflate al vuelo si el servidor lo usa
+            response.raw.decode_content = True
+            cuerpo = response.raw if huella is None else _LectorConHuella(response.raw, huella)
+            with pd.read_csv(cuerpo, chunksize=tamano_bloque) as lector:
+                iterador = iter(lector)
+                while True:
+                    # En streaming el parseo de cada bloque incluye la lectura de su parte del cuerpo
+                    with medir('parseo'):
+                        bloque = next(iterador, None)
+                    if bloque is None:
+                        break
+                    contar('filas_cargadas', len(bloque))
+                    yield bloque
+        
+    except requests.exceptions.RequestException as e:
+        raise ValueError(f"Error al acceder a la URL: {str(e)}")
+    except pd.errors.EmptyDataError:
+        raise ValueError("El archivo CSV está vacío o no contiene datos válidos")
+    except pd.errors.ParserError as e:
+        raise ValueError(f"Error al parsear el archivo CSV: {str(e)}")
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Error inesperado al cargar datos: {str(e)}")
+
+# Archivos locales admitidos (extensión -> formato)
+EXTENSIONES_ARCHIVO = {'.csv': 'csv', '.gz': 'csv_gzip', '.parquet': 'parquet', '.pq': 'parquet'}
+DIR_SUBIDAS = os.environ.get('SUBIDAS_DIR', '.cache/subidas')
+# Los flujos sin búfer en memoria se vuelcan a disco por encima de este tamaño
+UMBRAL_VOLCADO = int(os.environ.get('UMBRAL_VOLCADO_MB', '16')) * 1024 * 1024
+BLOQUE_LECTURA = 1024 * 1024
+
+
+def detectar_formato(nombre, cabecera=b''):
+    """
+    Formato de un archivo local ('csv', 'csv_gzip' o 'parquet') por su extensión;
+    los primeros bytes mandan si indican gzip o Parquet
+    """
+    nombre = (nombre or '').lower()
+    extension = os.path.splitext(nombre)[1]
+    if extension not in EXTENSIONES_ARCHIVO or (extension == '.gz' and not nombre.endswith('.csv.gz')):
+        raise ValueError("Solo se permiten archivos .csv, .csv.gz o .parquet")
+    if cabecera.startswith(b'\x1f\x8b'):
+        return 'csv_gzip'
+    if cabecera.startswith(b'PAR1'):
+        return 'parquet'
+    return EXTENSIONES_ARCHIVO[extension]
+
+
+def _leer_archivo(fuente, formato):
+    # `fuente` es una ruta (se parsea con memmap) o un objeto archivo binario
+    if formato == 'parquet':
+        import importlib.util
+        if importlib.util.find_spec('pyarrow') is None:
+            raise ValueError("Para leer Parquet hace falta pyarrow (pip install pyarrow)")
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        if isinstance(fuente, str):
+            return pq.read_table(fuente, memory_map=True).to_pandas()
+        # Búfer en memoria sin copiarlo
+        return pq.read_table(pa.BufferReader(fuente.getbuffer())).to_pandas()
+    compresion = 'gzip' if formato == 'csv_gzip' else None
+    return pd.read_csv(fuente, compression=compresion, memory_map=isinstance(fuente, str) and compresion is None)
+
+
+def _volcar_a_disco(inicio, archivo, sufijo):
+    # Copiar a un temporal lo ya leído y el resto del flujo por bloques; devuelve (ruta, sha256)
+    import tempfile
+    os.makedirs(DIR_SUBIDAS, exist_ok=True)
+    huella = hashlib.sha256(inicio)
+    with tempfile.NamedTemporaryFile(dir=DIR_SUBIDAS, suffix=sufijo, delete=False) as destino:
+        destino.write(inicio)
+        for bloque in iter(lambda: archivo.read(BLOQUE_LECTURA), b''):
+            huella.update(bloque)
+            destino.write(bloque)
+    return destino.name, huella.hexdigest()
+
+
+def cargar_datos_desde_archivo(archivo, nombre=None):
+    """
+    Cargar datos de un archivo local: CSV, CSV comprimido con gzip o Parquet.
+    `archivo` puede ser una ruta o un objeto archivo binario (p. ej. el de st.file_uploader).
+    Nunca se decodifica el contenido a una cadena de Python: las rutas se parsean con
+    memmap, los búferes en memoria (BytesIO) se leen sin copiarlos y el resto de flujos
+    se vuelcan a un temporal en disco por bloques y se parsean desde allí.
+    El sha256 del contenido queda en df.attrs['sha256'].
+    """
+    ruta_temporal = None
+    try:
+        if isinstance(archivo, (str, os.PathLike)):
+            fuente = os.fspath(archivo)
+            nombre = nombre or os.path.basename(fuente)
+            with open(fuente, 'rb') as f:
+                formato = detectar_formato(nombre, f.read(4))
+            sha256 = sha256_archivo(fuente)
+        else:
+            nombre = nombre or getattr(archivo, 'name', '')
+            if hasattr(archivo, 'getbuffer'):
+                with archivo.getbuffer() as buffer:
+                    formato = detectar_formato(nombre, bytes(buffer[:4]))
+                    sha256 = hashlib.sha256(buffer).hexdigest()
+                archivo.seek(0)
+                fuente = archivo
             else:
-                raise ValueError(f"No se encontró la columna para {key}. Columnas disponibles: {list(df.columns)}")
+                inicio = archivo.read(UMBRAL_VOLCADO + 1)
+                formato = detectar_formato(nombre, inicio[:4])
+                if len(inicio) <= UMBRAL_VOLCADO:
+                    sha256 = hashlib.sha256(inicio).hexdigest()
+                    fuente = BytesIO(inicio)
+                else:
+                    with medir('volcado'):
+                        ruta_temporal, sha256 = _volcar_a_disco(inicio, archivo, os.path.splitext(nombre)[1])
+                    del inicio
+                    fuente = ruta_temporal
+        
+        with medir('parseo'):
+            df = _leer_archivo(fuente, formato)
+        contar('filas_cargadas', len(df))
+        df.attrs['sha256'] = sha256
+        return df, f"Datos cargados desde el archivo: {nombre}"
+        
+    except pd.errors.EmptyDataError:
+        raise ValueError("El archivo está vacío o no contiene datos válidos")
+    except pd.errors.ParserError as e:
+        raise ValueError(f"Error al parsear el archivo: {str(e)}")
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Error inesperado al cargar el archivo: {str(e)}")
+    finally:
+        if ruta_temporal is not None:
+            try:
+                os.remove(ruta_temporal)
+            except OSError:
+                pass
+
+
+# Mapear nombres de columnas comunes
+COLUMN_MAPPING = {
+    'reading_score': ['reading score','reading_score', 'reading', 'read_score', 'lectura'],
+    'writing_score': ['writing score','writing_score', 'writing', 'write_score', 'escritura'],
+    'gender': ['gender', 'sex', 'genero', 'género'],
+    'lunch': ['lunch', 'almuerzo', 'lunch_type'],
+    'test_preparation_course': ['test preparation course','test_preparation_course', 'preparation', 'curso_preparacion'],
+    'race_ethnicity_group_E': ['race_ethnicity_group_E', 'race', 'ethnicity', "race/ethnicity"],
+    'parental_level_of_education_high_school': ['parental_level_of_education_high_school', 'parental_level_of_education', 'parental level of education', 'parent_education', 'educacion_padres']
+}
+
+MAX_FIRMAS_CABECERA = int(os.environ.get('MAX_FIRMAS_CABECERA', '128'))
+
+
+def _clave_alias(nombre):
+    # 'Reading  Score ' -> 'reading score'
+    return ' '.join(str(nombre).split()).lower()
+
+
+class AdaptadorColumnas:
+    """
+    Resolución de columnas compilada para una cabecera concreta (ver compilar_adaptador).
+        crudo: la cabecera tiene las columnas de StudentsPerformance.csv (se usa el pipeline)
+        renombrado: {columna: nombre normalizado} para el pipeline
+        columnas: {variable del modelo: columna del DataFrame} según COLUMN_MAPPING
+        posiciones: {variable del modelo: posición de su columna} (acceso directo con iat)
+        error: mensaje si alguna variable no tiene columna (se lanza al usar `columnas`)
+    """
+    __slots__ = ('crudo', 'renombrado', 'columnas', 'posiciones', 'error')
+
+    def __init__(self, crudo, renombrado, columnas, posiciones=None, error=None):
+        self.crudo = crudo
+        self.renombrado = renombrado
+        self.columnas = columnas
+        self.posiciones = posiciones
+        self.error = error
+
+    def resolver(self):
+        if self.error:
+            raise ValueError(self.error)
+        return self.columnas
+
+
+@functools.lru_cache(maxsize=MAX_FIRMAS_CABECERA)
+def compilar_adaptador(cabecera):
+    """
+    Resolver una sola vez por firma de cabecera (tupla de nombres de columna) qué
+    columna corresponde a cada variable del modelo. Los alias de COLUMN_MAPPING se
+    comparan sin distinguir mayúsculas ni espacios sobrantes (una coincidencia exacta
+    tiene prioridad) y esa comparación solo se hace aquí: los DataFrames con una
+    cabecera ya vista reutilizan el adaptador de la caché (LRU, MAX_FIRMAS_CABECERA).
+    """
+    renombrado = {c: normalizar_nombre_columna(c) for c in cabecera}
+    nombres = set(renombrado.values())
+    crudo = all(c in nombres for c in BINARIAS + MULTICLASE + PUNTUACIONES[1:])
+
+    exactas = set(cabecera)
+    por_clave = {}
+    for columna in cabecera:
+        por_clave.setdefault(_clave_alias(columna), columna)
+
+    columnas = {}
+    for key, posibles_nombres in COLUMN_MAPPING.items():
+        for nombre in posibles_nombres:
+            if nombre in exactas:
+                columnas[key] = nombre
+                break
+            if _clave_alias(nombre) in por_clave:
+                columnas[key] = por_clave[_clave_alias(nombre)]
+                break
+        else:
+            error = f"No se encontró la columna para {key}. Columnas disponibles: {list(cabecera)}"
+            return AdaptadorColumnas(crudo, renombrado, None, error=error)
+    posiciones = {key: cabecera.index(columna) for key, columna in columnas.items()}
+    return AdaptadorColumnas(crudo, renombrado, columnas, posiciones)
+
+
+def adaptador_columnas(df):
+    """
+    Adaptador de la cabecera de `df` (compilado la primera vez que se ve)
+    """
+    return compilar_adaptador(tuple(df.columns))
+
+
+def procesar_datos_desde_dataframe(df):
+    """
+    Procesar un DataFrame para extraer los datos necesarios para el modelo
+    """
+    try:
+        with medir('codificacion'):
+            adaptador = adaptador_columnas(df)
+            adaptador.resolver()
+
+            # Tomar el primer valor del DataFrame y convertir los categóricos a numéricos
+            datos_extraidos = {}
+            for key, posicion in adaptador.posiciones.items():
+                valor = df.iat[0, posicion]
+                if key in COLUMNAS_CATEGORICAS:
+                    valor = mapear_valor_categorico(key, valor)
+                datos_extraidos[key] = valor
         
-        # Debug: Mostrar los datos extraídos
-        print("🔍 DEBUG - Datos extraídos:")
-        for key, value in datos_extraidos.items():
-            print(f"  {key}: {value} (tipo: {type(value)})")
+        logger.debug("Datos extraídos: %s", datos_extraidos)
         
         return datos_extraidos
         
     except Exception as e:
-        print(f"❌ ERROR en procesar_datos_desde_dataframe: {str(e)}")
+        raise ValueError(f"Error al procesar datos del DataFrame: {str(e)}")
+
+
+def procesar_lote_desde_dataframe(df):
+    """
+    Procesar todas las filas de un DataFrame de una sola vez.
+    Devuelve un DataFrame con una columna por variable del modelo.
+    """
+    try:
+        with medir('codificacion'):
+            # Con el formato de StudentsPerformance.csv se usa el mismo pipeline que el entrenamiento
+            adaptador = adaptador_columnas(df)
+            pipeline = cargar_pipeline()
+            if pipeline is not None and adaptador.crudo:
+                return pipeline.transformar_modelo(df, renombrado=adaptador.renombrado)
+
+            # Las columnas se resuelven una vez por cabecera, no por lote ni por fila
+            columnas = adaptador.resolver()
+
+            datos_lote = pd.DataFrame({key: df[columna] for key, columna in columnas.items()}, index=df.index)
+
+            # Codificación columnar de las variables categóricas
+            return codificar_categoricas(datos_lote)
+
+    except Exception as e:
         raise ValueError(f"Error al procesar datos del DataFrame: {str(e)}")
@@ -0,0 +1,167 @@
+"""
+Exportación por bloques de los lotes puntuados (CSV, Parquet y Arrow IPC).
+
+exportar_por_bloques() devuelve un generador de bytes: cada bloque de filas se
+convierte al formato pedido y se entrega en cuanto está listo, así que la memoria
+de trabajo es la de un bloque y solo se genera el formato elegido. Con `comprimir`
+el CSV y el Arrow se envuelven en gzip (al vuelo, con zlib) y el Parquet usa su
+códec interno gzip. Parquet y Arrow necesitan pyarrow, que es opcional.
+"""
+
+import importlib.util
+import zlib
+
+PYARROW_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+
+FORMATOS = {
+    'csv': {'nombre': "CSV", 'extension': 'csv', 'mime': 'text/csv', 'pyarrow': False},
+    'parquet': {'nombre': "Parquet", 'extension': 'parquet', 'mime': 'application/vnd.apache.parquet', 'pyarrow': True},
+    'arrow': {'nombre': "Arrow IPC", 'extension': 'arrows', 'mime': 'application/vnd.apache.arrow.stream', 'pyarrow': True},
+}
+FILAS_POR_BLOQUE = 100_000
+
+
+def formatos_disponibles():
+    return [formato for formato, info in FORMATOS.items() if PYARROW_AVAILABLE or not info['pyarrow']]
+
+
+def nombre_archivo(base, formato, comprimir=False):
+    """
+    'datos' -> 'datos.csv.gz' / 'datos.parquet' (el Parquet comprime por dentro)
+    """
+    nombre = f"{base}.{FORMATOS[formato]['extension']}"
+    return f"{nombre}.gz" if comprimir and formato != 'parquet' else nombre
+
+
+def tipo_mime(formato, comprimir=False):
+    return 'application/gzip' if comprimir and formato != 'parquet' else FORMATOS[formato]['mime']
+
+
+def _bloques(df, filas_por_bloque):
+    # Con 0 filas se entrega un bloque vacío para escribir al menos la cabecera/esquema
+    for inicio in range(0, max(len(df), 1), filas_por_bloque):
+        yield df.iloc[inicio:inicio + filas_por_bloque]
+
+
+class _SalidaDrenable:
+    # Archivo de solo escritura para pyarrow: acumula lo escrito hasta que se recoge
+    def __init__(self):
+        self.partes = []
+        self.posicion = 0
+        self.closed = False
+
+    def write(self, datos):
+        datos = bytes(datos)
+        self.partes.append(datos)
+        self.posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self.posicion
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def recoger(self):
+        datos = b''.join(self.partes)
+        self.partes = []
+        return datos
+
+
+def _csv(df, filas_por_bloque):
+    for i, bloque in enumerate(_bloques(df, filas_por_bloque)):
+        yield bloque.to_csv(index=False, header=(i == 0)).encode('utf-8')
+
+
+def _esquema(df):
+    # Se infiere una vez con el DataFrame entero: inferido por bloque, una columna object
+    # vacía en el primero (tipo null) no coincidiría con los siguientes
+    import pyarrow as pa
+    return pa.Schema.from_pandas(df, preserve_index=False)
+
+
+def _parquet(df, filas_por_bloque, comprimir):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    esquema = _esquema(df)
+    salida = _SalidaDrenable()
+    escritor = None
+    for bloque in _bloques(df, filas_por_bloque):
+        tabla = pa.Table.from_pandas(bloque, schema=esquema, preserve_index=False)
+        if escritor is None:
+            escritor = pq.ParquetWriter(salida, esquema, compression='gzip' if comprimir else 'snappy')
+        # Cada bloque es un row group que se entrega en cuanto se escribe
+        if tabla.num_rows:
+            escritor.write_table(tabla)
+        yield salida.recoger()
+    escritor.close()
+    yield salida.recoger()
+
+
+def _arrow(df, filas_por_bloque):
+    import pyarrow as pa
+
+    esquema = _esquema(df)
+    salida = _SalidaDrenable()
+    escritor = None
+    for bloque in _bloques(df, filas_por_bloque):
+        lote = pa.RecordBatch.from_pandas(bloque, schema=esquema, preserve_index=False)
+        if escritor is None:
+            escritor = pa.ipc.new_stream(salida, esquema)
+        # Un bloque vacío solo aporta el esquema (sus buffers pueden ser los del DataFrame entero)
+        if lote.num_rows:
+            escritor.write_batch(lote)
+        yield salida.recoger()
+    escritor.close()
+    yield salida.recoger()
+
+
+def _gzip(partes):
+    # wbits=31: cabecera y cola gzip estándar
+    compresor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for parte in partes:
+        comprimido = compresor.compress(parte)
+        if comprimido:
+            yield comprimido
+    yield compresor.flush()
+
+
+def exportar_por_bloques(df, formato='csv', comprimir=False, filas_por_bloque=FILAS_POR_BLOQUE):
+    """
+    Generador con el contenido del archivo exportado, bloque a bloque
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato no soportado: {formato}. Opciones: {list(FORMATOS)}")
+    if FORMATOS[formato]['pyarrow'] and not PYARROW_AVAILABLE:
+        raise ValueError(f"El formato {FORMATOS[formato]['nombre']} necesita pyarrow (pip install pyarrow)")
+
+    if formato == 'csv':
+        partes = _csv(df, filas_por_bloque)
+    elif formato == 'parquet':
+        return (parte for parte in _parquet(df, filas_por_bloque, comprimir) if parte)
+    else:
+        partes = _arrow(df, filas_por_bloque)
+    partes = (parte for parte in partes if parte)
+    return _gzip(partes) if comprimir else partes
+
+
+def exportar_a_archivo(df, ruta, formato='csv', comprimir=False, filas_por_bloque=FILAS_POR_BLOQUE):
+    """
+    Escribir la exportación en disco sin tenerla entera en memoria; devuelve los bytes escritos
+    """
+    escritos = 0
+    with open(ruta, 'wb') as f:
+        for parte in exportar_por_bloques(df, formato, comprimir, filas_por_bloque):
+            f.write(parte)
+            escritos += len(parte)
+    return escritos
@@ -1 +1,325 @@
-# Feature engineering functions
\ No newline at end of file
+# Feature engineering functions
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.utils import cache_recurso
+
+# Valores de texto (en minúsculas) que se codifican como 1 en cada variable binaria.
+# Incluye el vocabulario de StudentsPerformance.csv y los alias en español.
+VALORES_POSITIVOS = {
+    'gender': {'male', 'masculino', 'm'},
+    'lunch': {'standard', 'estándar', 'estandar'},
+    'test_preparation_course': {'completed', 'completado', 'yes', 'sí', 'si'},
+    'race_ethnicity_group_E': {'group e', 'grupo e', 'e', 'yes', 'sí', 'si'},
+    'parental_level_of_education_high_school': {'high school', 'secundaria', 'high_school'},
+}
+
+# Las dos variables que vienen del one-hot del notebook se guardan como float (0.0/1.0)
+VARIABLES_FLOAT = {'race_ethnicity_group_E', 'parental_level_of_education_high_school'}
+
+COLUMNAS_CATEGORICAS = list(VALORES_POSITIVOS)
+
+
+def mapear_valor_categorico(key, valor):
+    """
+    Convertir un valor categórico de texto a numérico (los no textuales se dejan igual)
+    """
+    if not isinstance(valor, str) or key not in VALORES_POSITIVOS:
+        return valor
+    positivo = valor.lower() in VALORES_POSITIVOS[key]
+    if key in VARIABLES_FLOAT:
+        return 1.0 if positivo else 0.0
+    return 1 if positivo else 0
+
+
+def codificar_columna(serie, key):
+    """
+    Codificar una columna categórica completa.
+    Se factoriza la columna y solo se mapean sus valores distintos (pocos), después
+    se reparten a todas las filas con una indexación de NumPy.
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        codigos = serie.cat.codes.to_numpy()
+        unicos = serie.cat.categories
+    else:
+        codigos, unicos = pd.factorize(serie)
+
+    tabla = [mapear_valor_categorico(key, valor) for valor in unicos]
+    todos_texto = all(isinstance(valor, str) for valor in unicos)
+    faltantes = codigos < 0
+
+    if todos_texto and not faltantes.any():
+        # Caso habitual: todo texto, sin nulos -> mismo tipo que el mapeo escalar
+        dtype = np.float64 if key in VARIABLES_FLOAT else np.int64
+        return pd.Series(np.asarray(tabla, dtype=dtype)[codigos], index=serie.index, name=serie.name)
+
+    # Mezcla de texto y números (o nulos): los valores no textuales se conservan
+    valores = np.empty(len(tabla) + 1, dtype=object)
+    valores[:-1] = tabla
+    valores[-1] = np.nan  # el código -1 apunta al nulo final
+    resultado = pd.Series(valores[codigos], index=serie.index, name=serie.name)
+    try:
+        return pd.to_numeric(resultado)
+    except (ValueError, TypeError):
+        return resultado
+
+
+def codificar_categoricas(df):
+    """
+    Codificar en bloque las variables binarias de un DataFrame cuyas columnas ya usan
+    los nombres del modelo. Las demás columnas se devuelven sin cambios.
+    """
+    resultado = df.copy()
+    for key in COLUMNAS_CATEGORICAS:
+        if key in resultado.columns:
+            resultado[key] = codificar_columna(resultado[key], key)
+    return resultado
+
+
+# --- Pipeline ajustado: del CSV crudo a las matrices lineal y de árboles ---
+
+# Codificación binaria del notebook 01_eda (las demás variables binarias del modelo
+# salen del one-hot); los valores se resuelven con VALORES_POSITIVOS
+BINARIAS = ['gender', 'lunch', 'test_preparation_course']
+MULTICLASE = ['race_ethnicity', 'parental_level_of_education']
+PUNTUACIONES = ['math_score', 'reading_score', 'writing_score']
+ORDEN_EDUCACION = ['some_high_school', 'high_school', 'some_college', 'bachelors_degree', 'masters_degree']
+RUTA_PIPELINE = 'models/pipeline_caracteristicas.json'
+DIR_CACHE_CARACTERISTICAS = '.cache/caracteristicas'
+
+
+def normalizar_nombre_columna(nombre):
+    """
+    'race/ethnicity' -> 'race_ethnicity', 'parental level of education' -> 'parental_level_of_education'
+    """
+    return str(nombre).strip().replace(' ', '_').replace("'", '').replace('/', '_')
+
+
+def normalizar_categoria(valor):
+    """
+    "bachelor's degree" -> 'bachelors_degree' (igual que la limpieza del notebook)
+    """
+    if not isinstance(valor, str):
+        return valor
+    return valor.strip().replace("'", '').replace(' ', '_')
+
+
+class PipelineCaracteristicas:
+    """
+    Codificación ajustada de StudentsPerformance.csv a df_tree y df_linear.
+
+    ajustar() aprende las categorías del one-hot (drop='first', como OneHotEncoder)
+    y las columnas de df_linear (|correlación con math_score| > umbral). transformar()
+    factoriza cada columna de texto una vez y construye todas las columnas de salida
+    con una tabla de búsqueda por categoría distinta, así que las dos matrices salen
+    de una sola pasada. Las variables que también usa el modelo servido se codifican
+    con mapear_valor_categorico, la misma tabla que procesar_lote_desde_dataframe.
+    """
+
+    def __init__(self, categorias=None, columnas_arboles=None, columnas_lineal=None, umbral=0.1):
+        self.categorias = categorias or {}
+        self.columnas_arboles = columnas_arboles or []
+        self.columnas_lineal = columnas_lineal or []
+        self.umbral = umbral
+
+    @property
+    def ajustado(self):
+        return bool(self.columnas_arboles)
+
+    def _normalizar(self, df):
+        renombradas = {c: normalizar_nombre_columna(c) for c in df.columns}
+        faltantes = [c for c in BINARIAS + MULTICLASE + PUNTUACIONES[1:] if c not in renombradas.values()]
+        if faltantes:
+            raise ValueError(f"Columnas faltantes: {faltantes}. Columnas disponibles: {list(df.columns)}")
+        return df.rename(columns=renombradas)
+
+    def ajustar(self, df):
+        df = self._normalizar(df)
+        if 'math_score' not in df.columns:
+            raise ValueError("Para ajustar el pipeline hace falta la columna math_score")
+        # Categorías ordenadas; la primera se descarta para evitar multicolinealidad
+        self.categorias = {
+            columna: sorted(str(normalizar_categoria(v)) for v in pd.unique(df[columna].dropna()))[1:]
+            for columna in MULTICLASE
+        }
+        self.columnas_arboles = []
+        arboles = self._transformar_todo(df)
+        educacion = [f"parental_level_of_education_{nivel}" for nivel in ORDEN_EDUCACION]
+        educacion = [c for c in educacion if c in arboles] + sorted(
+            c for c in arboles if c.startswith('parental_level_of_education_') and c not in educacion)
+        self.columnas_arboles = educacion + [c for c in arboles if c not in educacion]
+
+        correlaciones = pd.DataFrame(arboles).astype(np.float64).corr()['math_score'].sort_values(ascending=False)
+        self.columnas_lineal = correlaciones[correlaciones.abs() > self.umbral].index.tolist()
+        if 'math_score' not in self.columnas_lineal:
+            self.columnas_lineal.append('math_score')
+        return self
+
+    def _transformar_todo(self, df, salidas=None, conservar_no_numericos=False):
+        # Diccionario columna -> array; con `salidas` solo se construyen esas columnas.
+        # Con `conservar_no_numericos`, una puntuación con valores no nulos que no son
+        # números se deja tal cual para que la validación los marque como ERROR_TIPO
+        # (igual que con las cabeceras alternativas) y no como nulos
+        def necesaria(columna):
+            return salidas is None or columna in salidas
+
+        def repartir(tabla, codigos):
+            # El código -1 (nulo) apunta al NaN final; sin nulos basta con uint8
+            if (codigos < 0).any():
+                return np.asarray(tabla + [np.nan], dtype=np.float64)[codigos]
+            return np.asarray(tabla, dtype=np.uint8)[codigos]
+
+        columnas = {}
+        for columna in BINARIAS:
+            if necesaria(columna):
+                codigos, unicos = pd.factorize(df[columna])
+                columnas[columna] = repartir(
+                    [mapear_valor_categorico(columna, v) if isinstance(v, str) else v for v in unicos], codigos)
+        for columna in PUNTUACIONES:
+            if columna in df.columns and necesaria(columna):
+                valores = pd.to_numeric(df[columna], errors='coerce').to_numpy(dtype=np.float64)
+                if not np.isnan(valores).any():
+                    columnas[columna] = valores.astype(np.int16)
+                elif conservar_no_numericos and (np.isnan(valores) & df[columna].notna().to_numpy()).any():
+                    columnas[columna] = df[columna].to_numpy()
+                else:
+                    columnas[columna] = valores
+        for columna in MULTICLASE:
+            pendientes = [c for c in self.categorias.get(columna, []) if necesaria(f"{columna}_{c}")]
+            if not pendientes:
+                continue
+            codigos, unicos = pd.factorize(df[columna])
+            normalizados = [normalizar_categoria(v) for v in unicos]
+            for categoria in pendientes:
+                salida = f"{columna}_{categoria}"
+                if salida in VALORES_POSITIVOS:
+                    # Misma tabla que el modelo servido (acepta también los alias en español)
+                    tabla = [mapear_valor_categorico(salida, v) if isinstance(v, str) else v for v in unicos]
+                else:
+                    tabla = [int(n == categoria) for n in normalizados]
+                columnas[salida] = repartir(tabla, codigos)
+        return columnas
+
+    def admite(self, df):
+        """
+        True si el DataFrame tiene las columnas crudas de StudentsPerformance.csv
+        """
+        nombres = {normalizar_nombre_columna(c) for c in df.columns}
+        return all(c in nombres for c in BINARIAS + MULTICLASE + PUNTUACIONES[1:])
+
+    def transformar_modelo(self, df, renombrado=None):
+        """
+        Solo las variables del modelo lineal (sin math_score), para servir predicciones.
+        Con `renombrado` ({columna: nombre normalizado}, ya comprobado) no se vuelve a
+        normalizar la cabecera.
+        """
+        variables = [c for c in self.columnas_lineal if c != 'math_score']
+        df = self._normalizar(df) if renombrado is None else df.rename(columns=renombrado)
+        columnas = self._transformar_todo(df, salidas=set(variables), conservar_no_numericos=True)
+        return pd.DataFrame({c: columnas[c] for c in variables}, index=df.index)
+
+    def transformar(self, df):
+        """
+        Devolver (df_linear, df_tree) para un DataFrame con la forma de StudentsPerformance.csv.
+        Sin math_score en la entrada, las dos salidas omiten esa columna.
+        """
+        if not self.ajustado:
+            raise ValueError("El pipeline no está ajustado")
+        columnas = self._transformar_todo(self._normalizar(df))
+        arboles = pd.DataFrame({c: columnas[c] for c in self.columnas_arboles if c in columnas}, index=df.index)
+        lineal = arboles[[c for c in self.columnas_lineal if c in arboles.columns]]
+        return lineal, arboles
+
+    def ajustar_transformar(self, df):
+        return self.ajustar(df).transformar(df)
+
+    def a_dict(self):
+        return {
+            'categorias': self.categorias,
+            'columnas_arboles': self.columnas_arboles,
+            'columnas_lineal': self.columnas_lineal,
+            'umbral': self.umbral,
+        }
+
+    def huella(self):
+        """
+        Hash del pipeline ajustado (forma parte de la clave de la caché)
+        """
+        import hashlib
+        import json
+        return hashlib.sha256(json.dumps(self.a_dict(), sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+    def guardar(self, ruta=RUTA_PIPELINE):
+        import json
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump(self.a_dict(), f, indent=2, ensure_ascii=False)
+
+    @classmethod
+    def cargar(cls, ruta=RUTA_PIPELINE):
+        import json
+        with open(ruta, 'r', encoding='utf-8') as f:
+            return cls(**json.load(f))
+
+
+@cache_recurso
+def cargar_pipeline(ruta=RUTA_PIPELINE):
+    """
+    Pipeline ajustado guardado en models/ (None si no existe)
+    """
+    if not os.path.exists(ruta):
+        return None
+    return PipelineCaracteristicas.cargar(ruta)
+
+
+def transformar_con_cache(pipeline, ruta_csv, directorio_cache=DIR_CACHE_CARACTERISTICAS):
+    """
+    transformar() de un CSV crudo con caché por contenido (sha256 del archivo + pipeline).
+    Los resultados se guardan en formato columnar y se vuelven a abrir con memmap.
+    (Para un DataFrame en memoria calcular su hash cuesta más que transformarlo.)
+    """
+    from pathlib import Path
+    from src.storage import cargar_tabla, guardar_tabla
+    from src.utils import sha256_archivo
+
+    directorio = Path(directorio_cache) / f"{sha256_archivo(ruta_csv)[:16]}_{pipeline.huella()}"
+    try:
+        return cargar_tabla(directorio / 'lineal'), cargar_tabla(directorio / 'arboles')
+    except (OSError, ValueError):
+        pass
+
+    lineal, arboles = pipeline.transformar(pd.read_csv(ruta_csv))
+    try:
+        guardar_tabla(arboles, directorio / 'arboles')
+        guardar_tabla(lineal, directorio / 'lineal')
+    except OSError:
+        pass  # sin caché (directorio de solo lectura)
+    return lineal, arboles
+
+
+def main(argv=None):
+    import argparse
+    from src.storage import convertir_csv
+
+    parser = argparse.ArgumentParser(description="Ajustar el pipeline de características y generar df_linear/df_tree")
+    parser.add_argument('crudo', nargs='?', default='data/raw/StudentsPerformance.csv')
+    parser.add_argument('--salida', default='data/processed', help="Directorio de df_linear.csv y df_tree.csv")
+    parser.add_argument('--pipeline', default=RUTA_PIPELINE)
+    args = parser.parse_args(argv)
+
+    pipeline = PipelineCaracteristicas()
+    lineal, arboles = pipeline.ajustar_transformar(pd.read_csv(args.crudo))
+    pipeline.guardar(args.pipeline)
+    for nombre, df in (('df_linear', lineal), ('df_tree', arboles)):
+        # Las columnas del one-hot se escriben como 0.0/1.0, igual que el notebook
+        df = df.astype({c: np.float64 for c in df.columns if c.startswith(tuple(MULTICLASE))})
+        ruta = os.path.join(args.salida, f"{nombre}.csv")
+        df.to_csv(ruta, index=False)
+        convertir_csv(ruta)
+        print(f"✅ {ruta} ({len(df.columns)} columnas)")
+    print(f"✅ Pipeline guardado en {args.pipeline}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""
+Instrumentación ligera de las etapas de carga y predicción.
+
+Las etapas se miden con `with medir('prediccion'):` y los volúmenes con
+`contar('filas_predichas', n)`. Cada etapa acumula un histograma de tiempos
+con cubos exponenciales (de 1 µs a ~1 min) y los contadores se suman. Las
+magnitudes que no son tiempos (tamaño de lote, profundidad de cola...) se
+registran con `registrar_valor('tamano_lote', n)` en histogramas de cubos
+potencia de 2.
+
+Está desactivado por defecto: en ese caso `medir` devuelve un contexto vacío
+compartido y `contar` retorna al instante, así que el coste es una comprobación
+de un booleano. Se activa con la variable de entorno METRICAS=1 o con
+activar_metricas(). `instantanea()` devuelve el estado actual como diccionario.
+"""
+
+import bisect
+import os
+import threading
+import time
+
+# Límites superiores de los cubos del histograma, en segundos: 1 µs, 2 µs, 4 µs... ~67 s
+LIMITES_CUBOS = [1e-6 * 2 ** i for i in range(27)]
+# Límites para valores: 1, 2, 4... ~1M
+LIMITES_VALORES = [2 ** i for i in range(21)]
+
+_activas = os.environ.get('METRICAS', '0') == '1'
+_lock = threading.Lock()
+_histogramas = {}
+_valores = {}
+_contadores = {}
+
+
+class _Histograma:
+    __slots__ = ('n', 'suma', 'minimo', 'maximo', 'cubos', 'limites')
+
+    def __init__(self, limites=LIMITES_CUBOS):
+        self.n = 0
+        self.suma = 0.0
+        self.minimo = float('inf')
+        self.maximo = 0.0
+        self.limites = limites
+        self.cubos = [0] * (len(limites) + 1)
+
+    def registrar(self, valor):
+        self.n += 1
+        self.suma += valor
+        self.minimo = min(self.minimo, valor)
+        self.maximo = max(self.maximo, valor)
+        self.cubos[bisect.bisect_left(self.limites, valor)] += 1
+
+    def percentil(self, p):
+        # Estimación: límite superior del cubo donde el acumulado alcanza el percentil
+        objetivo = self.n * p / 100
+        acumulado = 0
+        for i, cuenta in enumerate(self.cubos):
+            acumulado += cuenta
+            if acumulado >= objetivo and cuenta:
+                return min(self.limites[i], self.maximo) if i < len(self.limites) else self.maximo
+        return self.maximo
+
+    def resumen(self, unidad='_s'):
+        return {
+            'n': self.n,
+            f'suma{unidad}': self.suma,
+            f'media{unidad}': self.suma / self.n if self.n else 0.0,
+            f'min{unidad}': self.minimo if self.n else 0.0,
+            f'max{unidad}': self.maximo,
+            f'p50{unidad}': self.percentil(50),
+            f'p95{unidad}': self.percentil(95),
+            f'p99{unidad}': self.percentil(99),
+        }
+
+
+class _Medicion:
+    __slots__ = ('etapa', 'inicio')
+
+    def __init__(self, etapa):
+        self.etapa = etapa
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *excepcion):
+        registrar_tiempo(self.etapa, time.perf_counter() - self.inicio)
+        return False
+
+
+class _MedicionNula:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        return False
+
+
+_NULA = _MedicionNula()
+
+
+def metricas_activas():
+    return _activas
+
+
+def activar_metricas(activar=True):
+    global _activas
+    _activas = bool(activar)
+
+
+def medir(etapa):
+    """
+    Contexto que registra la duración del bloque en el histograma de `etapa`
+    """
+    if not _activas:
+        return _NULA
+    return _Medicion(etapa)
+
+
+def registrar_tiempo(etapa, segundos):
+    if not _activas:
+        return
+    with _lock:
+        histograma = _histogramas.get(etapa)
+        if histograma is None:
+            histograma = _histogramas[etapa] = _Histograma()
+        histograma.registrar(segundos)
+
+
+def registrar_valor(nombre, valor):
+    if not _activas:
+        return
+    with _lock:
+        histograma = _valores.get(nombre)
+        if histograma is None:
+            histograma = _valores[nombre] = _Histograma(LIMITES_VALORES)
+        histograma.registrar(valor)
+
+
+def contar(nombre, n=1):
+    if not _activas:
+        return
+    with _lock:
+        _contadores[nombre] = _contadores.get(nombre, 0) + n
+
+
+def instantanea():
+    """
+    Copia del estado actual: {'activas', 'histogramas': {etapa: resumen}, 'valores': {nombre: resumen},
+    'contadores': {...}}. Los resúmenes de 'valores' no llevan el sufijo _s.
+    """
+    with _lock:
+        return {
+            'activas': _activas,
+            'histogramas': {etapa: h.resumen() for etapa, h in sorted(_histogramas.items())},
+            'valores': {nombre: h.resumen('') for nombre, h in sorted(_valores.items())},
+            'contadores': dict(sorted(_contadores.items())),
+        }
+
+
+def reiniciar_metricas():
+    with _lock:
+        _histogramas.clear()
+        _valores.clear()
+        _contadores.clear()
@@ -1,90 +1,133 @@
 # Entrenamiento, carga y predicción de modelos
-import streamlit as st
+import importlib.util
+import json
 import pickle
+import queue
+import threading
+import time
+from concurrent.futures import Future
 import numpy as np
 import os
 from pathlib import Path
 import warnings
 warnings.filterwarnings('ignore')
 
-try:
-    from joblib import load as joblib_load
-    JOBLIB_AVAILABLE = True
-except ImportError:
-    JOBLIB_AVAILABLE = False
-    st.warning("⚠️ joblib no disponible, usando pickle")
+from src.data import matriz_validada, procesar_lote_desde_dataframe, validar_lote
+from src.metrics import contar, medir, metricas_activas, registrar_tiempo, registrar_valor
+from src.utils import avisar, cache_recurso, logger, sha256_archivo
+
+# joblib y scikit-learn se importan solo cuando hace falta leer el .pkl:
+# al arrancar únicamente se comprueba que estén instalados (sin importarlos).
+JOBLIB_AVAILABLE = importlib.util.find_spec('joblib') is not None
+if not JOBLIB_AVAILABLE:
+    avisar("⚠️ joblib no disponible, usando pickle")
 
 # Verificar que scikit-learn esté disponible
-try:
-    import sklearn
-    SKLEARN_AVAILABLE = True
-    # st.success(f"✅ scikit-learn disponible - versión: {sklearn.__version__}")
-except ImportError:
-    SKLEARN_AVAILABLE = False
-
-@st.cache_resource
-def cargar_modelo():
+SKLEARN_AVAILABLE = importlib.util.find_spec('sklearn') is not None
+
+# Orden de las variables con el que se entrenó el modelo
+VARIABLES_ORDEN = [
+    'gender', 'lunch', 'test_preparation_course', 
+    'reading_score', 'writing_score', 'race_ethnicity_group_E', 
+    'parental_level_of_education_high_school'
+]
+
+# Buscar el archivo del modelo en diferentes ubicaciones posibles
+RUTAS_MODELO = [
+    'models/lin_reg_model_opt.pkl',      # Segunda opción: carpeta models
+    '../models/lin_reg_model_opt.pkl',
+    '../lin_reg_model_opt.pkl'
+]
+
+# Agrupación de predicciones concurrentes (ver PredictorAgrupado)
+MAX_LOTE_AGRUPADO = int(os.environ.get('AGRUPAR_MAX_LOTE', '256'))
+ESPERA_AGRUPADO_MS = float(os.environ.get('AGRUPAR_ESPERA_MS', '2'))
+
+
+def _cargar_pkl(ruta):
+    # Intentar primero con joblib si está disponible
+    if JOBLIB_AVAILABLE:
+        try:
+            from joblib import load as joblib_load
+            return joblib_load(ruta)
+        except Exception as joblib_error:
+            # st.warning(f"⚠️ joblib falló, intentando pickle: {str(joblib_error)}")
+            pass
+    
+    # Si joblib no funciona, intentar con pickle
+    with open(ruta, 'rb') as f:
+        # Intentar con diferentes protocolos de pickle
+        try:
+            return pickle.load(f)
+        except Exception as pickle_error:
+            try:
+                f.seek(0)
+                return pickle.load(f, encoding='latin1')
+            except Exception as pickle_error2:
+                # Intentar con protocolo más antiguo
+                f.seek(0)
+                return pickle.load(f, fix_imports=True, encoding='latin1')
+
+
+def usar_modelo_ligero():
+    # MODELO_LIGERO=0 obliga a cargar siempre el .pkl
+    return os.environ.get('MODELO_LIGERO', '1') != '0'
+
+
+def cargar_modelo_desde_ruta(ruta, usar_ligero=True):
     """
-    Cargar el modelo entrenado lin_reg_model_opt
+    Cargar un .pkl concreto (o su artefacto ligero .json si es válido).
+    Devuelve (modelo, ruta_usada); lanza una excepción si no se puede cargar.
     """
+    ruta_ligera = Path(ruta).with_suffix('.json')
+    if usar_ligero and ruta_ligera.exists():
+        modelo = cargar_modelo_ligero(ruta_ligera, ruta_origen=ruta)
+        if modelo is not None:
+            return modelo, str(ruta_ligera)
+    
     # Verificar que scikit-learn esté disponible
     if not SKLEARN_AVAILABLE:
-        st.error("❌ scikit-learn no está disponible. No se puede cargar el modelo.")
-        return None, None
+        raise RuntimeError("scikit-learn no está disponible. No se puede cargar el modelo.")
+    return _cargar_pkl(ruta), str(ruta)
+
+
+@cache_recurso
+def cargar_modelo():
+    """
+    Cargar el modelo entrenado lin_reg_model_opt.
+    Si existe el registro de modelos (models/registro, ver src/registry.py) se carga
+    la versión activa; si no, se busca el .pkl en las rutas habituales.
+    Si junto al .pkl hay un artefacto ligero (.json, ver exportar_modelo_ligero)
+    generado a partir de ese mismo .pkl, se usa ese y no se importa scikit-learn.
+    Con MODELO_LIGERO=0 se fuerza la carga del .pkl.
+    """
+    from src.registry import cargar_version_activa
     
+    usar_ligero = usar_modelo_ligero()
     try:
-        # Buscar el archivo del modelo en diferentes ubicaciones posibles
-        posibles_rutas = [
-            'models/lin_reg_model_opt.pkl',      # Segunda opción: carpeta models
-            '../models/lin_reg_model_opt.pkl',
-            '../lin_reg_model_opt.pkl'
-        ]
+        try:
+            modelo, entrada = cargar_version_activa(usar_ligero=usar_ligero)
+            if modelo is not None:
+                return modelo, entrada['ruta_cargada']
+        except Exception as registro_error:
+            avisar(f"⚠️ No se pudo cargar la versión activa del registro: {str(registro_error)}")
         
-        modelo = None
-        ruta_modelo = None
+        for ruta in RUTAS_MODELO:
+            if not Path(ruta).exists():
+                continue
+            try:
+                return cargar_modelo_desde_ruta(ruta, usar_ligero=usar_ligero)
+            except RuntimeError as e:
+                avisar(f"❌ {str(e)}", nivel="error")
+                return None, None
+            except Exception as load_error:
+                continue
         
-        for ruta in posibles_rutas:
-            if Path(ruta).exists():
-                try:
-                    # Intentar primero con joblib si está disponible
-                    if JOBLIB_AVAILABLE:
-                        try:
-                            modelo = joblib_load(ruta)
-                            ruta_modelo = ruta
-                            return modelo, ruta_modelo
-                        except Exception as joblib_error:
-                            # st.warning(f"⚠️ joblib falló, intentando pickle: {str(joblib_error)}")
-                            pass
-                    
-                    # Si joblib no funciona, intentar con pickle
-                    with open(ruta, 'rb') as f:
-                        # Intentar con diferentes protocolos de pickle
-                        try:
-                            modelo = pickle.load(f)
-                        except Exception as pickle_error:
-                            try:
-                                f.seek(0)
-                                modelo = pickle.load(f, encoding='latin1')
-                            except Exception as pickle_error2:
-                                # Intentar con protocolo más antiguo
-                                try:
-                                    f.seek(0)
-                                    modelo = pickle.load(f, fix_imports=True, encoding='latin1')
-                                except Exception as pickle_error3:
-                                    raise pickle_error3
-                    
-                    ruta_modelo = ruta
-                    return modelo, ruta_modelo
-                    
-                except Exception as load_error:
-                    continue
-        
-        if modelo is None:
-            # st.error("❌ No se pudo cargar el modelo desde ninguna ubicación")
-            # st.warning("⚠️ Esto puede deberse a incompatibilidad de versiones entre numpy/scikit-learn")
-            # st.info("💡 Solución: El modelo fue guardado con una versión diferente de numpy")
-            # st.info("🔧 Intenta usar versiones más antiguas: numpy==1.21.6, scikit-learn==1.0.2")
-            return None, None
+        # st.error("❌ No se pudo cargar el modelo desde ninguna ubicación")
+        # st.warning("⚠️ Esto puede deberse a incompatibilidad de versiones entre numpy/scikit-learn")
+        # st.info("💡 Solución: El modelo fue guardado con una versión diferente de numpy")
+        # st.info("🔧 Intenta usar versiones más antiguas: numpy==1.21.6, scikit-learn==1.0.2")
+        return None, None
         
     except Exception as e:
         # st.error(f"❌ Error al cargar el modelo: {str(e)}")
@@ -92,62 +135,548 @@ def cargar_modelo():
         return None, None
 
 
+def exportar_modelo_ligero(ruta_pkl='models/lin_reg_model_opt.pkl', ruta_salida=None):
+    """
+    Exportar los coeficientes de un modelo lineal a un JSON que se puede cargar sin scikit-learn.
+    Se guarda el checksum del .pkl de origen para no usar un artefacto desactualizado.
+    """
+    modelo = _cargar_pkl(ruta_pkl)
+    puntuador = compilar_modelo(modelo)
+    if not isinstance(puntuador, PuntuadorLineal):
+        raise ValueError(f"El modelo {type(modelo).__name__} no es lineal y no se puede exportar")
+    
+    ruta_salida = Path(ruta_salida or Path(ruta_pkl).with_suffix('.json'))
+    artefacto = {
+        'tipo': puntuador.nombre,
+        'variables': VARIABLES_ORDEN,
+        'coeficientes': puntuador.coeficientes.tolist(),
+        'intercepto': float(puntuador.intercepto),
+        'origen_sha256': sha256_archivo(ruta_pkl),
+    }
+    with open(ruta_salida, 'w', encoding='utf-8') as f:
+        json.dump(artefacto, f, indent=2)
+    return ruta_salida
+
+
+def cargar_modelo_ligero(ruta, ruta_origen=None):
+    """
+    Cargar un artefacto ligero como PuntuadorLineal (solo NumPy).
+    Devuelve None si el artefacto no es válido o no corresponde a `ruta_origen`.
+    """
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            artefacto = json.load(f)
+        if artefacto.get('variables') != VARIABLES_ORDEN:
+            return None
+        if ruta_origen is not None and artefacto.get('origen_sha256') != sha256_archivo(ruta_origen):
+            return None
+        return PuntuadorLineal(artefacto['coeficientes'], artefacto['intercepto'], nombre=artefacto.get('tipo'))
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+class PuntuadorLineal:
+    """
+    Versión compilada de un modelo lineal de scikit-learn.
+    Solo guarda los coeficientes y el intercepto como un array contiguo y
+    predice con un único producto escalar, sin la validación de entrada de sklearn.
+    """
+    __slots__ = ('coeficientes', 'intercepto', 'dtype', 'nombre')
+
+    def __init__(self, coeficientes, intercepto, dtype=np.float64, nombre='PuntuadorLineal'):
+        self.dtype = np.dtype(dtype)
+        self.coeficientes = np.ascontiguousarray(coeficientes, dtype=self.dtype).ravel()
+        self.intercepto = self.dtype.type(intercepto)
+        self.nombre = nombre
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=self.dtype)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        return X @ self.coeficientes + self.intercepto
+
+
+def nombre_modelo(modelo):
+    """
+    Nombre del tipo de modelo (el del estimador original si está compilado)
+    """
+    return getattr(modelo, 'nombre', None) or type(modelo).__name__
+
+
+def verificar_paridad(modelo, puntuador, X=None, tolerancia=1e-6):
+    """
+    Comprobar que el puntuador compilado da las mismas predicciones que el modelo original
+    """
+    if X is None:
+        # Muestra fija que cubre flags 0/1 y puntuaciones en todo el rango 0-100
+        rng = np.random.default_rng(0)
+        X = np.column_stack([
+            rng.integers(0, 2, 256), rng.integers(0, 2, 256), rng.integers(0, 2, 256),
+            rng.uniform(0, 100, 256), rng.uniform(0, 100, 256),
+            rng.integers(0, 2, 256), rng.integers(0, 2, 256),
+        ]).astype(np.float64)
+    esperado = np.asarray(modelo.predict(X), dtype=np.float64).ravel()
+    obtenido = np.asarray(puntuador.predict(X), dtype=np.float64).ravel()
+    return np.allclose(obtenido, esperado, rtol=0, atol=tolerancia)
+
+
+def compilar_modelo(modelo, float32=False):
+    """
+    Compilar un modelo lineal de sklearn a un PuntuadorLineal.
+    Si el modelo no es lineal (o no pasa la comprobación de paridad) se devuelve
+    tal cual, de modo que se sigue usando su propio predict.
+    """
+    coef = getattr(modelo, 'coef_', None)
+    intercept = getattr(modelo, 'intercept_', None)
+    es_lineal = type(modelo).__module__.startswith('sklearn.linear_model')
+    if not es_lineal or coef is None or intercept is None:
+        return modelo
+
+    coef = np.asarray(coef, dtype=np.float64)
+    intercept = np.asarray(intercept, dtype=np.float64)
+    if coef.ndim != 1 and coef.shape[0] != 1:
+        return modelo  # Regresión multisalida: no se compila
+    if coef.size != len(VARIABLES_ORDEN) or intercept.size != 1:
+        return modelo
+
+    dtype = np.float32 if float32 else np.float64
+    puntuador = PuntuadorLineal(coef, intercept.item(), dtype=dtype, nombre=type(modelo).__name__)
+
+    # float32 pierde precisión: se admite hasta una milésima de punto de calificación
+    tolerancia = 1e-3 if float32 else 1e-6
+    if not verificar_paridad(modelo, puntuador, tolerancia=tolerancia):
+        return modelo
+    return puntuador
+
+
+# Tabla precalculada: 5 flags binarios (32 combinaciones) x lectura x escritura
+# en pasos de 0.1 entre 0 y 100. Se guarda la predicción final (recortada a 0-100)
+# en centésimas de punto como uint16: 32 x 1001 x 1001 x 2 bytes = ~64 MB.
+RUTA_TABLA = 'models/tabla_puntuaciones.npy'
+PASOS_PUNTUACION = 1001
+INDICES_FLAGS = [0, 1, 2, 5, 6]   # gender, lunch, test_prep, group_E, high_school
+INDICES_PUNTUACIONES = [3, 4]      # reading_score, writing_score
+
+
+def construir_tabla_puntuaciones(modelo):
+    """
+    Evaluar el modelo en todo el dominio de entrada posible del formulario
+    """
+    tabla = np.empty((2 ** len(INDICES_FLAGS), PASOS_PUNTUACION, PASOS_PUNTUACION), dtype=np.uint16)
+    valores = np.arange(PASOS_PUNTUACION) / 10
+    lectura, escritura = np.meshgrid(valores, valores, indexing='ij')
+    X = np.empty((lectura.size, len(VARIABLES_ORDEN)), dtype=np.float64)
+    X[:, INDICES_PUNTUACIONES[0]] = lectura.ravel()
+    X[:, INDICES_PUNTUACIONES[1]] = escritura.ravel()
+
+    for combinacion in range(tabla.shape[0]):
+        for posicion, indice in enumerate(INDICES_FLAGS):
+            # El primer flag es el bit más significativo
+            X[:, indice] = (combinacion >> (len(INDICES_FLAGS) - 1 - posicion)) & 1
+        prediccion = np.asarray(modelo.predict(X), dtype=np.float64).ravel()
+        centesimas = np.rint(np.clip(prediccion, 0, 100) * 100)
+        tabla[combinacion] = centesimas.reshape(PASOS_PUNTUACION, PASOS_PUNTUACION)
+    return tabla
+
+
+class MotorTabla:
+    """
+    Motor de predicción por consulta en tabla.
+    Las entradas dentro de la rejilla (flags 0/1, puntuaciones 0-100 en pasos
+    de 0.1) se responden con una lectura de la tabla; el resto se envía al
+    modelo real. Las predicciones de la tabla ya vienen recortadas a 0-100.
+    """
+
+    def __init__(self, tabla, modelo):
+        self.tabla = tabla
+        self.modelo = modelo
+        self.nombre = nombre_modelo(modelo)
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if len(X) == 1:
+            return self._predecir_fila(X)
+
+        flags = X[:, INDICES_FLAGS]
+        decimas = X[:, INDICES_PUNTUACIONES] * 10
+        indices = np.rint(decimas)
+        en_rejilla = (
+            np.all((flags == 0) | (flags == 1), axis=1)
+            & np.all(np.abs(decimas - indices) < 1e-6, axis=1)
+            & np.all((indices >= 0) & (indices < PASOS_PUNTUACION), axis=1)
+        )
+
+        resultado = np.empty(len(X), dtype=np.float64)
+        if en_rejilla.any():
+            pesos = 1 << np.arange(len(INDICES_FLAGS) - 1, -1, -1)
+            combinacion = flags[en_rejilla].astype(np.int64) @ pesos
+            indices = indices[en_rejilla].astype(np.int64)
+            resultado[en_rejilla] = self.tabla[combinacion, indices[:, 0], indices[:, 1]] / 100
+        if not en_rejilla.all():
+            # Fuera de la rejilla: se usa el modelo real
+            resultado[~en_rejilla] = np.asarray(self.modelo.predict(X[~en_rejilla]), dtype=np.float64).ravel()
+        return resultado
+
+    def _predecir_fila(self, X):
+        # Camino rápido para una sola fila (formulario): cálculo del índice en Python puro
+        fila = X[0].tolist()
+        combinacion = 0
+        for indice in INDICES_FLAGS:
+            if fila[indice] not in (0, 1):
+                return np.asarray(self.modelo.predict(X), dtype=np.float64).ravel()
+            combinacion = (combinacion << 1) | int(fila[indice])
+        posiciones = []
+        for indice in INDICES_PUNTUACIONES:
+            decimas = fila[indice] * 10
+            posicion = round(decimas)
+            if abs(decimas - posicion) >= 1e-6 or not 0 <= posicion < PASOS_PUNTUACION:
+                return np.asarray(self.modelo.predict(X), dtype=np.float64).ravel()
+            posiciones.append(posicion)
+        return np.array([self.tabla[combinacion, posiciones[0], posiciones[1]] / 100])
+
+
+def cargar_motor_tabla(modelo, ruta=RUTA_TABLA, guardar=True):
+    """
+    Abrir la tabla precalculada como archivo mapeado en memoria o, si no existe
+    o no corresponde al modelo, construirla (y guardarla en `ruta`).
+    """
+    tabla = None
+    if ruta and Path(ruta).exists():
+        try:
+            tabla = np.load(ruta, mmap_mode='r')
+            forma = (2 ** len(INDICES_FLAGS), PASOS_PUNTUACION, PASOS_PUNTUACION)
+            if tabla.shape != forma or tabla.dtype != np.uint16:
+                tabla = None
+        except (OSError, ValueError):
+            tabla = None
+
+    if tabla is not None:
+        # Una tabla de otro modelo se detecta comparando puntos de la rejilla con el modelo real
+        rng = np.random.default_rng(0)
+        X = np.zeros((256, len(VARIABLES_ORDEN)), dtype=np.float64)
+        X[:, INDICES_FLAGS] = rng.integers(0, 2, (256, len(INDICES_FLAGS)))
+        X[:, INDICES_PUNTUACIONES] = rng.integers(0, PASOS_PUNTUACION, (256, 2)) / 10
+        motor = MotorTabla(tabla, modelo)
+        if verificar_paridad(_ModeloRecortado(modelo), motor, X=X, tolerancia=0.011):
+            return motor
+
+    tabla = construir_tabla_puntuaciones(modelo)
+    if guardar and ruta:
+        Path(ruta).parent.mkdir(parents=True, exist_ok=True)
+        np.save(ruta, tabla)
+    return MotorTabla(tabla, modelo)
+
+
+class _ModeloRecortado:
+    """
+    Modelo con la salida recortada y redondeada como la de la tabla (para comparar)
+    """
+
+    def __init__(self, modelo):
+        self.modelo = modelo
+
+    def predict(self, X):
+        return np.round(np.clip(np.asarray(self.modelo.predict(X), dtype=np.float64), 0, 100), 2)
+
+
+def preparar_puntuador(modelo, float32=False, usar_tabla=False, ruta_tabla=RUTA_TABLA):
+    """
+    Compilar el modelo y, opcionalmente, envolverlo en el motor de tabla precalculada
+    """
+    puntuador = compilar_modelo(modelo, float32=float32)
+    if usar_tabla:
+        return cargar_motor_tabla(puntuador, ruta=ruta_tabla)
+    return puntuador
+
+
+@cache_recurso
+def cargar_puntuador(float32=False, usar_tabla=False):
+    """
+    Cargar el modelo y compilarlo para predicción rápida (ver compilar_modelo).
+    Con `usar_tabla` las entradas del formulario se responden desde la tabla precalculada.
+    Si hay registro de modelos, el puntuador detecta y carga las nuevas versiones
+    sin reiniciar el proceso (ver ModeloRecargable).
+    """
+    from src.registry import ModeloRecargable, existe_registro
+    
+    if existe_registro():
+        try:
+            return ModeloRecargable(float32=float32, usar_tabla=usar_tabla)
+        except Exception as e:
+            avisar(f"⚠️ No se pudo usar el registro de modelos: {str(e)}")
+    
+    modelo, _ = cargar_modelo()
+    if modelo is None:
+        return None
+    return preparar_puntuador(modelo, float32=float32, usar_tabla=usar_tabla)
+
+
+# R² en validación cruzada de lin_reg_model_opt (el modelo fuera del registro)
+R2_MODELO_BASE = 0.872151
+
+
+def r2_modelo(modelo):
+    """
+    R² del modelo: el del manifiesto si viene del registro (None si la versión no lo
+    tiene) o el de lin_reg_model_opt si no hay registro
+    """
+    metricas = getattr(modelo, 'metricas', None)
+    if metricas is None:
+        return R2_MODELO_BASE
+    return metricas.get('r2')
+
+
 def hacer_prediccion(datos_extraidos, modelo):
     """
     Hacer predicción usando el modelo cargado
     """
     try:
         # Preparar datos para el modelo (en el orden correcto)
-        variables_orden = [
-            'gender', 'lunch', 'test_preparation_course', 
-            'reading_score', 'writing_score', 'race_ethnicity_group_E', 
-            'parental_level_of_education_high_school'
-        ]
+        variables_orden = VARIABLES_ORDEN
         
         datos_para_modelo = [datos_extraidos[var] for var in variables_orden]
         
-        # Debug: Mostrar los datos que van al modelo
-        print("🔍 DEBUG - Datos que van al modelo:")
-        for i, (var, valor) in enumerate(zip(variables_orden, datos_para_modelo)):
-            print(f"  {i+1}. {var}: {valor} (tipo: {type(valor)})")
-        
-        print(f"📊 Lista completa de datos: {datos_para_modelo}")
-        print(f"📊 Tipos de datos: {[type(d) for d in datos_para_modelo]}")
-        
         # Convertir datos a array numpy
         datos_array = np.array(datos_para_modelo).reshape(1, -1)
-        
-        print(f"🔢 Array numpy resultante: {datos_array}")
-        print(f"🔢 Shape del array: {datos_array.shape}")
-        print(f"🔢 Dtype del array: {datos_array.dtype}")
+        logger.debug("Datos que van al modelo: %s", datos_array)
         
         # Hacer predicción
-        prediccion = modelo.predict(datos_array)
+        with medir('prediccion'):
+            prediccion = modelo.predict(datos_array)
+        contar('filas_predichas')
         
         # Obtener el valor de la predicción (ya en escala original)
         math_score = float(prediccion[0])
         
         # Validar que el resultado esté en el rango válido (0-100)
         if math_score < 0:
-            st.warning(f"⚠️ Predicción negativa detectada: {math_score}, estableciendo en 0")
+            avisar(f"⚠️ Predicción negativa detectada: {math_score}, estableciendo en 0")
             math_score = 0
         elif math_score > 100:
-            st.warning(f"⚠️ Predicción mayor a 100 detectada: {math_score}, estableciendo en 100")
+            avisar(f"⚠️ Predicción mayor a 100 detectada: {math_score}, estableciendo en 100")
             math_score = 100
         
-        # Usar la precisión real del modelo basada en validación cruzada
-        # R² = 0.872151 (87.2% de precisión)
-        confidence = 0.872151
+        # Precisión basada en validación cruzada (None si la versión del registro no la tiene)
+        confidence = r2_modelo(modelo)
         
         return {
             "math_score": round(math_score, 2),
             "confidence": round(confidence, 3) if confidence is not None else None,
             "model_info": {
-                "type": type(modelo).__name__,
+                "type": nombre_modelo(modelo),
                 "features_used": len(datos_para_modelo)
             }
         }
         
     except Exception as e:
-        st.error(f"❌ Error en predicción: {str(e)}")
-        raise
\ No newline at end of file
+        avisar(f"❌ Error en predicción: {str(e)}", nivel="error")
+        raise
+
+
+def predecir_lote(df_datos, modelo):
+    """
+    Hacer predicciones para todas las filas de un DataFrame con una sola llamada al modelo.
+    El DataFrame debe contener las variables del modelo (ver procesar_lote_desde_dataframe).
+    Devuelve un array con las calificaciones recortadas a 0-100 y redondeadas a 2 decimales.
+    """
+    faltantes = [var for var in VARIABLES_ORDEN if var not in df_datos.columns]
+    if faltantes:
+        raise ValueError(f"Variables faltantes: {faltantes}")
+
+    # Construir la matriz de variables una única vez (n_filas x 7)
+    return predecir_matriz(df_datos[VARIABLES_ORDEN].to_numpy(dtype=np.float64), modelo)
+
+
+def predecir_matriz(matriz, modelo):
+    """
+    Predicciones recortadas a 0-100 y redondeadas a 2 decimales para una matriz
+    (n_filas x 7) con las columnas en el orden de VARIABLES_ORDEN
+    """
+    if len(matriz) == 0:
+        return np.empty(0, dtype=np.float64)
+
+    with medir('prediccion'):
+        predicciones = np.asarray(modelo.predict(matriz), dtype=np.float64).ravel()
+    contar('filas_predichas', len(predicciones))
+
+    # Mismo recorte y redondeo que hacer_prediccion, pero sobre todo el array
+    return np.round(np.clip(predicciones, 0, 100), 2)
+
+
+def predecir_lote_validado(df_datos, modelo):
+    """
+    Como predecir_lote, pero validando antes todas las filas con el esquema de las
+    variables (ver validar_lote): las no válidas quedan con NaN en lugar de hacer
+    fallar el lote. Devuelve (predicciones, validacion).
+    """
+    validacion = validar_lote(df_datos)
+    predicciones = np.full(len(df_datos), np.nan)
+    predicciones[validacion['validos']] = predecir_matriz(matriz_validada(validacion), modelo)
+    return predicciones, validacion
+
+
+def puntuar_dataframe_validado(df, modelo, copiar=True):
+    """
+    Procesar un DataFrame en bruto (nombres de columna del CSV) y devolver
+    (DataFrame con la columna math_score_predicted, validacion); las filas que no
+    superan la validación quedan sin predicción (NaN)
+    """
+    predicciones, validacion = predecir_lote_validado(procesar_lote_desde_dataframe(df), modelo)
+    df_con_predicciones = df.copy() if copiar else df
+    df_con_predicciones['math_score_predicted'] = predicciones
+    return df_con_predicciones, validacion
+
+
+def puntuar_dataframe(df, modelo, copiar=True):
+    """
+    Procesar un DataFrame en bruto (nombres de columna del CSV) y devolverlo
+    con la columna math_score_predicted añadida
+    """
+    return puntuar_dataframe_validado(df, modelo, copiar=copiar)[0]
+
+
+def predecir_por_bloques(bloques, modelo, validaciones=None):
+    """
+    Puntuar una secuencia de DataFrames (por ejemplo, los bloques de
+    cargar_datos_desde_url_por_bloques) a medida que llegan.
+    Devuelve cada bloque con la columna math_score_predicted añadida; si se pasa
+    la lista `validaciones`, se le añade (bloque.index, validacion) de cada bloque.
+    """
+    for bloque in bloques:
+        bloque, validacion = puntuar_dataframe_validado(bloque, modelo, copiar=False)
+        if validaciones is not None:
+            validaciones.append((bloque.index, validacion))
+        yield bloque
+
+
+class PredictorAgrupado:
+    """
+    Envoltorio thread-safe de un modelo que agrupa predicciones concurrentes.
+    Las llamadas a predict con una sola fila que llegan desde varios hilos dentro
+    de una ventana de `espera_max` segundos se resuelven con una única llamada
+    matricial al modelo (hasta `max_lote` filas) y cada llamador recibe su resultado.
+    Con métricas activas registra el tamaño de cada lote, la profundidad de la
+    cola al despacharlo y la espera de cada petición.
+    """
+
+    def __init__(self, modelo, max_lote=256, espera_max=0.002, tiempo_max=30.0):
+        if max_lote < 1:
+            raise ValueError("max_lote debe ser al menos 1")
+        if espera_max < 0:
+            raise ValueError("espera_max no puede ser negativa")
+        self.modelo = modelo
+        self.max_lote = max_lote
+        self.espera_max = espera_max
+        # Límite de espera de cada llamador por su resultado
+        self.tiempo_max = tiempo_max
+        self._cola = queue.Queue()
+        self._hilo = threading.Thread(target=self._bucle, name='predictor-agrupado', daemon=True)
+        self._hilo.start()
+
+    @property
+    def nombre(self):
+        # Se consulta en cada uso: con ModeloRecargable puede cambiar en caliente
+        return nombre_modelo(self.modelo)
+
+    def __getattr__(self, atributo):
+        # metricas, version, ruta... se leen del modelo envuelto
+        if atributo == 'modelo':
+            raise AttributeError(atributo)
+        return getattr(self.modelo, atributo)
+
+    def profundidad_cola(self):
+        """
+        Peticiones en espera de entrar en un lote (aproximado)
+        """
+        return self._cola.qsize()
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.ndim != 2 or X.shape[1] != len(VARIABLES_ORDEN):
+            raise ValueError(f"Se esperaban filas de {len(VARIABLES_ORDEN)} variables, forma recibida: {X.shape}")
+        if len(X) != 1:
+            # Ya es un lote: no hace falta agruparlo
+            return np.asarray(self.modelo.predict(X), dtype=np.float64).ravel()
+
+        futuro = Future()
+        self._cola.put((X[0], futuro, time.perf_counter()))
+        return np.array([futuro.result(timeout=self.tiempo_max)])
+
+    def cerrar(self):
+        self._cola.put(None)
+        self._hilo.join()
+
+    def _bucle(self):
+        while True:
+            peticion = self._cola.get()
+            if peticion is None:
+                return
+            lote = [peticion]
+            cerrar = False
+
+            # Esperar como mucho espera_max a que lleguen más peticiones
+            limite = time.monotonic() + self.espera_max
+            while len(lote) < self.max_lote:
+                restante = limite - time.monotonic()
+                try:
+                    peticion = self._cola.get(timeout=restante) if restante > 0 else self._cola.get_nowait()
+                except queue.Empty:
+                    break
+                if peticion is None:
+                    cerrar = True
+                    break
+                lote.append(peticion)
+
+            self._resolver(lote)
+            if cerrar:
+                return
+
+    def _resolver(self, lote):
+        # Cualquier fallo se entrega a los llamadores: el hilo es compartido
+        # por todas las sesiones y no puede morir con una petición
+        try:
+            if metricas_activas():
+                despacho = time.perf_counter()
+                registrar_valor('agrupador_tamano_lote', len(lote))
+                # Lo que queda en cola al despachar: si crece, max_lote o el modelo no dan abasto
+                registrar_valor('agrupador_profundidad_cola', self._cola.qsize())
+                for _, _, encolada in lote:
+                    registrar_tiempo('agrupador_espera', despacho - encolada)
+                contar('agrupador_lotes')
+                contar('agrupador_peticiones', len(lote))
+
+            X = np.stack([fila for fila, _, _ in lote])
+            with medir('agrupador_prediccion_lote'):
+                predicciones = np.asarray(self.modelo.predict(X), dtype=np.float64).ravel()
+            if len(predicciones) != len(lote):
+                raise ValueError(f"El modelo devolvió {len(predicciones)} predicciones para {len(lote)} filas")
+        except Exception as e:
+            for _, futuro, _ in lote:
+                futuro.set_exception(e)
+            return
+        for (_, futuro, _), prediccion in zip(lote, predicciones):
+            futuro.set_result(float(prediccion))
+
+
+@cache_recurso
+def cargar_predictor_agrupado(float32=False, usar_tabla=False, max_lote=MAX_LOTE_AGRUPADO,
+                              espera_ms=ESPERA_AGRUPADO_MS):
+    """
+    PredictorAgrupado sobre el puntuador compartido de cargar_puntuador. Al estar en
+    caché de recursos hay una sola instancia por proceso, así que las predicciones
+    del formulario de todas las sesiones de Streamlit pasan por la misma cola.
+    """
+    puntuador = cargar_puntuador(float32=float32, usar_tabla=usar_tabla)
+    if puntuador is None:
+        return None
+    return PredictorAgrupado(puntuador, max_lote=max_lote, espera_max=espera_ms / 1000)
+
+
+if __name__ == '__main__':
+    # python -m src.model [ruta_pkl]: regenerar el artefacto ligero del modelo
+    import sys
+    print(f"✅ Artefacto ligero guardado en {exportar_modelo_ligero(*sys.argv[1:2])}")
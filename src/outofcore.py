@@ -0,0 +1,277 @@
+"""
+Puntuación fuera de memoria para archivos CSV que no caben en RAM.
+
+Trabaja en dos fases sobre un directorio de trabajo:
+
+1. Codificación: el CSV se lee una sola vez, por fragmentos de bytes alineados a
+   fin de línea (como en src.batch), y cada fragmento se codifica con
+   procesar_lote_desde_dataframe y se añade a caracteristicas.bin, una matriz
+   binaria (n_filas x 7) en el orden de VARIABLES_ORDEN.
+2. Predicción: caracteristicas.bin se recorre en bloques de `tamano_bloque` filas
+   y cada bloque se predice directamente en predicciones.npy. Cada bloque se mapea
+   por separado, así que la memoria residente depende del tamaño del bloque y no
+   del número de filas.
+
+estado.json guarda lo terminado en cada fase (fragmentos codificados, bytes
+escritos y bloques predichos); con --reanudar una ejecución interrumpida sigue
+desde el último fragmento o bloque terminado. Las predicciones se leen con
+leer_predicciones() (memmap) en el mismo orden de filas que el CSV.
+
+Se asume un CSV sin saltos de línea dentro de campos entre comillas (como
+StudentsPerformance.csv).
+
+Uso:
+    python -m src.outofcore historico.csv --directorio trabajo/
+    python -m src.outofcore historico.csv --directorio trabajo/ --reanudar
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import pickle
+import sys
+import time
+from pathlib import Path
+
+# Asegurar que la raíz del proyecto esté en el sys.path para importar `src`
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import numpy as np
+import pandas as pd
+
+from src.batch import planificar_fragmentos
+from src.data import matriz_validada, procesar_lote_desde_dataframe, validar_lote
+from src.model import VARIABLES_ORDEN, cargar_modelo, compilar_modelo, predecir_matriz
+
+ARCHIVO_CARACTERISTICAS = 'caracteristicas.bin'
+ARCHIVO_PREDICCIONES = 'predicciones.npy'
+ARCHIVO_ESTADO = 'estado.json'
+TAMANO_BLOQUE = 1_000_000
+TAMANO_FRAGMENTO = 32 * 1024 * 1024
+
+
+def _firma_entrada(ruta, tamano_fragmento, dtype):
+    estado = os.stat(ruta)
+    return {
+        'ruta': str(Path(ruta).resolve()), 'tamano': estado.st_size, 'mtime_ns': estado.st_mtime_ns,
+        'tamano_fragmento': tamano_fragmento, 'dtype': np.dtype(dtype).str,
+    }
+
+
+def _huella_modelo(modelo):
+    # Versión del registro si la hay; si no, hash del modelo serializado
+    version = getattr(modelo, 'version', None)
+    if version:
+        return str(version)
+    return hashlib.sha1(pickle.dumps(modelo)).hexdigest()[:16]
+
+
+def _guardar_estado(directorio, estado):
+    # Escritura atómica: el estado siempre describe trabajo ya escrito en disco
+    temporal = directorio / f"{ARCHIVO_ESTADO}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(estado, f, indent=2)
+    os.replace(temporal, directorio / ARCHIVO_ESTADO)
+
+
+def leer_estado(directorio):
+    try:
+        with open(Path(directorio) / ARCHIVO_ESTADO, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def preparar_directorio(ruta_csv, directorio, tamano_fragmento=TAMANO_FRAGMENTO, dtype=np.float64, reanudar=False):
+    """
+    Estado inicial (o el guardado, con `reanudar` y la misma entrada) del directorio de trabajo
+    """
+    directorio = Path(directorio)
+    firma = _firma_entrada(ruta_csv, tamano_fragmento, dtype)
+    estado = leer_estado(directorio) if reanudar else None
+    if estado is not None and estado['firma'] == firma:
+        return estado
+
+    # Solo se borran los archivos propios: el directorio puede contener otras cosas
+    directorio.mkdir(parents=True, exist_ok=True)
+    for nombre in (ARCHIVO_ESTADO, ARCHIVO_PREDICCIONES):
+        try:
+            (directorio / nombre).unlink()
+        except FileNotFoundError:
+            pass
+    cabecera, fragmentos = planificar_fragmentos(ruta_csv, tamano_fragmento)
+    estado = {
+        'firma': firma, 'cabecera': cabecera, 'fragmentos': fragmentos,
+        'columnas': VARIABLES_ORDEN,
+        'fragmentos_codificados': 0, 'bytes_codificados': 0, 'filas': 0, 'filas_invalidas': 0,
+        'modelo': None, 'tamano_bloque': None, 'bloques_predichos': 0,
+    }
+    open(directorio / ARCHIVO_CARACTERISTICAS, 'wb').close()
+    _guardar_estado(directorio, estado)
+    return estado
+
+
+def codificar(ruta_csv, directorio, estado, informar=print):
+    """
+    Fase 1: añadir a caracteristicas.bin los fragmentos aún no codificados
+    """
+    directorio = Path(directorio)
+    dtype = np.dtype(estado['firma']['dtype'])
+    ruta_caracteristicas = directorio / ARCHIVO_CARACTERISTICAS
+    total = len(estado['fragmentos'])
+    cabecera = estado['cabecera'].encode('utf-8')
+
+    with open(ruta_csv, 'rb') as entrada, open(ruta_caracteristicas, 'r+b') as salida:
+        # Descartar lo escrito después del último fragmento registrado (ejecución interrumpida)
+        salida.truncate(estado['bytes_codificados'])
+        salida.seek(estado['bytes_codificados'])
+        for i in range(estado['fragmentos_codificados'], total):
+            inicio, fin = estado['fragmentos'][i]
+            entrada.seek(inicio)
+            df = pd.read_csv(io.BytesIO(cabecera + entrada.read(fin - inicio)))
+            # Las filas que no superan la validación se guardan como NaN y quedan sin predicción
+            validacion = validar_lote(procesar_lote_desde_dataframe(df))
+            matriz = matriz_validada(validacion, dtype=dtype, rellenar=True)
+            salida.write(np.ascontiguousarray(matriz).tobytes())
+            salida.flush()
+            os.fsync(salida.fileno())
+
+            estado['fragmentos_codificados'] = i + 1
+            estado['bytes_codificados'] = salida.tell()
+            estado['filas'] += len(matriz)
+            estado['filas_invalidas'] += len(validacion['filas_invalidas'])
+            _guardar_estado(directorio, estado)
+            informar(f"  codificados {i + 1}/{total} fragmentos · {estado['filas']:,} filas")
+    return estado
+
+
+def _abrir_predicciones(directorio, filas, reanudar):
+    # Crea predicciones.npy (o lo reutiliza) y devuelve el desplazamiento de los datos
+    ruta = directorio / ARCHIVO_PREDICCIONES
+    if not reanudar:
+        if filas == 0:
+            np.save(ruta, np.empty(0, dtype=np.float64))
+        else:
+            predicciones = np.lib.format.open_memmap(ruta, mode='w+', dtype=np.float64, shape=(filas,))
+            predicciones.flush()
+            del predicciones
+    if filas == 0:
+        return None
+    return np.load(ruta, mmap_mode='r').offset
+
+
+def predecir(directorio, estado, modelo, tamano_bloque=TAMANO_BLOQUE, informar=print):
+    """
+    Fase 2: predecir por bloques de caracteristicas.bin a predicciones.npy
+    """
+    directorio = Path(directorio)
+    huella = _huella_modelo(modelo)
+    # Con otro modelo u otro tamaño de bloque no se reaprovechan bloques ya predichos
+    reanudar = (estado['modelo'] == huella and estado['tamano_bloque'] == tamano_bloque
+                and (directorio / ARCHIVO_PREDICCIONES).exists())
+    if not reanudar:
+        estado.update(modelo=huella, tamano_bloque=tamano_bloque, bloques_predichos=0)
+
+    filas = estado['filas']
+    desplazamiento = _abrir_predicciones(directorio, filas, reanudar)
+    _guardar_estado(directorio, estado)
+    if filas == 0:
+        return estado
+
+    dtype = np.dtype(estado['firma']['dtype'])
+    ancho = len(estado['columnas'])
+    bloques = -(-filas // tamano_bloque)
+    for b in range(estado['bloques_predichos'], bloques):
+        inicio = b * tamano_bloque
+        n = min(tamano_bloque, filas - inicio)
+        # Solo se mapea la región de este bloque en cada archivo
+        X = np.memmap(directorio / ARCHIVO_CARACTERISTICAS, dtype=dtype, mode='r',
+                      offset=inicio * ancho * dtype.itemsize, shape=(n, ancho))
+        salida = np.memmap(directorio / ARCHIVO_PREDICCIONES, dtype=np.float64, mode='r+',
+                           offset=desplazamiento + inicio * 8, shape=(n,))
+        # Las filas no válidas se codificaron como NaN: solo se predicen las completas
+        # (un estimador sin compilar rechaza cualquier NaN) y las demás quedan en NaN
+        completas = np.isfinite(X).all(axis=1)
+        if completas.all():
+            salida[:] = predecir_matriz(X, modelo)
+        else:
+            salida[:] = np.nan
+            salida[completas] = predecir_matriz(X[completas], modelo)
+        salida.flush()
+        del X, salida
+
+        estado['bloques_predichos'] = b + 1
+        _guardar_estado(directorio, estado)
+        informar(f"  predichos {b + 1}/{bloques} bloques · {inicio + n:,} filas")
+    return estado
+
+
+def terminado(estado):
+    """
+    True si las dos fases están completas
+    """
+    if estado is None or estado['fragmentos_codificados'] < len(estado['fragmentos']) or estado['modelo'] is None:
+        return False
+    return estado['bloques_predichos'] >= -(-estado['filas'] // estado['tamano_bloque'])
+
+
+def leer_predicciones(directorio):
+    """
+    Predicciones terminadas (memmap de solo lectura, en el orden de filas del CSV)
+    """
+    estado = leer_estado(directorio)
+    if not terminado(estado):
+        raise ValueError(f"La puntuación de {directorio} no ha terminado (usa --reanudar)")
+    return np.load(Path(directorio) / ARCHIVO_PREDICCIONES, mmap_mode='r')
+
+
+def puntuar_fuera_de_memoria(ruta_csv, directorio, modelo=None, tamano_bloque=TAMANO_BLOQUE,
+                             tamano_fragmento=TAMANO_FRAGMENTO, dtype=np.float64, reanudar=False,
+                             informar=print):
+    """
+    Codificar y predecir `ruta_csv` en `directorio`; devuelve (filas, segundos)
+    """
+    if tamano_bloque <= 0:
+        raise ValueError("El tamaño de bloque debe ser mayor que 0")
+    if modelo is None:
+        modelo, _ = cargar_modelo()
+        if modelo is None:
+            raise RuntimeError("No se pudo cargar el modelo")
+        modelo = compilar_modelo(modelo)
+
+    inicio = time.perf_counter()
+    estado = preparar_directorio(ruta_csv, directorio, tamano_fragmento, dtype, reanudar)
+    informar(f"📂 {len(estado['fragmentos'])} fragmento(s), {estado['fragmentos_codificados']} ya codificados")
+    estado = codificar(ruta_csv, directorio, estado, informar)
+    estado = predecir(directorio, estado, modelo, tamano_bloque, informar)
+    if estado['filas_invalidas']:
+        informar(f"⚠️ {estado['filas_invalidas']:,} filas no superaron la validación y quedaron sin predicción (NaN)")
+    return estado['filas'], time.perf_counter() - inicio
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Puntuar un CSV más grande que la memoria con archivos mapeados")
+    parser.add_argument('entrada', help="Archivo CSV con el formato de StudentsPerformance.csv")
+    parser.add_argument('--directorio', required=True, help="Directorio de trabajo (características, predicciones y estado)")
+    parser.add_argument('--tamano-bloque', type=int, default=TAMANO_BLOQUE, help="Filas por bloque de predicción")
+    parser.add_argument('--tamano-fragmento-mb', type=float, default=TAMANO_FRAGMENTO / (1024 * 1024),
+                        help="MB del CSV que se codifican de una vez")
+    parser.add_argument('--float32', action='store_true', help="Guardar las características en float32 (mitad de disco)")
+    parser.add_argument('--reanudar', action='store_true', help="Seguir desde el último fragmento o bloque terminado")
+    args = parser.parse_args(argv)
+
+    filas, segundos = puntuar_fuera_de_memoria(
+        args.entrada, args.directorio, tamano_bloque=args.tamano_bloque,
+        tamano_fragmento=int(args.tamano_fragmento_mb * 1024 * 1024),
+        dtype=np.float32 if args.float32 else np.float64, reanudar=args.reanudar
+    )
+    print(f"🎯 {filas:,} filas puntuadas en {segundos:.2f} s ({filas / max(segundos, 1e-9):,.0f} filas/s)")
+    print(f"✅ {Path(args.directorio) / ARCHIVO_PREDICCIONES}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,309 @@
+"""
+Registro de versiones del modelo en models/registro.
+
+Estructura:
+    models/registro/manifiesto.json       versión activa y datos de cada versión
+    models/registro/v0001/modelo.pkl      artefacto de la versión
+    models/registro/v0001/modelo.json     exportación ligera (si el modelo es lineal)
+
+Cada versión del manifiesto guarda el archivo, su checksum sha256, el orden de
+las variables y las métricas. El manifiesto se reescribe de forma atómica, así
+que activar una versión es un único rename. ModeloRecargable vigila el manifiesto
+y cambia de versión en caliente, sin reiniciar la app.
+
+Uso:
+    python -m src.registry registrar nuevo_modelo.pkl --r2 0.873
+    python -m src.registry activar v0002
+    python -m src.registry listar
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Asegurar que la raíz del proyecto esté en el sys.path para importar `src`
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.model import (
+    VARIABLES_ORDEN, PuntuadorLineal, cargar_modelo_desde_ruta,
+    compilar_modelo, exportar_modelo_ligero, nombre_modelo, preparar_puntuador, usar_modelo_ligero
+)
+from src.utils import avisar, sha256_archivo
+
+DIR_REGISTRO = Path(os.environ.get('REGISTRO_MODELOS_DIR', 'models/registro'))
+NOMBRE_MANIFIESTO = 'manifiesto.json'
+ARCHIVO_BLOQUEO = '.bloqueo'
+
+
+def existe_registro(directorio=None):
+    return (Path(directorio or DIR_REGISTRO) / NOMBRE_MANIFIESTO).exists()
+
+
+def leer_manifiesto(directorio=None):
+    ruta = Path(directorio or DIR_REGISTRO) / NOMBRE_MANIFIESTO
+    if not ruta.exists():
+        return {'version_actual': None, 'versiones': {}}
+    with open(ruta, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _guardar_manifiesto(manifiesto, directorio):
+    # Escritura atómica: los lectores ven el manifiesto anterior o el nuevo, nunca uno a medias
+    ruta = Path(directorio) / NOMBRE_MANIFIESTO
+    temporal = ruta.with_suffix(f'.{os.getpid()}.tmp')
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, indent=2, ensure_ascii=False)
+    os.replace(temporal, ruta)
+
+
+@contextlib.contextmanager
+def _bloqueo_registro(directorio):
+    """
+    Bloqueo exclusivo entre procesos para leer, modificar y reescribir el manifiesto
+    (dos `registrar` a la vez elegirían el mismo número o pisarían la entrada del otro).
+    Los lectores no lo necesitan: el manifiesto se reemplaza de forma atómica.
+    """
+    with open(Path(directorio) / ARCHIVO_BLOQUEO, 'a+b') as f:
+        if os.name == 'nt':
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == 'nt':
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _siguiente_numero(manifiesto, directorio):
+    # Se cuentan también los directorios vNNNN que existan sin estar en el manifiesto
+    numeros = [int(v[1:]) for v in manifiesto['versiones']]
+    numeros += [int(p.name[1:]) for p in directorio.glob('v*') if p.is_dir() and p.name[1:].isdigit()]
+    return max(numeros or [0]) + 1
+
+
+def registrar_modelo(ruta_pkl, metricas=None, activar=True, directorio=None):
+    """
+    Copiar un .pkl al registro como una nueva versión y (opcionalmente) activarla.
+    La versión se prepara en un directorio temporal y solo se mueve a vNNNN
+    cuando el artefacto se ha cargado correctamente.
+    """
+    directorio = Path(directorio or DIR_REGISTRO)
+    directorio.mkdir(parents=True, exist_ok=True)
+    with _bloqueo_registro(directorio):
+        manifiesto = leer_manifiesto(directorio)
+
+        version = f"v{_siguiente_numero(manifiesto, directorio):04d}"
+        temporal = directorio / f".{version}.{os.getpid()}.tmp"
+        shutil.rmtree(temporal, ignore_errors=True)
+        temporal.mkdir()
+        try:
+            destino = temporal / 'modelo.pkl'
+            shutil.copyfile(ruta_pkl, destino)
+
+            # Comprobar que el artefacto se puede cargar antes de registrarlo
+            modelo, _ = cargar_modelo_desde_ruta(destino, usar_ligero=False)
+            if isinstance(compilar_modelo(modelo), PuntuadorLineal):
+                exportar_modelo_ligero(destino)
+            sha256 = sha256_archivo(destino)
+            temporal.rename(directorio / version)
+        except BaseException:
+            shutil.rmtree(temporal, ignore_errors=True)
+            raise
+
+        manifiesto['versiones'][version] = {
+            'archivo': f"{version}/modelo.pkl",
+            'sha256': sha256,
+            'tipo': type(modelo).__name__,
+            'variables': VARIABLES_ORDEN,
+            'metricas': dict(metricas or {}),
+            'creado': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        }
+        if activar or manifiesto['version_actual'] is None:
+            manifiesto['version_actual'] = version
+        _guardar_manifiesto(manifiesto, directorio)
+        return version
+
+
+def activar_version(version, directorio=None):
+    directorio = Path(directorio or DIR_REGISTRO)
+    if not existe_registro(directorio):
+        raise ValueError(f"La versión {version} no existe en el registro")
+    with _bloqueo_registro(directorio):
+        manifiesto = leer_manifiesto(directorio)
+        if version not in manifiesto['versiones']:
+            raise ValueError(f"La versión {version} no existe en el registro")
+        manifiesto['version_actual'] = version
+        _guardar_manifiesto(manifiesto, directorio)
+
+
+def cargar_version(version, directorio=None, usar_ligero=True):
+    """
+    Cargar una versión del registro comprobando su checksum y el orden de las variables.
+    Devuelve (modelo, entrada del manifiesto con 'version' y 'ruta_cargada').
+    """
+    directorio = Path(directorio or DIR_REGISTRO)
+    entrada = leer_manifiesto(directorio)['versiones'].get(version)
+    if entrada is None:
+        raise ValueError(f"La versión {version} no existe en el registro")
+    if entrada.get('variables') != VARIABLES_ORDEN:
+        raise ValueError(f"La versión {version} usa otro orden de variables: {entrada.get('variables')}")
+
+    ruta = directorio / entrada['archivo']
+    if sha256_archivo(ruta) != entrada['sha256']:
+        raise ValueError(f"El checksum de {ruta} no coincide con el manifiesto")
+
+    modelo, ruta_cargada = cargar_modelo_desde_ruta(ruta, usar_ligero=usar_ligero)
+    return modelo, dict(entrada, version=version, ruta_cargada=ruta_cargada)
+
+
+def cargar_version_activa(directorio=None, usar_ligero=True):
+    """
+    Cargar la versión activa; devuelve (None, None) si no hay registro
+    """
+    manifiesto = leer_manifiesto(directorio)
+    if not manifiesto.get('version_actual'):
+        return None, None
+    return cargar_version(manifiesto['version_actual'], directorio, usar_ligero=usar_ligero)
+
+
+class _VersionCargada:
+    __slots__ = ('version', 'entrada', 'puntuador')
+
+    def __init__(self, version, entrada, puntuador):
+        self.version = version
+        self.entrada = entrada
+        self.puntuador = puntuador
+
+
+class ModeloRecargable:
+    """
+    Puntuador que sigue la versión activa del registro.
+    Cada `intervalo` segundos, como mucho, una llamada a predict comprueba la
+    fecha y el tamaño del manifiesto; si cambió, carga la nueva versión y la
+    sustituye con una sola asignación. Las predicciones en curso terminan con
+    la versión anterior y, si la nueva no se puede cargar (checksum, variables...),
+    se sigue sirviendo la actual.
+    """
+
+    def __init__(self, directorio=None, float32=False, usar_tabla=False, intervalo=2.0):
+        self.directorio = Path(directorio or DIR_REGISTRO)
+        self.float32 = float32
+        self.usar_tabla = usar_tabla
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._firma = None
+        self._proxima = 0.0
+        self._actual = None
+        self.comprobar(forzar=True)
+        if self._actual is None:
+            raise ValueError(f"No hay ninguna versión activa válida en {self.directorio}")
+
+    @property
+    def version(self):
+        return self._actual.version
+
+    @property
+    def nombre(self):
+        return nombre_modelo(self._actual.puntuador)
+
+    @property
+    def metricas(self):
+        return self._actual.entrada.get('metricas', {})
+
+    @property
+    def ruta(self):
+        return self._actual.entrada['ruta_cargada']
+
+    def predict(self, X):
+        if time.monotonic() >= self._proxima:
+            self.comprobar()
+        return self._actual.puntuador.predict(X)
+
+    def _firma_manifiesto(self):
+        try:
+            estado = (self.directorio / NOMBRE_MANIFIESTO).stat()
+        except OSError:
+            return None
+        return estado.st_mtime_ns, estado.st_size
+
+    def comprobar(self, forzar=False):
+        """
+        Cargar la versión activa si el manifiesto cambió. Devuelve True si se cambió de versión.
+        """
+        # Si otro hilo ya está recargando, se sigue con la versión actual sin esperar
+        if not self._lock.acquire(blocking=forzar):
+            return False
+        try:
+            self._proxima = time.monotonic() + self.intervalo
+            firma = self._firma_manifiesto()
+            if firma == self._firma and not forzar:
+                return False
+            self._firma = firma
+
+            try:
+                version = leer_manifiesto(self.directorio).get('version_actual')
+                if not version or (self._actual is not None and self._actual.version == version):
+                    return False
+                modelo, entrada = cargar_version(version, self.directorio, usar_ligero=usar_modelo_ligero())
+                puntuador = preparar_puntuador(
+                    modelo, float32=self.float32, usar_tabla=self.usar_tabla,
+                    ruta_tabla=self.directorio / version / 'tabla_puntuaciones.npy'
+                )
+            except Exception as e:
+                avisar(f"⚠️ No se pudo cargar la nueva versión del modelo: {str(e)}")
+                return False
+
+            self._actual = _VersionCargada(version, entrada, puntuador)
+            return True
+        finally:
+            self._lock.release()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Registro de versiones del modelo")
+    parser.add_argument('--directorio', default=None, help=f"Directorio del registro (por defecto {DIR_REGISTRO})")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    registrar = subparsers.add_parser('registrar', help="Añadir un .pkl como nueva versión")
+    registrar.add_argument('ruta_pkl')
+    registrar.add_argument('--r2', type=float, default=None, help="R² de validación cruzada")
+    registrar.add_argument('--no-activar', action='store_true', help="Registrar sin activar la versión")
+
+    activar = subparsers.add_parser('activar', help="Activar una versión existente")
+    activar.add_argument('version')
+
+    subparsers.add_parser('listar', help="Mostrar las versiones registradas")
+    args = parser.parse_args(argv)
+
+    if args.comando == 'registrar':
+        metricas = {'r2': args.r2} if args.r2 is not None else {}
+        version = registrar_modelo(args.ruta_pkl, metricas, activar=not args.no_activar, directorio=args.directorio)
+        print(f"✅ Registrada la versión {version}")
+    elif args.comando == 'activar':
+        activar_version(args.version, directorio=args.directorio)
+        print(f"✅ Versión activa: {args.version}")
+    else:
+        manifiesto = leer_manifiesto(args.directorio)
+        for version, entrada in sorted(manifiesto['versiones'].items()):
+            marca = '*' if version == manifiesto['version_actual'] else ' '
+            print(f"{marca} {version}  {entrada['tipo']:<20} {entrada['creado']}  métricas: {entrada['metricas']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Vista paginada de los resultados de un lote puntuado.
+
+Para no enviar al navegador un DataFrame de cientos de miles de filas, la app
+solo materializa la página visible. Lo que depende del lote completo (estadísticas,
+histograma y orden por math_score_predicted) se calcula una vez al guardarlo con
+preparar_vista(); después, ordenar y filtrar por rango son búsquedas binarias
+sobre ese orden y cada página es un único iloc.
+"""
+
+import numpy as np
+import pandas as pd
+
+COLUMNA_PREDICCION = 'math_score_predicted'
+BORDES_HISTOGRAMA = np.linspace(0, 100, 21)
+
+ORDEN_ORIGINAL = 'original'
+ORDEN_ASCENDENTE = 'ascendente'
+ORDEN_DESCENDENTE = 'descendente'
+
+
+def resumen_predicciones(predicciones):
+    """
+    Estadísticas de las predicciones de un lote (se calculan una sola vez por lote)
+    """
+    valores = np.asarray(predicciones, dtype=np.float64)
+    validos = valores[~np.isnan(valores)]
+    if len(validos) == 0:
+        return {'filas': len(valores), 'validas': 0}
+    p5, p25, p50, p75, p95 = np.percentile(validos, [5, 25, 50, 75, 95])
+    cuentas, _ = np.histogram(validos, bins=BORDES_HISTOGRAMA)
+    return {
+        'filas': len(valores),
+        'validas': len(validos),
+        'media': float(validos.mean()),
+        'desviacion': float(validos.std()),
+        'minimo': float(validos.min()),
+        'maximo': float(validos.max()),
+        'percentiles': {'p5': p5, 'p25': p25, 'p50': p50, 'p75': p75, 'p95': p95},
+        'histograma': pd.DataFrame({
+            'rango': [f"{int(a)}-{int(b)}" for a, b in zip(BORDES_HISTOGRAMA[:-1], BORDES_HISTOGRAMA[1:])],
+            'filas': cuentas,
+        }),
+    }
+
+
+def preparar_vista(df_con_predicciones):
+    """
+    Datos de la vista que dependen del lote completo: resumen y orden por predicción
+    """
+    predicciones = df_con_predicciones[COLUMNA_PREDICCION].to_numpy(dtype=np.float64)
+    # Orden estable; los NaN quedan al final
+    orden = np.argsort(predicciones, kind='stable')
+    if len(orden) < np.iinfo(np.int32).max:
+        orden = orden.astype(np.int32)
+    return {
+        'resumen': resumen_predicciones(predicciones),
+        'orden': orden,
+        'ordenadas': predicciones[orden],
+    }
+
+
+def seleccionar_filas(df_con_predicciones, vista, orden=ORDEN_ORIGINAL, minimo=None, maximo=None):
+    """
+    Posiciones (iloc) de las filas con la predicción en [minimo, maximo], en el orden pedido
+    """
+    if orden == ORDEN_ORIGINAL:
+        if minimo is None and maximo is None:
+            return None  # todas, sin reordenar
+        predicciones = df_con_predicciones[COLUMNA_PREDICCION].to_numpy(dtype=np.float64)
+        mascara = np.ones(len(predicciones), dtype=bool)
+        if minimo is not None:
+            mascara &= predicciones >= minimo
+        if maximo is not None:
+            mascara &= predicciones <= maximo
+        return np.flatnonzero(mascara)
+
+    # Con el orden precalculado el filtro por rango es un tramo contiguo
+    ordenadas = vista['ordenadas']
+    inicio = 0 if minimo is None else np.searchsorted(ordenadas, minimo, side='left')
+    if minimo is None and maximo is None:
+        fin = len(ordenadas)  # incluye las filas sin predicción (NaN)
+    else:
+        fin = np.searchsorted(ordenadas, np.inf if maximo is None else maximo, side='right')
+    posiciones = vista['orden'][inicio:fin]
+    if orden == ORDEN_DESCENDENTE:
+        validas = vista['resumen']['validas']
+        if fin > validas:
+            # Las filas sin predicción siguen al final también en orden descendente
+            return np.concatenate([vista['orden'][inicio:validas][::-1], vista['orden'][validas:fin]])
+        return posiciones[::-1]
+    return posiciones
+
+
+def numero_paginas(total_filas, tamano_pagina):
+    return max(1, -(-total_filas // tamano_pagina))
+
+
+def obtener_pagina(df_con_predicciones, posiciones, pagina, tamano_pagina):
+    """
+    Materializar solo la página `pagina` (desde 1) de las filas seleccionadas
+    """
+    total = len(df_con_predicciones) if posiciones is None else len(posiciones)
+    pagina = min(max(1, pagina), numero_paginas(total, tamano_pagina))
+    inicio = (pagina - 1) * tamano_pagina
+    fin = min(inicio + tamano_pagina, total)
+    if posiciones is None:
+        return df_con_predicciones.iloc[inicio:fin]
+    return df_con_predicciones.iloc[posiciones[inicio:fin]]
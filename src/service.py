@@ -0,0 +1,184 @@
+"""
+Servicio HTTP (JSON) para pedir predicciones sin pasar por la interfaz de Streamlit.
+
+Endpoints:
+    GET  /salud            -> estado del servicio y tipo de modelo
+    GET  /metricas         -> tiempos por etapa y contadores (con --metricas o METRICAS=1)
+    POST /predecir         -> un registro: {"gender": "male", "reading_score": 72, ...}
+    POST /predecir/lote    -> varios registros: {"registros": [{...}, {...}]}
+                              (los no válidos reciben null y se detallan en "errores")
+
+Las peticiones individuales que llegan a la vez se agrupan en una sola llamada
+al modelo (ver PredictorAgrupado).
+
+Uso:
+    python -m src.service --host 0.0.0.0 --port 8000
+"""
+
+import argparse
+import json
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Asegurar que la raíz del proyecto esté en el sys.path para importar `src`
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import numpy as np
+import pandas as pd
+
+from src.data import comprobar_registro, describir_errores, procesar_lote_desde_dataframe
+from src.features import COLUMNAS_CATEGORICAS, mapear_valor_categorico
+from src.metrics import activar_metricas, instantanea
+from src.model import (
+    ESPERA_AGRUPADO_MS, MAX_LOTE_AGRUPADO, VARIABLES_ORDEN, PredictorAgrupado, cargar_puntuador,
+    compilar_modelo, hacer_prediccion, nombre_modelo, predecir_lote_validado
+)
+
+# Tamaño máximo del cuerpo de una petición (10 MB)
+MAX_CUERPO = 10 * 1024 * 1024
+
+
+def preparar_registro(registro):
+    """
+    Convertir un registro JSON en las variables del modelo (mismo mapeo que el CSV)
+    y validarlo con las mismas reglas que /predecir/lote
+    """
+    if not isinstance(registro, dict):
+        raise ValueError("El registro debe ser un objeto JSON")
+    datos = {}
+    for var in VARIABLES_ORDEN:
+        if var not in registro:
+            raise ValueError(f"Variable faltante: {var}")
+        valor = registro[var]
+        if var in COLUMNAS_CATEGORICAS:
+            valor = mapear_valor_categorico(var, valor)
+        try:
+            datos[var] = float(valor)
+        except (TypeError, ValueError):
+            raise ValueError(f"Valor no numérico para {var}: {valor!r}")
+    comprobar_registro(datos)
+    return datos
+
+
+class _ManejadorPrediccion(BaseHTTPRequestHandler):
+    # HTTP/1.1 para que los clientes reutilicen la conexión
+    protocol_version = 'HTTP/1.1'
+    # TCP_NODELAY: las cabeceras y el cuerpo van en escrituras separadas y, con Nagle
+    # y el ACK retardado del cliente, cada respuesta keep-alive esperaría ~40 ms
+    disable_nagle_algorithm = True
+
+    def log_message(self, formato, *args):
+        pass
+
+    def _responder(self, estado, cuerpo):
+        datos = json.dumps(cuerpo, ensure_ascii=False).encode('utf-8')
+        self.send_response(estado)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def _leer_json(self):
+        longitud = int(self.headers.get('Content-Length') or 0)
+        if longitud <= 0:
+            raise ValueError("El cuerpo de la petición está vacío")
+        if longitud > MAX_CUERPO:
+            raise ValueError("El cuerpo de la petición es demasiado grande")
+        try:
+            return json.loads(self.rfile.read(longitud))
+        except json.JSONDecodeError as e:
+            raise ValueError(f"JSON no válido: {str(e)}")
+
+    def do_GET(self):
+        if self.path == '/salud':
+            self._responder(200, {"estado": "ok", "modelo": self.server.predictor.nombre})
+        elif self.path == '/metricas':
+            self._responder(200, instantanea())
+        else:
+            self._responder(404, {"error": "Ruta no encontrada"})
+
+    def do_POST(self):
+        try:
+            if self.path == '/predecir':
+                datos = preparar_registro(self._leer_json())
+                resultado = hacer_prediccion(datos, self.server.predictor)
+                self._responder(200, resultado)
+            elif self.path == '/predecir/lote':
+                cuerpo = self._leer_json()
+                registros = cuerpo.get('registros') if isinstance(cuerpo, dict) else cuerpo
+                if not isinstance(registros, list):
+                    raise ValueError("Se esperaba una lista 'registros'")
+                errores = []
+                if registros:
+                    # Los nombres de columna alternativos del CSV también valen aquí
+                    datos_lote = procesar_lote_desde_dataframe(pd.DataFrame(registros))
+                    predicciones, validacion = predecir_lote_validado(datos_lote, self.server.puntuador)
+                    # Los registros no válidos reciben null y se detallan en "errores"
+                    errores = describir_errores(validacion).to_dict('records')
+                    predicciones = [None if np.isnan(p) else p for p in predicciones.tolist()]
+                else:
+                    predicciones = []
+                self._responder(200, {"predicciones": predicciones, "filas": len(predicciones), "errores": errores})
+            else:
+                self._responder(404, {"error": "Ruta no encontrada"})
+        except ValueError as e:
+            self._responder(400, {"error": str(e)})
+        except Exception as e:
+            self._responder(500, {"error": f"Error en predicción: {str(e)}"})
+
+
+class ServidorPrediccion(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, direccion, puntuador, max_lote=MAX_LOTE_AGRUPADO, espera_max=ESPERA_AGRUPADO_MS / 1000):
+        super().__init__(direccion, _ManejadorPrediccion)
+        self.puntuador = puntuador
+        self.predictor = PredictorAgrupado(puntuador, max_lote=max_lote, espera_max=espera_max)
+
+    def server_close(self):
+        super().server_close()
+        self.predictor.cerrar()
+
+
+def crear_servidor(host='127.0.0.1', port=8000, modelo=None, max_lote=MAX_LOTE_AGRUPADO,
+                   espera_max=ESPERA_AGRUPADO_MS / 1000):
+    """
+    Crear el servidor de predicción (sin arrancarlo) con el modelo de cargar_puntuador
+    """
+    if modelo is None:
+        # Con registro de modelos, el puntuador cambia de versión en caliente
+        puntuador = cargar_puntuador()
+        if puntuador is None:
+            raise RuntimeError("No se pudo cargar el modelo")
+    else:
+        puntuador = compilar_modelo(modelo)
+    return ServidorPrediccion((host, port), puntuador, max_lote=max_lote, espera_max=espera_max)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio HTTP de predicción de calificaciones matemáticas")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--max-lote', type=int, default=MAX_LOTE_AGRUPADO, help="Máximo de peticiones agrupadas por llamada al modelo")
+    parser.add_argument('--espera-ms', type=float, default=ESPERA_AGRUPADO_MS, help="Ventana de agrupación en milisegundos")
+    parser.add_argument('--metricas', action='store_true', help="Registrar tiempos por etapa (GET /metricas)")
+    args = parser.parse_args(argv)
+    if args.metricas:
+        activar_metricas()
+
+    servidor = crear_servidor(args.host, args.port, max_lote=args.max_lote, espera_max=args.espera_ms / 1000)
+    print(f"🚀 Servicio de predicción en http://{args.host}:{args.port} (modelo: {nombre_modelo(servidor.puntuador)})")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == '__main__':
+    main()
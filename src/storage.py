@@ -0,0 +1,235 @@
+"""
+Almacenamiento columnar tipado de los datos procesados.
+
+Cada tabla es un directorio con un .npy por columna y un esquema.json:
+
+    data/processed/df_linear/esquema.json
+    data/processed/df_linear/math_score.npy      uint8
+    data/processed/df_linear/gender.npy          uint8
+    ...
+
+Al guardar, cada columna usa el tipo más pequeño que conserva sus valores:
+las banderas 0/1 (aunque el CSV las escriba como 0.0/1.0) y las puntuaciones
+0-100 pasan a uint8, los enteros mayores a int16/int32/int64, los decimales a
+float32 si no pierden precisión y el texto a códigos de categoría. Al leer se
+cargan solo las columnas pedidas y con memmap, así que no se parsea nada y solo
+se traen a memoria las páginas que se usan. El CSV sigue disponible con exportar_csv.
+
+Uso:
+    python -m src.storage convertir data/processed/df_linear.csv data/processed/df_tree.csv
+    python -m src.storage info data/processed/df_linear
+    python -m src.storage exportar data/processed/df_linear salida.csv
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+
+# Asegurar que la raíz del proyecto esté en el sys.path para importar `src`
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import numpy as np
+import pandas as pd
+
+NOMBRE_ESQUEMA = 'esquema.json'
+TIPOS_ENTEROS = [np.uint8, np.int8, np.uint16, np.int16, np.int32, np.int64]
+
+
+def tipo_compacto(valores):
+    """
+    Tipo numpy más pequeño que representa exactamente `valores` (array numérico sin nulos)
+    """
+    if valores.dtype == bool:
+        return np.dtype(np.uint8)
+    if len(valores) == 0:
+        return valores.dtype
+    if np.issubdtype(valores.dtype, np.integer) or np.all(np.mod(valores, 1) == 0):
+        minimo, maximo = valores.min(), valores.max()
+        for tipo in TIPOS_ENTEROS:
+            info = np.iinfo(tipo)
+            if info.min <= minimo and maximo <= info.max:
+                return np.dtype(tipo)
+    if np.array_equal(valores.astype(np.float32).astype(valores.dtype), valores):
+        return np.dtype(np.float32)
+    return valores.dtype
+
+
+def _columna_compacta(serie):
+    # Devuelve (array a guardar, entrada del esquema)
+    if not pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+        codigos, categorias = pd.factorize(serie, sort=True)
+        tipo = tipo_compacto(codigos[codigos >= 0]) if (codigos >= 0).any() else np.dtype(np.int8)
+        if np.iinfo(tipo).min >= 0 and (codigos < 0).any():
+            tipo = np.dtype(np.int16 if len(categorias) > 127 else np.int8)
+        return codigos.astype(tipo), {'tipo': 'categoria', 'codigos': tipo.str,
+                                      'categorias': [str(c) for c in categorias]}
+    valores = serie.to_numpy()
+    if serie.isna().any():
+        # Con nulos se conserva el flotante (NaN); float32 si es exacto
+        valores = valores.astype(np.float64)
+        tipo = np.dtype(np.float32) if np.array_equal(
+            valores.astype(np.float32).astype(np.float64), valores, equal_nan=True) else valores.dtype
+    else:
+        tipo = tipo_compacto(valores)
+    return valores.astype(tipo), {'tipo': 'numerico', 'dtype': tipo.str, 'dtype_origen': str(serie.dtype)}
+
+
+def guardar_tabla(df, directorio, origen=None):
+    """
+    Guardar un DataFrame como directorio columnar (escritura atómica del directorio)
+    """
+    directorio = Path(directorio)
+    directorio.parent.mkdir(parents=True, exist_ok=True)
+    temporal = directorio.with_name(f"{directorio.name}.{os.getpid()}.tmp")
+    shutil.rmtree(temporal, ignore_errors=True)
+    temporal.mkdir()
+
+    esquema = {'filas': len(df), 'columnas': {}, 'orden': [str(c) for c in df.columns], 'origen': origen}
+    for i, columna in enumerate(df.columns):
+        valores, entrada = _columna_compacta(df[columna])
+        entrada['archivo'] = f"{i:03d}.npy"
+        np.save(temporal / entrada['archivo'], valores)
+        esquema['columnas'][str(columna)] = entrada
+    with open(temporal / NOMBRE_ESQUEMA, 'w', encoding='utf-8') as f:
+        json.dump(esquema, f, indent=2, ensure_ascii=False)
+
+    shutil.rmtree(directorio, ignore_errors=True)
+    os.replace(temporal, directorio)
+    return directorio
+
+
+def leer_esquema(directorio):
+    with open(Path(directorio) / NOMBRE_ESQUEMA, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def cargar_columnas(directorio, columnas=None, mmap=True):
+    """
+    Devolver {columna: array} de las columnas pedidas (códigos para las categóricas)
+    """
+    directorio = Path(directorio)
+    esquema = leer_esquema(directorio)
+    columnas = list(columnas or esquema['orden'])
+    faltantes = [c for c in columnas if c not in esquema['columnas']]
+    if faltantes:
+        raise ValueError(f"Columnas faltantes en {directorio}: {faltantes}")
+    modo = 'r' if mmap else None
+    return {c: np.load(directorio / esquema['columnas'][c]['archivo'], mmap_mode=modo) for c in columnas}
+
+
+def cargar_tabla(directorio, columnas=None, mmap=True):
+    """
+    Cargar las columnas pedidas como DataFrame sin copiar los datos numéricos
+    """
+    esquema = leer_esquema(directorio)
+    arrays = cargar_columnas(directorio, columnas, mmap=mmap)
+    datos = {}
+    for columna, valores in arrays.items():
+        entrada = esquema['columnas'][columna]
+        if entrada['tipo'] == 'categoria':
+            datos[columna] = pd.Categorical.from_codes(np.asarray(valores, dtype=np.int64), entrada['categorias'])
+        else:
+            datos[columna] = valores
+    return pd.DataFrame(datos, copy=False)
+
+
+def cargar_matriz(directorio, columnas, dtype=np.float64):
+    """
+    Matriz (filas, columnas) con el tipo pedido, leída solo de las columnas necesarias
+    """
+    arrays = cargar_columnas(directorio, columnas)
+    matriz = np.empty((leer_esquema(directorio)['filas'], len(columnas)), dtype=dtype)
+    for j, columna in enumerate(columnas):
+        matriz[:, j] = arrays[columna]
+    return matriz
+
+
+def exportar_csv(directorio, ruta_csv, restaurar_tipos=True):
+    """
+    Escribir la tabla como CSV; con restaurar_tipos las columnas recuperan el tipo del CSV original
+    """
+    esquema = leer_esquema(directorio)
+    df = cargar_tabla(directorio, mmap=False)
+    if restaurar_tipos:
+        for columna, entrada in esquema['columnas'].items():
+            if entrada['tipo'] == 'numerico':
+                df[columna] = df[columna].astype(entrada['dtype_origen'])
+            else:
+                df[columna] = df[columna].astype(object)
+    df.to_csv(ruta_csv, index=False)
+
+
+def _firma_origen(ruta_csv):
+    estado = os.stat(ruta_csv)
+    return {'ruta': str(ruta_csv), 'tamano': estado.st_size, 'mtime_ns': estado.st_mtime_ns}
+
+
+def directorio_columnar(ruta_csv):
+    """
+    Directorio columnar asociado a un CSV: data/processed/df_linear.csv -> data/processed/df_linear
+    """
+    ruta_csv = Path(ruta_csv)
+    return ruta_csv.with_name(ruta_csv.stem)
+
+
+def convertir_csv(ruta_csv, directorio=None):
+    directorio = directorio or directorio_columnar(ruta_csv)
+    return guardar_tabla(pd.read_csv(ruta_csv), directorio, origen=_firma_origen(ruta_csv))
+
+
+def leer_procesado(ruta_csv, columnas=None):
+    """
+    Leer un CSV procesado desde su versión columnar si está al día con el CSV.
+    Si no existe (o el CSV cambió) se lee el CSV y se intenta crear para la próxima vez.
+    """
+    directorio = directorio_columnar(ruta_csv)
+    try:
+        if leer_esquema(directorio).get('origen') == _firma_origen(ruta_csv):
+            return cargar_tabla(directorio, columnas)
+    except (OSError, ValueError):
+        pass
+
+    df = pd.read_csv(ruta_csv)
+    try:
+        guardar_tabla(df, directorio, origen=_firma_origen(ruta_csv))
+    except OSError:
+        pass  # directorio de solo lectura: se sigue con el CSV
+    return df[list(columnas)] if columnas else df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Almacenamiento columnar de los datos procesados")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+    convertir = subparsers.add_parser('convertir', help="Convertir CSV al formato columnar")
+    convertir.add_argument('csv', nargs='+')
+    info = subparsers.add_parser('info', help="Mostrar el esquema de una tabla")
+    info.add_argument('directorio')
+    exportar = subparsers.add_parser('exportar', help="Exportar una tabla a CSV")
+    exportar.add_argument('directorio')
+    exportar.add_argument('salida')
+    args = parser.parse_args(argv)
+
+    if args.comando == 'convertir':
+        for ruta in args.csv:
+            directorio = convertir_csv(ruta)
+            tamano = sum(p.stat().st_size for p in Path(directorio).iterdir())
+            print(f"✅ {ruta} -> {directorio} ({os.path.getsize(ruta):,} -> {tamano:,} bytes)")
+    elif args.comando == 'info':
+        esquema = leer_esquema(args.directorio)
+        print(f"{esquema['filas']:,} filas")
+        for columna in esquema['orden']:
+            entrada = esquema['columnas'][columna]
+            tipo = entrada.get('dtype') or f"categoria[{entrada['codigos']}]"
+            print(f"  {columna:<50} {tipo}")
+    else:
+        exportar_csv(args.directorio, args.salida)
+        print(f"✅ {args.salida}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+"""
+Entrenamiento reproducible del modelo lineal sin conexión.
+
+Sustituye a los cuadernos 02_1_model_training_lineal_regression.ipynb y
+03_evaluation.ipynb: lee data/processed/df_linear.csv del disco, evalúa los
+candidatos (LinearRegression, Ridge, Lasso, ElasticNet) con validación cruzada
+KFold(5, shuffle, random_state=42) y guarda el ganador en models/.
+
+Cada par (candidato, fold) es una tarea independiente de un pool de procesos.
+La matriz X, el objetivo y los índices de los folds se guardan en .cache/entrenamiento
+(clave: sha256 del CSV, columnas y configuración de los folds), así que las
+ejecuciones siguientes no vuelven a parsear el CSV y los procesos trabajadores
+abren las matrices con memmap en lugar de recibir copias.
+
+Uso:
+    python -m src.train
+    python -m src.train --salida models/lin_reg_model_opt.pkl --registrar
+"""
+
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# Asegurar que la raíz del proyecto esté en el sys.path para importar `src`
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import numpy as np
+import pandas as pd
+
+from src.model import VARIABLES_ORDEN
+from src.storage import leer_procesado
+from src.utils import sha256_archivo
+
+RUTA_DATOS_LINEAL = 'data/processed/df_linear.csv'
+OBJETIVO = 'math_score'
+DIR_CACHE_ENTRENAMIENTO = Path(os.environ.get('CACHE_ENTRENAMIENTO_DIR', '.cache/entrenamiento'))
+N_FOLDS = 5
+SEMILLA = 42
+
+# Candidatos de los cuadernos: nombre -> (clase, hiperparámetros)
+CANDIDATOS_LINEALES = {
+    'LinearRegression': ('sklearn.linear_model.LinearRegression', {}),
+    'Ridge': ('sklearn.linear_model.Ridge', {'alpha': 1.0}),
+    'Lasso': ('sklearn.linear_model.Lasso', {'alpha': 0.01}),
+    'ElasticNet': ('sklearn.linear_model.ElasticNet', {'alpha': 0.01, 'l1_ratio': 0.5}),
+}
+
+# Datos abiertos una vez por proceso trabajador
+_datos_trabajador = None
+
+
+def crear_estimador(clase, parametros):
+    """
+    Instanciar un estimador a partir de su ruta 'paquete.modulo.Clase' (importación diferida)
+    """
+    modulo, nombre = clase.rsplit('.', 1)
+    return getattr(importlib.import_module(modulo), nombre)(**parametros)
+
+
+def _generar_folds(n_filas, n_folds, semilla):
+    # Misma partición que KFold(n_splits, shuffle=True, random_state) de sklearn
+    from sklearn.model_selection import KFold
+    cv = KFold(n_splits=n_folds, shuffle=True, random_state=semilla)
+    return [prueba for _, prueba in cv.split(np.zeros((n_filas, 1)))]
+
+
+def preparar_datos(ruta=RUTA_DATOS_LINEAL, columnas=None, objetivo=OBJETIVO, n_folds=N_FOLDS,
+                   semilla=SEMILLA, directorio_cache=None):
+    """
+    Devolver el directorio de caché con X.npy, y.npy, folds.npz y meta.json para este CSV.
+    Si ya existe (mismo contenido y configuración) no se vuelve a leer el CSV.
+    """
+    columnas = list(columnas or VARIABLES_ORDEN)
+    firma = json.dumps({
+        'sha256': sha256_archivo(ruta), 'columnas': columnas, 'objetivo': objetivo,
+        'n_folds': n_folds, 'semilla': semilla,
+    }, sort_keys=True)
+    directorio = Path(directorio_cache or DIR_CACHE_ENTRENAMIENTO) / hashlib.sha256(firma.encode('utf-8')).hexdigest()[:16]
+    if (directorio / 'meta.json').exists():
+        return directorio
+
+    df = leer_procesado(ruta)
+    faltantes = [c for c in columnas + [objetivo] if c not in df.columns]
+    if faltantes:
+        raise ValueError(f"Columnas faltantes en {ruta}: {faltantes}")
+    X = np.ascontiguousarray(df[columnas].to_numpy(dtype=np.float64))
+    y = df[objetivo].to_numpy(dtype=np.float64)
+    folds = _generar_folds(len(df), n_folds, semilla)
+
+    # Escritura en un directorio temporal y rename: la caché está completa o no existe
+    directorio.parent.mkdir(parents=True, exist_ok=True)
+    temporal = directorio.with_name(f"{directorio.name}.{os.getpid()}.tmp")
+    temporal.mkdir(exist_ok=True)
+    np.save(temporal / 'X.npy', X)
+    np.save(temporal / 'y.npy', y)
+    np.savez(temporal / 'folds.npz', *folds)
+    with open(temporal / 'meta.json', 'w', encoding='utf-8') as f:
+        json.dump(dict(json.loads(firma), ruta=str(ruta), filas=len(df)), f, indent=2)
+    try:
+        os.replace(temporal, directorio)
+    except OSError:
+        # Otro proceso la creó a la vez; vale cualquiera de las dos
+        import shutil
+        shutil.rmtree(temporal, ignore_errors=True)
+    return directorio
+
+
+def abrir_datos(directorio):
+    """
+    Abrir una caché de preparar_datos: (X, y, folds) con X e y en memmap de solo lectura
+    """
+    directorio = Path(directorio)
+    X = np.load(directorio / 'X.npy', mmap_mode='r')
+    y = np.load(directorio / 'y.npy', mmap_mode='r')
+    with np.load(directorio / 'folds.npz') as archivo:
+        folds = [archivo[f'arr_{i}'] for i in range(len(archivo.files))]
+    return X, y, folds
+
+
+def metricas_regresion(y_real, y_pred):
+    error = y_real - y_pred
+    suma_cuadrados = float(np.dot(error, error))
+    total = float(np.sum((y_real - y_real.mean()) ** 2))
+    return {
+        'r2': 1 - suma_cuadrados / total if total else 0.0,
+        'mae': float(np.mean(np.abs(error))),
+        'rmse': float(np.sqrt(suma_cuadrados / len(error))),
+    }
+
+
+def inicializar_trabajador(directorio):
+    global _datos_trabajador
+    _datos_trabajador = abrir_datos(directorio)
+
+
+def evaluar_fold(nombre, clase, parametros, indice_fold, n_filas=None):
+    """
+    Ajustar en el resto de folds y puntuar en `indice_fold` (en el proceso trabajador).
+    Con n_filas se entrena con una submuestra fija de ese tamaño (la misma en cada llamada).
+    """
+    X, y, folds = _datos_trabajador
+    prueba = folds[indice_fold]
+    mascara = np.ones(len(y), dtype=bool)
+    mascara[prueba] = False
+    entrenamiento = np.flatnonzero(mascara)
+    if n_filas is not None and n_filas < len(entrenamiento):
+        orden = np.random.default_rng(SEMILLA + indice_fold).permutation(entrenamiento)
+        entrenamiento = np.sort(orden[:n_filas])
+
+    estimador = crear_estimador(clase, parametros)
+    inicio = time.perf_counter()
+    estimador.fit(X[entrenamiento], y[entrenamiento])
+    segundos = time.perf_counter() - inicio
+    resultado = metricas_regresion(y[prueba], estimador.predict(X[prueba]))
+    resultado.update(modelo=nombre, fold=indice_fold, filas=len(entrenamiento), segundos_ajuste=segundos)
+    return resultado
+
+
+def validar_candidatos(directorio, candidatos=None, procesos=None):
+    """
+    Validación cruzada de todos los candidatos; devuelve un DataFrame ordenado por R² medio
+    """
+    candidatos = candidatos or CANDIDATOS_LINEALES
+    n_folds = len(abrir_datos(directorio)[2])
+    tareas = [(nombre, clase, parametros, i)
+              for nombre, (clase, parametros) in candidatos.items() for i in range(n_folds)]
+
+    if procesos == 1:
+        inicializar_trabajador(directorio)
+        por_fold = [evaluar_fold(*tarea) for tarea in tareas]
+    else:
+        with ProcessPoolExecutor(max_workers=procesos, initializer=inicializar_trabajador,
+                                 initargs=(str(directorio),)) as pool:
+            por_fold = list(pool.map(evaluar_fold, *zip(*tareas)))
+
+    df = pd.DataFrame(por_fold)
+    resumen = df.groupby('modelo').agg(
+        r2_media=('r2', 'mean'), r2_std=('r2', lambda s: float(np.std(s))),
+        mae_media=('mae', 'mean'), rmse_media=('rmse', 'mean'), segundos_ajuste=('segundos_ajuste', 'sum'),
+    )
+    return resumen.sort_values('r2_media', ascending=False).reset_index()
+
+
+def entrenar_final(directorio, nombre, candidatos=None):
+    """
+    Ajustar el candidato `nombre` con todos los datos
+    """
+    candidatos = candidatos or CANDIDATOS_LINEALES
+    clase, parametros = candidatos[nombre]
+    X, y, _ = abrir_datos(directorio)
+    estimador = crear_estimador(clase, parametros)
+    estimador.fit(np.asarray(X), np.asarray(y))
+    return estimador
+
+
+def guardar_modelo(modelo, ruta_salida):
+    """
+    Guardar el modelo con joblib (y su exportación ligera si es lineal) de forma atómica
+    """
+    import joblib
+    from src.model import PuntuadorLineal, compilar_modelo, exportar_modelo_ligero
+
+    ruta_salida = Path(ruta_salida)
+    ruta_salida.parent.mkdir(parents=True, exist_ok=True)
+    temporal = ruta_salida.with_name(f"{ruta_salida.name}.{os.getpid()}.tmp")
+    joblib.dump(modelo, temporal)
+    os.replace(temporal, ruta_salida)
+    if isinstance(compilar_modelo(modelo), PuntuadorLineal):
+        exportar_modelo_ligero(ruta_salida)
+    return ruta_salida
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Entrenar y seleccionar el modelo lineal con validación cruzada")
+    parser.add_argument('--datos', default=RUTA_DATOS_LINEAL, help=f"CSV procesado (por defecto {RUTA_DATOS_LINEAL})")
+    parser.add_argument('--salida', default='models/modelo_entrenado.pkl', help="Ruta del modelo ganador")
+    parser.add_argument('--procesos', type=int, default=None, help="Procesos trabajadores (1 = sin pool)")
+    parser.add_argument('--folds', type=int, default=N_FOLDS)
+    parser.add_argument('--semilla', type=int, default=SEMILLA)
+    parser.add_argument('--registrar', action='store_true', help="Añadir el ganador al registro de modelos y activarlo")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    directorio = preparar_datos(args.datos, n_folds=args.folds, semilla=args.semilla)
+    resultados = validar_candidatos(directorio, procesos=args.procesos)
+    print(f"📊 Resultados con validación cruzada ({args.folds} folds):")
+    print(resultados.to_string(index=False, float_format=lambda v: f"{v:.6f}"))
+
+    ganador = resultados.iloc[0]
+    modelo = entrenar_final(directorio, ganador['modelo'])
+    ruta = guardar_modelo(modelo, args.salida)
+    print(f"✅ {ganador['modelo']} (R² {ganador['r2_media']:.6f}) guardado en {ruta}")
+
+    if args.registrar:
+        from src.registry import registrar_modelo
+        version = registrar_modelo(ruta, {'r2': round(float(ganador['r2_media']), 6)})
+        print(f"✅ Registrada y activada la versión {version}")
+    print(f"⏱️ {time.perf_counter() - inicio:.2f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,366 @@
+"""
+Ajuste de hiperparámetros de los modelos de árboles por successive halving.
+
+El cuaderno 02_2_model_training_decision_trees.ipynb solo compara DecisionTree,
+RandomForest, GradientBoosting e HistGradientBoosting con sus valores por defecto.
+Aquí se muestrea un conjunto de configuraciones de cada uno y se evalúan por rondas
+con la validación cruzada de src/train.py sobre data/processed/df_tree.csv:
+
+    ronda 0: todas las configuraciones, entrenando con --min-filas filas por fold
+    ronda i: el mejor 1/--factor de la ronda anterior, con --factor veces más filas
+    última:  los finalistas con todas las filas de entrenamiento
+
+Cada (configuración, fold, filas) es una tarea del pool de procesos. Los resultados
+se añaden a .cache/ajuste/<firma>/resultados.jsonl en cuanto terminan, así que
+con --presupuesto-s la búsqueda se corta a tiempo (las tareas en cola se cancelan
+y los ajustes en curso se interrumpen) y con --reanudar continúa donde lo dejó
+sin repetir tareas. Al final se ajustan en el proceso principal los
+mejores candidatos con todos los datos para medir el tiempo de ajuste y la latencia
+de predicción (un registro y lote completo), que se añaden a la tabla de resultados.
+
+Uso:
+    python -m src.tuning --presupuesto-s 120
+    python -m src.tuning --reanudar --salida resultados_ajuste.csv
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import math
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+# Asegurar que la raíz del proyecto esté en el sys.path para importar `src`
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import numpy as np
+import pandas as pd
+
+from src.train import (
+    OBJETIVO, SEMILLA, abrir_datos, crear_estimador, evaluar_fold, inicializar_trabajador, preparar_datos
+)
+
+RUTA_DATOS_ARBOLES = 'data/processed/df_tree.csv'
+DIR_AJUSTE = Path(os.environ.get('CACHE_AJUSTE_DIR', '.cache/ajuste'))
+
+# Espacio de búsqueda: nombre -> (clase, parámetros fijos, rejilla)
+# Los ensembles usan un solo hilo: el paralelismo lo da el pool de procesos
+ESPACIOS_ARBOLES = {
+    'DecisionTree': ('sklearn.tree.DecisionTreeRegressor', {'random_state': SEMILLA}, {
+        'max_depth': [3, 4, 5, 6, 8, None],
+        'min_samples_leaf': [1, 5, 10, 20, 40],
+    }),
+    'RandomForest': ('sklearn.ensemble.RandomForestRegressor', {'random_state': SEMILLA, 'n_jobs': 1}, {
+        'n_estimators': [100, 300],
+        'max_depth': [4, 6, 8, None],
+        'min_samples_leaf': [1, 5, 10],
+        'max_features': [1.0, 0.5, 'sqrt'],
+    }),
+    'GradientBoosting': ('sklearn.ensemble.GradientBoostingRegressor', {'random_state': SEMILLA}, {
+        'n_estimators': [100, 200, 400],
+        'learning_rate': [0.02, 0.05, 0.1],
+        'max_depth': [2, 3, 4],
+        'subsample': [0.7, 1.0],
+    }),
+    'HistGradientBoosting': ('sklearn.ensemble.HistGradientBoostingRegressor',
+                             {'random_state': SEMILLA, 'early_stopping': True, 'n_iter_no_change': 20}, {
+        'max_iter': [200, 500],
+        'learning_rate': [0.03, 0.1],
+        'max_leaf_nodes': [7, 15, 31],
+        'min_samples_leaf': [10, 20, 40],
+        'l2_regularization': [0.0, 1.0],
+    }),
+}
+
+
+def generar_configuraciones(espacios=None, max_por_modelo=24, semilla=SEMILLA):
+    """
+    Muestrear hasta `max_por_modelo` combinaciones de cada rejilla (siempre las mismas para una semilla).
+    Devuelve {id: {'modelo', 'clase', 'parametros'}}.
+    """
+    espacios = espacios or ESPACIOS_ARBOLES
+    rng = np.random.default_rng(semilla)
+    configuraciones = {}
+    for modelo, (clase, fijos, rejilla) in espacios.items():
+        claves = sorted(rejilla)
+        combinaciones = list(itertools.product(*(rejilla[c] for c in claves)))
+        if len(combinaciones) > max_por_modelo:
+            elegidas = np.sort(rng.choice(len(combinaciones), max_por_modelo, replace=False))
+            combinaciones = [combinaciones[i] for i in elegidas]
+        for valores in combinaciones:
+            parametros = dict(fijos, **dict(zip(claves, valores)))
+            id_config = hashlib.sha1(
+                json.dumps([clase, parametros], sort_keys=True).encode('utf-8')
+            ).hexdigest()[:12]
+            configuraciones[id_config] = {'modelo': modelo, 'clase': clase, 'parametros': parametros}
+    return configuraciones
+
+
+def planificar_rondas(n_configuraciones, filas_entrenamiento, min_filas=100, factor=3):
+    """
+    Lista de (configuraciones que pasan, filas por fold) de cada ronda
+    """
+    rondas = []
+    candidatos = n_configuraciones
+    filas = min(min_filas, filas_entrenamiento)
+    while True:
+        rondas.append((candidatos, filas))
+        if filas >= filas_entrenamiento or candidatos <= 1:
+            break
+        candidatos = max(1, math.ceil(candidatos / factor))
+        filas = min(filas * factor, filas_entrenamiento)
+    # La última ronda siempre usa todas las filas
+    rondas[-1] = (rondas[-1][0], filas_entrenamiento)
+    return rondas
+
+
+class EstadoAjuste:
+    """
+    Resultados ya calculados, persistidos en un JSONL de solo añadir
+    """
+
+    def __init__(self, directorio, reanudar=False):
+        self.directorio = Path(directorio)
+        if not reanudar:
+            shutil.rmtree(self.directorio, ignore_errors=True)
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self.ruta = self.directorio / 'resultados.jsonl'
+        self.resultados = {}
+        if self.ruta.exists():
+            with open(self.ruta, 'r', encoding='utf-8') as f:
+                for linea in f:
+                    try:
+                        r = json.loads(linea)
+                    except json.JSONDecodeError:
+                        continue  # última línea cortada por una interrupción
+                    self.resultados[(r['id'], r['fold'], r['filas_objetivo'])] = r
+
+    def __contains__(self, clave):
+        return clave in self.resultados
+
+    def guardar(self, resultado):
+        self.resultados[(resultado['id'], resultado['fold'], resultado['filas_objetivo'])] = resultado
+        with open(self.ruta, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(resultado) + '\n')
+
+    def resumen(self, id_config, filas_objetivo, n_folds):
+        por_fold = [self.resultados.get((id_config, i, filas_objetivo)) for i in range(n_folds)]
+        if any(r is None for r in por_fold):
+            return None
+        r2 = [r['r2'] for r in por_fold]
+        return {
+            'r2_media': float(np.mean(r2)),
+            'r2_std': float(np.std(r2)),
+            'mae_media': float(np.mean([r['mae'] for r in por_fold])),
+            'rmse_media': float(np.mean([r['rmse'] for r in por_fold])),
+            'segundos_ajuste_fold': float(np.mean([r['segundos_ajuste'] for r in por_fold])),
+        }
+
+
+def _ejecutar_tareas(tareas, directorio_datos, estado, procesos, limite, informar):
+    # Devuelve False si se agotó el presupuesto antes de terminar
+    if not tareas:
+        return True
+    pool = ProcessPoolExecutor(max_workers=procesos, initializer=inicializar_trabajador,
+                               initargs=(str(directorio_datos),))
+    completado = False
+    try:
+        futuros = {
+            pool.submit(evaluar_fold, id_config, config['clase'], config['parametros'], fold, filas): (id_config, fold, filas)
+            for id_config, config, fold, filas in tareas
+        }
+        pendientes = set(futuros)
+        hechos = 0
+        while pendientes:
+            # Se espera como mucho hasta el límite, aunque ningún ajuste termine antes
+            restante = None if limite is None else limite - time.monotonic()
+            if restante is not None and restante <= 0:
+                return False
+            listos, pendientes = wait(pendientes, timeout=restante, return_when=FIRST_COMPLETED)
+            for futuro in listos:
+                id_config, fold, filas = futuros[futuro]
+                resultado = futuro.result()
+                resultado.update(id=id_config, fold=fold, filas_objetivo=filas)
+                estado.guardar(resultado)
+                hechos += 1
+                if hechos % 50 == 0:
+                    informar(f"  {hechos}/{len(tareas)} tareas")
+        completado = True
+        return True
+    finally:
+        if completado:
+            pool.shutdown()
+        else:
+            # El presupuesto es un límite estricto: se cancelan las tareas en cola y se
+            # terminan los ajustes en curso (con --reanudar se repiten solo esos)
+            trabajadores = list((pool._processes or {}).values())
+            pool.shutdown(wait=False, cancel_futures=True)
+            for trabajador in trabajadores:
+                trabajador.terminate()
+
+
+def buscar(ruta_datos=RUTA_DATOS_ARBOLES, espacios=None, max_por_modelo=24, min_filas=100, factor=3,
+           procesos=None, presupuesto_s=None, reanudar=False, informar=print):
+    """
+    Successive halving sobre las configuraciones de `espacios`.
+    Devuelve (DataFrame con la mejor ronda alcanzada por cada configuración, configuraciones, directorio de datos).
+    """
+    limite = time.monotonic() + presupuesto_s if presupuesto_s else None
+    columnas = [c for c in pd.read_csv(ruta_datos, nrows=0).columns if c != OBJETIVO]
+    directorio_datos = preparar_datos(ruta_datos, columnas=columnas)
+    _, y, folds = abrir_datos(directorio_datos)
+    n_folds = len(folds)
+    filas_entrenamiento = min(len(y) - len(f) for f in folds)
+
+    configuraciones = generar_configuraciones(espacios, max_por_modelo)
+    rondas = planificar_rondas(len(configuraciones), filas_entrenamiento, min_filas, factor)
+    firma = json.dumps({
+        'datos': directorio_datos.name, 'configuraciones': sorted(configuraciones), 'rondas': rondas,
+    }, sort_keys=True)
+    estado = EstadoAjuste(DIR_AJUSTE / hashlib.sha256(firma.encode('utf-8')).hexdigest()[:16], reanudar)
+    informar(f"🌳 {len(configuraciones)} configuraciones, rondas (candidatos, filas): {rondas}")
+
+    vivos = list(configuraciones)
+    for numero, (n_candidatos, filas) in enumerate(rondas):
+        if numero > 0:
+            # Pasan los mejores de la ronda anterior según el R² medio
+            anterior = rondas[numero - 1][1]
+            vivos.sort(key=lambda i: -estado.resumen(i, anterior, n_folds)['r2_media'])
+            vivos = vivos[:n_candidatos]
+        tareas = [(i, configuraciones[i], fold, filas) for i in vivos for fold in range(n_folds)
+                  if (i, fold, filas) not in estado]
+        informar(f"▶️ Ronda {numero}: {len(vivos)} configuraciones × {n_folds} folds con {filas} filas "
+                 f"({len(tareas)} tareas pendientes)")
+        if not _ejecutar_tareas(tareas, directorio_datos, estado, procesos, limite, informar):
+            informar("⏱️ Presupuesto agotado; usa --reanudar para continuar")
+            break
+
+    # Cada configuración se clasifica por la ronda más profunda que completó
+    filas_tabla = []
+    for id_config, config in configuraciones.items():
+        for numero in range(len(rondas) - 1, -1, -1):
+            resumen = estado.resumen(id_config, rondas[numero][1], n_folds)
+            if resumen is not None:
+                filas_tabla.append(dict(
+                    id=id_config, modelo=config['modelo'], ronda=numero, filas=rondas[numero][1],
+                    parametros=json.dumps({k: v for k, v in config['parametros'].items()
+                                           if k in (espacios or ESPACIOS_ARBOLES)[config['modelo']][2]}),
+                    **resumen
+                ))
+                break
+    tabla = pd.DataFrame(filas_tabla)
+    if not tabla.empty:
+        tabla = tabla.sort_values(['ronda', 'r2_media'], ascending=[False, False]).reset_index(drop=True)
+    return tabla, configuraciones, directorio_datos
+
+
+def medir_coste(estimador, X, repeticiones=200, max_segundos=0.5):
+    """
+    (µs por registro individual, filas/s en lote) de estimator.predict
+    """
+    fila = np.ascontiguousarray(X[:1])
+    estimador.predict(fila)
+    tiempos = []
+    limite = time.perf_counter() + max_segundos
+    # Mediana de llamadas sueltas; los ensembles grandes se cortan por tiempo
+    while len(tiempos) < repeticiones and (len(tiempos) < 5 or time.perf_counter() < limite):
+        inicio = time.perf_counter()
+        estimador.predict(fila)
+        tiempos.append(time.perf_counter() - inicio)
+    inicio = time.perf_counter()
+    estimador.predict(X)
+    lote = time.perf_counter() - inicio
+    return float(np.median(tiempos)) * 1e6, len(X) / lote
+
+
+def anadir_coste_servicio(tabla, configuraciones, directorio_datos, n_mejores=10):
+    """
+    Ajustar con todos los datos los `n_mejores` y el mejor de cada modelo y medir su coste
+    """
+    if tabla.empty:
+        return tabla
+    X, y, _ = abrir_datos(directorio_datos)
+    X, y = np.asarray(X), np.asarray(y)
+    elegidos = set(tabla.head(n_mejores)['id']) | set(tabla.groupby('modelo').head(1)['id'])
+    tabla = tabla.copy()
+    for columna in ('segundos_ajuste_completo', 'latencia_registro_us', 'filas_por_segundo_lote'):
+        tabla[columna] = np.nan
+    for indice, fila in tabla[tabla['id'].isin(elegidos)].iterrows():
+        config = configuraciones[fila['id']]
+        estimador = crear_estimador(config['clase'], config['parametros'])
+        inicio = time.perf_counter()
+        estimador.fit(X, y)
+        tabla.loc[indice, 'segundos_ajuste_completo'] = time.perf_counter() - inicio
+        latencia, rendimiento = medir_coste(estimador, X)
+        tabla.loc[indice, 'latencia_registro_us'] = latencia
+        tabla.loc[indice, 'filas_por_segundo_lote'] = rendimiento
+    return tabla
+
+
+def referencia_lineal():
+    """
+    LinearRegression sobre df_linear.csv con los mismos folds, como fila de comparación
+    """
+    from src.train import CANDIDATOS_LINEALES, validar_candidatos
+    directorio = preparar_datos()
+    resumen = validar_candidatos(
+        directorio, {'LinearRegression': CANDIDATOS_LINEALES['LinearRegression']}, procesos=1
+    ).iloc[0]
+    X, y, folds = abrir_datos(directorio)
+    X, y = np.asarray(X), np.asarray(y)
+    estimador = crear_estimador(*CANDIDATOS_LINEALES['LinearRegression'])
+    inicio = time.perf_counter()
+    estimador.fit(X, y)
+    ajuste = time.perf_counter() - inicio
+    latencia, rendimiento = medir_coste(estimador, X)
+    return {
+        'id': 'referencia', 'modelo': 'LinearRegression (df_linear)', 'ronda': None,
+        'filas': min(len(y) - len(f) for f in folds), 'parametros': '{}',
+        'r2_media': resumen['r2_media'], 'r2_std': resumen['r2_std'],
+        'mae_media': resumen['mae_media'], 'rmse_media': resumen['rmse_media'],
+        'segundos_ajuste_fold': resumen['segundos_ajuste'] / len(folds),
+        'segundos_ajuste_completo': ajuste, 'latencia_registro_us': latencia, 'filas_por_segundo_lote': rendimiento,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Successive halving de los modelos de árboles")
+    parser.add_argument('--datos', default=RUTA_DATOS_ARBOLES, help=f"CSV procesado (por defecto {RUTA_DATOS_ARBOLES})")
+    parser.add_argument('--procesos', type=int, default=None, help="Procesos trabajadores (por defecto, uno por núcleo)")
+    parser.add_argument('--presupuesto-s', type=float, default=None, help="Tiempo máximo de búsqueda en segundos")
+    parser.add_argument('--reanudar', action='store_true', help="Reutilizar los resultados de una búsqueda anterior")
+    parser.add_argument('--max-por-modelo', type=int, default=24, help="Configuraciones muestreadas por modelo")
+    parser.add_argument('--min-filas', type=int, default=100, help="Filas de entrenamiento en la primera ronda")
+    parser.add_argument('--factor', type=int, default=3, help="Factor de reducción entre rondas")
+    parser.add_argument('--mejores', type=int, default=10, help="Candidatos a los que medir la latencia")
+    parser.add_argument('--salida', default=None, help="Guardar la tabla de resultados en este CSV")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    tabla, configuraciones, directorio_datos = buscar(
+        args.datos, max_por_modelo=args.max_por_modelo, min_filas=args.min_filas, factor=args.factor,
+        procesos=args.procesos, presupuesto_s=args.presupuesto_s, reanudar=args.reanudar
+    )
+    tabla = anadir_coste_servicio(tabla, configuraciones, directorio_datos, args.mejores)
+    tabla = pd.concat([tabla, pd.DataFrame([referencia_lineal()])], ignore_index=True)
+
+    columnas = ['modelo', 'ronda', 'filas', 'r2_media', 'r2_std', 'rmse_media', 'segundos_ajuste_completo',
+                'latencia_registro_us', 'filas_por_segundo_lote', 'parametros']
+    medidos = tabla.dropna(subset=['latencia_registro_us'])
+    print("\n🏆 Mejores candidatos (con coste de servicio):")
+    print(medidos[columnas].to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+    if args.salida:
+        tabla.to_csv(args.salida, index=False)
+        print(f"✅ Tabla completa en {args.salida}")
+    print(f"⏱️ {time.perf_counter() - inicio:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -1 +1,203 @@
-# Funciones auxiliares
\ No newline at end of file
+# Funciones auxiliares
+import functools
+import hashlib
+import json
+import logging
+import os
+import pickle
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+logger = logging.getLogger('src')
+
+
+def cache_recurso(func):
+    """
+    Decorador de caché de recursos compartidos (modelo, puntuador...).
+    Dentro de la app usa st.cache_resource; fuera de Streamlit (servicio HTTP,
+    scripts) se usa una caché en memoria del proceso y Streamlit no se importa.
+    """
+    if 'streamlit' in sys.modules:
+        import streamlit as st
+        return st.cache_resource(func)
+    return functools.lru_cache(maxsize=None)(func)
+
+
+def sha256_archivo(ruta):
+    """
+    Checksum sha256 del contenido de un archivo
+    """
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def avisar(mensaje, nivel='warning'):
+    """
+    Mostrar un aviso en la app si se está ejecutando en Streamlit, o registrarlo en el log
+    """
+    if 'streamlit' in sys.modules:
+        import streamlit as st
+        getattr(st, nivel)(mensaje)
+    else:
+        getattr(logger, nivel)(mensaje)
+
+
+class CacheDisco:
+    """
+    Caché en disco con tamaño máximo y expulsión LRU.
+    Cada entrada se guarda como un pickle binario (rápido de leer para DataFrames)
+    junto a un JSON con sus metadatos. La fecha de modificación del pickle marca
+    el último uso, y al superar `tamano_maximo` bytes se borran las menos usadas.
+    """
+
+    def __init__(self, directorio, tamano_maximo=512 * 1024 * 1024):
+        self.directorio = Path(directorio)
+        self.tamano_maximo = tamano_maximo
+        self._lock = threading.Lock()
+
+    def _rutas(self, clave):
+        nombre = hashlib.sha256(clave.encode('utf-8')).hexdigest()
+        return self.directorio / f"{nombre}.pkl", self.directorio / f"{nombre}.json"
+
+    def leer_meta(self, clave):
+        ruta_datos, ruta_meta = self._rutas(clave)
+        if not ruta_datos.exists():
+            return None
+        try:
+            with open(ruta_meta, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def leer(self, clave):
+        ruta_datos, _ = self._rutas(clave)
+        try:
+            with open(ruta_datos, 'rb') as f:
+                objeto = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        # Marcar como usada recientemente
+        try:
+            os.utime(ruta_datos)
+        except OSError:
+            pass
+        return objeto
+
+    def guardar(self, clave, objeto, meta=None):
+        ruta_datos, ruta_meta = self._rutas(clave)
+        self.directorio.mkdir(parents=True, exist_ok=True)
+
+        # Escritura atómica: archivo temporal + rename
+        temporal = ruta_datos.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(temporal, 'wb') as f:
+            pickle.dump(objeto, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporal, ruta_datos)
+        with open(ruta_meta, 'w', encoding='utf-8') as f:
+            json.dump(dict(meta or {}, clave=clave), f)
+
+        self._expulsar()
+
+    def borrar(self, clave):
+        for ruta in self._rutas(clave):
+            try:
+                ruta.unlink()
+            except OSError:
+                pass
+
+    def _expulsar(self):
+        with self._lock:
+            entradas = []
+            for ruta in self.directorio.glob('*.pkl'):
+                try:
+                    estado = ruta.stat()
+                except OSError:
+                    continue
+                entradas.append((estado.st_mtime, estado.st_size, ruta))
+
+            total = sum(tamano for _, tamano, _ in entradas)
+            # Las entradas usadas hace más tiempo se borran primero
+            for _, tamano, ruta in sorted(entradas):
+                if total <= self.tamano_maximo:
+                    break
+                for borrar in (ruta, ruta.with_suffix('.json')):
+                    try:
+                        borrar.unlink()
+                    except OSError:
+                        pass
+                total -= tamano
+
+
+def tamano_objeto(objeto):
+    """
+    Bytes aproximados que ocupa un DataFrame/Series/array (o un dict/tupla de ellos)
+    """
+    if isinstance(objeto, dict):
+        return sum(tamano_objeto(v) for v in objeto.values())
+    if isinstance(objeto, (list, tuple)):
+        return sum(tamano_objeto(v) for v in objeto)
+    if hasattr(objeto, 'memory_usage'):
+        uso = objeto.memory_usage(index=True, deep=True)
+        return int(uso.sum()) if hasattr(uso, 'sum') else int(uso)
+    if hasattr(objeto, 'nbytes'):
+        return int(objeto.nbytes)
+    return sys.getsizeof(objeto)
+
+
+class CacheMemoria:
+    """
+    Caché en memoria con tamaño máximo en bytes y expulsión LRU.
+    Vive en el proceso, así que la comparten todas las sesiones de Streamlit y
+    sobrevive a los reruns del script (a diferencia de las variables locales).
+    Los objetos se devuelven sin copiar: quien los lee no debe modificarlos.
+    """
+
+    def __init__(self, tamano_maximo=256 * 1024 * 1024):
+        self.tamano_maximo = tamano_maximo
+        self._entradas = OrderedDict()
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entradas)
+
+    @property
+    def tamano_total(self):
+        return self._total
+
+    def leer(self, clave):
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                return None
+            self._entradas.move_to_end(clave)
+            return entrada[0]
+
+    def guardar(self, clave, objeto, tamano=None):
+        """
+        Guardar `objeto`; devuelve False si por sí solo supera el tamaño máximo
+        """
+        tamano = tamano_objeto(objeto) if tamano is None else tamano
+        with self._lock:
+            anterior = self._entradas.pop(clave, None)
+            if anterior is not None:
+                self._total -= anterior[1]
+            if tamano > self.tamano_maximo:
+                return False
+            self._entradas[clave] = (objeto, tamano)
+            self._total += tamano
+            # Las entradas usadas hace más tiempo se expulsan primero
+            while self._total > self.tamano_maximo:
+                _, (_, expulsado) = self._entradas.popitem(last=False)
+                self._total -= expulsado
+            return True
+
+    def borrar(self, clave):
+        with self._lock:
+            entrada = self._entradas.pop(clave, None)
+            if entrada is not None:
+                self._total -= entrada[1]
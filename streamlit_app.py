@@ -17,7 +17,9 @@ import streamlit as st
 import pickle
 import numpy as np
 import pandas as pd
+import hashlib
 import os
+import time
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -79,8 +81,255 @@ st.markdown("""
 
 
 
-from src.model import cargar_modelo, hacer_prediccion
-from src.data import validar_datos, cargar_datos_desde_url, procesar_datos_desde_dataframe
+from src.model import (
+    cargar_modelo, cargar_predictor_agrupado, cargar_puntuador, hacer_prediccion, nombre_modelo, predecir_por_bloques,
+    puntuar_dataframe_validado, r2_modelo
+)
+from src.metrics import instantanea, metricas_activas, registrar_tiempo
+from src.export import FORMATOS, exportar_por_bloques, formatos_disponibles, nombre_archivo, tipo_mime
+from src.results import (
+    ORDEN_ASCENDENTE, ORDEN_DESCENDENTE, ORDEN_ORIGINAL, numero_paginas, obtener_pagina,
+    preparar_vista, seleccionar_filas
+)
+from src.data import (
+    CACHE_LOTES, validar_datos, cargar_datos_desde_archivo, cargar_datos_desde_url, cargar_datos_desde_url_por_bloques,
+    cargar_datos_desde_urls, describir_errores, procesar_datos_desde_dataframe, MAX_FILAS_INFORME
+)
+
+
+def mostrar_metricas():
+    """
+    Mostrar en la barra lateral los tiempos acumulados por etapa
+    """
+    datos = instantanea()
+    with st.sidebar:
+        st.header("⏱️ Métricas de rendimiento")
+        if not datos['histogramas']:
+            st.write("Aún no hay mediciones")
+            return
+        tabla = pd.DataFrame([
+            {
+                "Etapa": etapa,
+                "Llamadas": h['n'],
+                "Media (ms)": h['media_s'] * 1000,
+                "p95 (ms)": h['p95_s'] * 1000,
+                "Máx (ms)": h['max_s'] * 1000,
+            }
+            for etapa, h in datos['histogramas'].items()
+        ])
+        st.dataframe(tabla, hide_index=True)
+        if datos['valores']:
+            st.dataframe(pd.DataFrame([
+                {"Valor": nombre, "Muestras": v['n'], "Media": v['media'], "p95": v['p95'], "Máx": v['max']}
+                for nombre, v in datos['valores'].items()
+            ]), hide_index=True)
+        for nombre, valor in datos['contadores'].items():
+            st.write(f"**{nombre}:** {valor:,}")
+
+
+def texto_precision(puntuador):
+    """
+    '87.2% (R² = 0.872)', o 'sin métrica' si la versión activa no tiene R²
+    """
+    r2 = r2_modelo(puntuador)
+    return "sin métrica" if r2 is None else f"{r2 * 100:.1f}% (R² = {r2:.3f})"
+
+
+def version_puntuador(puntuador):
+    """
+    Identificador de la versión del modelo (parte de la clave de los lotes en caché)
+    """
+    return getattr(puntuador, 'version', None) or f"{nombre_modelo(puntuador)}:{id(puntuador)}"
+
+
+def informe_errores(validaciones):
+    """
+    Filas que no superaron la validación: total y detalle de las primeras MAX_FILAS_INFORME
+    """
+    total = sum(len(validacion['filas_invalidas']) for _, validacion in validaciones)
+    partes = []
+    restantes = MAX_FILAS_INFORME
+    for indice, validacion in validaciones:
+        if restantes <= 0:
+            break
+        if len(validacion['filas_invalidas']):
+            partes.append(describir_errores(validacion, indice, max_filas=restantes))
+            restantes -= len(partes[-1])
+    return {'total': total, 'detalle': pd.concat(partes, ignore_index=True) if partes else None}
+
+
+def guardar_lote(clave, df_con_predicciones, validaciones=()):
+    """
+    Guardar un lote puntuado en CACHE_LOTES y devolverlo.
+    `validaciones` son los pares (índice, validacion) de sus bloques (ver predecir_por_bloques).
+    """
+    # Primera fila válida (con predicción), para el botón de predicción del formulario
+    con_prediccion = df_con_predicciones['math_score_predicted'].notna().to_numpy()
+    primera = int(np.argmax(con_prediccion)) if con_prediccion.any() else 0
+    lote = {
+        'predicciones': df_con_predicciones,
+        'datos_desde_url': procesar_datos_desde_dataframe(df_con_predicciones.iloc[primera:primera + 1]),
+        'errores': informe_errores(validaciones),
+        # Resumen y orden por predicción, para no recalcularlos en cada rerun
+        'vista': preparar_vista(df_con_predicciones),
+    }
+    if not CACHE_LOTES.guardar(clave, lote):
+        st.warning("⚠️ El lote supera el tamaño de la caché: no se conservará entre ejecuciones")
+    return lote
+
+
+def mostrar_resultados_paginados(lote):
+    """
+    Resumen del lote y una página de filas, con orden y filtro por math_score_predicted
+    """
+    df_con_predicciones = lote['predicciones']
+    vista = lote['vista']
+    resumen = vista['resumen']
+    
+    # Estadísticas calculadas una vez al guardar el lote
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("📄 Filas", f"{resumen['filas']:,}")
+    if resumen['validas']:
+        col2.metric("📊 Media", f"{resumen['media']:.2f}")
+        col3.metric("⬇️ Mínimo", f"{resumen['minimo']:.2f}")
+        col4.metric("⬆️ Máximo", f"{resumen['maximo']:.2f}")
+        st.bar_chart(resumen['histograma'], x='rango', y='filas', height=180)
+        st.caption("Percentiles: " + " · ".join(f"{k} = {v:.2f}" for k, v in resumen['percentiles'].items()))
+    
+    # Controles de la vista (el trabajo se hace en el servidor)
+    col1, col2, col3 = st.columns([2, 3, 1])
+    with col1:
+        etiquetas = {ORDEN_ORIGINAL: "Orden original", ORDEN_ASCENDENTE: "Menor a mayor", ORDEN_DESCENDENTE: "Mayor a menor"}
+        orden = st.selectbox(
+            "↕️ Ordenar por predicción",
+            options=list(etiquetas),
+            format_func=etiquetas.get,
+            key='vista_orden'
+        )
+    with col2:
+        minimo, maximo = st.slider(
+            "🎯 Filtrar por math_score_predicted", min_value=0.0, max_value=100.0,
+            value=(0.0, 100.0), step=0.5, key='vista_rango'
+        )
+    with col3:
+        tamano_pagina = st.selectbox("Filas por página", options=[25, 50, 100, 500], index=1, key='vista_tamano')
+    
+    # Con el rango completo no se filtra (se incluyen también las filas sin predicción)
+    if (minimo, maximo) == (0.0, 100.0):
+        minimo = maximo = None
+    posiciones = seleccionar_filas(df_con_predicciones, vista, orden, minimo, maximo)
+    total = len(df_con_predicciones) if posiciones is None else len(posiciones)
+    paginas = numero_paginas(total, tamano_pagina)
+    pagina = st.number_input(f"Página (de {paginas:,})", min_value=1, max_value=paginas,
+                             value=min(st.session_state.get('vista_pagina', 1), paginas), step=1)
+    st.session_state['vista_pagina'] = pagina
+    
+    st.dataframe(obtener_pagina(df_con_predicciones, posiciones, pagina, tamano_pagina))
+    st.info(f"📈 {total:,} de {len(df_con_predicciones):,} filas, {len(df_con_predicciones.columns)} columnas (incluyendo math_score_predicted)")
+
+
+def version_streamlit():
+    """
+    '1.52.0' -> (1, 52); (0, 0) si la versión no se puede interpretar
+    """
+    partes = st.__version__.split('.')[:2]
+    try:
+        return tuple(int(parte) for parte in partes)
+    except ValueError:
+        return (0, 0)
+
+
+# Desde Streamlit 1.52 download_button acepta una función en `data` y solo la
+# ejecuta al pulsar; en las anteriores el archivo se prepara con un botón previo
+DESCARGA_DIFERIDA = version_streamlit() >= (1, 52)
+
+
+def mostrar_descarga(df_con_predicciones):
+    """
+    Botón de descarga del lote en CSV, Parquet o Arrow (con gzip opcional)
+    """
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        formato = st.selectbox(
+            "💾 Formato de descarga", options=formatos_disponibles(),
+            format_func=lambda f: FORMATOS[f]['nombre'], key='descarga_formato'
+        )
+    with col2:
+        comprimir = st.checkbox("Comprimir (gzip)", value=False, key='descarga_gzip')
+    
+    nombre = nombre_archivo("datos_con_predicciones_math_score", formato, comprimir)
+    opciones = {
+        'label': f"📥 Descargar DataFrame con predicciones ({FORMATOS[formato]['nombre']})",
+        'file_name': nombre,
+        'mime': tipo_mime(formato, comprimir),
+        'help': "Descarga el DataFrame completo con las predicciones de math_score",
+    }
+    
+    def generar():
+        return b''.join(exportar_por_bloques(df_con_predicciones, formato, comprimir))
+    
+    if DESCARGA_DIFERIDA:
+        st.download_button(data=generar, on_click='ignore', **opciones)
+        return
+    
+    clave = (st.session_state.get('clave_lote'), formato, comprimir)
+    preparado = st.session_state.get('descarga_preparada')
+    if preparado is None or preparado[0] != clave:
+        if not st.button(f"⚙️ Preparar {nombre}"):
+            return
+        with st.spinner("Generando archivo..."):
+            preparado = (clave, generar())
+        st.session_state['descarga_preparada'] = preparado
+    st.download_button(data=preparado[1], **opciones)
+
+
+def puntuar_lote(clave, df, puntuador):
+    """
+    Lote puntuado para `clave`: el de CACHE_LOTES si ya existe o uno nuevo
+    """
+    lote = CACHE_LOTES.leer(clave)
+    if lote is not None:
+        st.info("♻️ Mismo contenido y modelo: se reutilizan las predicciones anteriores")
+        return lote
+    # Hacer predicciones para todas las filas
+    with st.spinner("🔮 Generando predicciones para todas las filas..."):
+        # Procesar, validar y predecir todo el lote de una vez
+        df_con_predicciones, validacion = puntuar_dataframe_validado(df, puntuador)
+        return guardar_lote(clave, df_con_predicciones, [(df_con_predicciones.index, validacion)])
+
+
+def activar_lote(clave, lote):
+    """
+    Recordar en la sesión el lote cargado (URL o archivo)
+    """
+    st.info(f"📊 Se cargaron {len(lote['predicciones'])} filas de datos")
+    st.session_state['clave_lote'] = clave
+    st.session_state['datos_desde_url'] = lote['datos_desde_url']
+
+
+def recuperar_lote(puntuador, version_modelo):
+    """
+    Lote cargado (URL o archivo) guardado en la sesión (None si no hay) y sus datos para el formulario.
+    Si el modelo cambió de versión desde la carga, se vuelve a puntuar sin descargar.
+    """
+    clave = st.session_state.get('clave_lote')
+    datos_desde_url = st.session_state.get('datos_desde_url')
+    if clave is None:
+        return None, datos_desde_url
+    lote = CACHE_LOTES.leer(clave)
+    if lote is None:
+        # Expulsado por tamaño: se conservan solo los datos de la primera fila
+        st.session_state.pop('clave_lote', None)
+        st.warning("⚠️ Los datos cargados salieron de la caché; vuelve a cargarlos para ver las predicciones")
+        return None, datos_desde_url
+    if clave[2] != version_modelo:
+        df = lote['predicciones'].drop(columns=['math_score_predicted'])
+        clave = (clave[0], clave[1], version_modelo)
+        df_con_predicciones, validacion = puntuar_dataframe_validado(df, puntuador)
+        lote = guardar_lote(clave, df_con_predicciones, [(df_con_predicciones.index, validacion)])
+        st.session_state['clave_lote'] = clave
+        st.info("🔄 El modelo cambió de versión: predicciones recalculadas")
+    return lote, datos_desde_url
 
 
 # Función principal de la aplicación Streamlit
@@ -95,12 +344,26 @@ def main():
         st.error("❌ No se pudo cargar el modelo. Por favor, verifica que el archivo del modelo esté disponible.")
         return
     
+    # Versión compilada del modelo para predecir (cae al modelo original si no es lineal).
+    # Con USAR_TABLA_PUNTUACIONES=1 se responde desde la tabla precalculada.
+    usar_tabla = os.environ.get('USAR_TABLA_PUNTUACIONES') == '1'
+    puntuador = cargar_puntuador(usar_tabla=usar_tabla)
+    
+    # Las predicciones del formulario de todas las sesiones se agrupan en llamadas
+    # matriciales al mismo puntuador (AGRUPAR_PREDICCIONES=0 para desactivarlo)
+    if os.environ.get('AGRUPAR_PREDICCIONES', '1') != '0':
+        predictor = cargar_predictor_agrupado(usar_tabla=usar_tabla)
+    else:
+        predictor = puntuador
+    
     # Sidebar con información del modelo
     with st.sidebar:
         st.header("ℹ️ Información del Modelo")
-        st.info(f"**Tipo:** {type(modelo).__name__}")
-        st.info(f"**Ruta:** {ruta_modelo}")
-        st.info("**Precisión:** 87.2% (R² = 0.872)")
+        st.info(f"**Tipo:** {nombre_modelo(puntuador)}")
+        st.info(f"**Ruta:** {getattr(puntuador, 'ruta', ruta_modelo)}")
+        if getattr(puntuador, 'version', None):
+            st.info(f"**Versión:** {puntuador.version}")
+        st.info(f"**Precisión:** {texto_precision(puntuador)}")
         
         st.header("📋 Variables del Modelo")
         variables = [
@@ -117,62 +380,123 @@ def main():
     
     # Opción para cargar datos desde URL
     st.subheader("🌐 Cargar datos desde URL (Opcional)")
-    url_datos = st.text_input(
-        "🔗 URL del archivo CSV",
+    texto_urls = st.text_area(
+        "🔗 URL(s) de archivos CSV (una por línea)",
         placeholder="https://raw.githubusercontent.com/.../datos.csv",
-        help="Ingresa la URL de un archivo CSV con los datos del estudiante. Solo se permiten archivos .csv"
+        help="Ingresa la URL de un archivo CSV con los datos del estudiante, o varias (una por línea) "
+             "para descargarlas a la vez y puntuarlas juntas. Solo se permiten archivos .csv"
+    )
+    urls = [linea.strip() for linea in texto_urls.splitlines() if linea.strip()]
+    url_datos = urls[0] if len(urls) == 1 else None
+    
+    modo_streaming = st.checkbox(
+        "⚡ Procesar en streaming (por bloques)",
+        value=False,
+        disabled=len(urls) > 1,
+        help="Descarga y puntúa el CSV por bloques mientras llega, útil para archivos grandes (solo con una URL)"
     )
     
-    # Botón para cargar datos desde URL
-    datos_desde_url = None
-    df_con_predicciones = None
-    if st.button("📥 Cargar datos desde URL", disabled=not url_datos):
+    # Los datos de la URL se guardan en CACHE_LOTES y la sesión solo recuerda su clave:
+    # así sobreviven a los reruns que provoca cualquier widget
+    version_modelo = version_puntuador(puntuador)
+    if st.button("📥 Cargar datos desde URL", disabled=not urls):
+        inicio_carga = time.perf_counter()
         try:
             with st.spinner("Cargando datos desde URL..."):
-                df, mensaje = cargar_datos_desde_url(url_datos)
-                datos_desde_url = procesar_datos_desde_dataframe(df)
-                st.success(f"✅ {mensaje}")
-                st.info(f"📊 Se cargaron {len(df)} filas de datos")
-                
-                # Hacer predicciones para todas las filas
-                with st.spinner("🔮 Generando predicciones para todas las filas..."):
-                    predicciones = []
-                    for i in range(len(df)):
-                        # Procesar cada fila individualmente
-                        fila_df = df.iloc[[i]]  # DataFrame con una sola fila
-                        datos_fila = procesar_datos_desde_dataframe(fila_df)
-                        datos_validados, _ = validar_datos(datos_fila)
-                        resultado = hacer_prediccion(datos_validados, modelo)
-                        predicciones.append(resultado['math_score'])
+                if len(urls) > 1:
+                    # Descargas simultáneas; el progreso se actualiza desde este hilo
+                    progreso = st.progress(0.0, text=f"⏳ 0 de {len(urls)} URLs descargadas")
                     
-                    # Crear DataFrame con predicciones
-                    df_con_predicciones = df.copy()
-                    df_con_predicciones['math_score_predicted'] = predicciones
-                
-                st.success(f"🎯 Predicciones generadas para {len(predicciones)} filas")
-                
-                # Mostrar preview de los datos cargados
-                with st.expander("👁️ Ver datos cargados originales"):
-                    st.dataframe(df.head())
-                
-                # Mostrar DataFrame con predicciones
-                with st.expander("🔮 Ver datos con predicciones de math_score"):
-                    st.dataframe(df_con_predicciones)
-                    st.info(f"📈 DataFrame con {len(df_con_predicciones)} filas y {len(df_con_predicciones.columns)} columnas (incluyendo math_score_predicted)")
+                    def al_completar(url, completadas, total, error):
+                        progreso.progress(completadas / total, text=f"⏳ {completadas} de {total} URLs descargadas")
+                        if error:
+                            st.warning(f"⚠️ {url}: {error}")
                     
-                    # Botón para descargar el DataFrame con predicciones
-                    csv_data = df_con_predicciones.to_csv(index=False)
-                    st.download_button(
-                        label="📥 Descargar DataFrame con predicciones (CSV)",
-                        data=csv_data,
-                        file_name="datos_con_predicciones_math_score.csv",
-                        mime="text/csv",
-                        help="Descarga el DataFrame completo con las predicciones de math_score"
-                    )
+                    df, errores, mensaje = cargar_datos_desde_urls(urls, al_completar=al_completar)
+                    progreso.empty()
+                    st.success(f"✅ {mensaje}")
+                    clave = ("\n".join(urls), df.attrs['sha256'], version_modelo)
+                    lote = puntuar_lote(clave, df, puntuador)
+                elif modo_streaming:
+                    # Ir puntuando cada bloque a medida que se descarga
+                    progreso = st.empty()
+                    bloques_puntuados = []
+                    filas_procesadas = 0
+                    huella = hashlib.sha256()
+                    bloques = cargar_datos_desde_url_por_bloques(url_datos, huella=huella)
+                    validaciones = []
+                    for bloque in predecir_por_bloques(bloques, puntuador, validaciones):
+                        if not bloques_puntuados:
+                            st.dataframe(bloque.head())
+                        bloques_puntuados.append(bloque)
+                        filas_procesadas += len(bloque)
+                        progreso.info(f"⏳ {filas_procesadas} filas puntuadas hasta ahora...")
+                    
+                    if not bloques_puntuados:
+                        raise ValueError("El archivo CSV está vacío o no contiene datos válidos")
+                    df_con_predicciones = pd.concat(bloques_puntuados, ignore_index=True)
+                    progreso.empty()
+                    clave = (url_datos, huella.hexdigest(), version_modelo)
+                    lote = guardar_lote(clave, df_con_predicciones, validaciones)
+                    st.success(f"✅ Datos CSV cargados en streaming desde: {url_datos}")
+                else:
+                    df, mensaje = cargar_datos_desde_url(url_datos)
+                    st.success(f"✅ {mensaje}")
+                    clave = (url_datos, df.attrs.get('sha256'), version_modelo)
+                    lote = puntuar_lote(clave, df, puntuador)
+                
+                registrar_tiempo('carga_url_total', time.perf_counter() - inicio_carga)
+                activar_lote(clave, lote)
                     
         except Exception as e:
             st.error(f"❌ Error al cargar datos: {str(e)}")
     
+    # Archivos locales: siguen el mismo camino de puntuación por lotes que la URL
+    archivo_local = st.file_uploader(
+        "📂 O sube un archivo local",
+        type=['csv', 'gz', 'parquet', 'pq'],
+        help="CSV, CSV comprimido con gzip (.csv.gz) o Parquet (necesita pyarrow)"
+    )
+    if st.button("📥 Cargar archivo", disabled=archivo_local is None):
+        inicio_carga = time.perf_counter()
+        try:
+            with st.spinner("Cargando archivo..."):
+                df, mensaje = cargar_datos_desde_archivo(archivo_local)
+                st.success(f"✅ {mensaje}")
+                clave = (f"archivo:{archivo_local.name}", df.attrs['sha256'], version_modelo)
+                lote = puntuar_lote(clave, df, puntuador)
+                registrar_tiempo('carga_archivo_total', time.perf_counter() - inicio_carga)
+                activar_lote(clave, lote)
+        except Exception as e:
+            st.error(f"❌ Error al cargar el archivo: {str(e)}")
+    
+    lote, datos_desde_url = recuperar_lote(puntuador, version_modelo)
+    if lote is not None:
+        df_con_predicciones = lote['predicciones']
+        st.success(f"🎯 Predicciones generadas para {len(df_con_predicciones)} filas")
+        errores = lote['errores']
+        if errores['total']:
+            st.warning(f"⚠️ {errores['total']} filas no superaron la validación y quedaron sin predicción")
+            with st.expander("🚫 Ver filas no válidas"):
+                if errores['total'] > len(errores['detalle']):
+                    st.caption(f"Se muestran las primeras {len(errores['detalle'])}")
+                st.dataframe(errores['detalle'], hide_index=True)
+        
+        # Mostrar preview de los datos cargados
+        with st.expander("👁️ Ver datos cargados originales"):
+            st.dataframe(df_con_predicciones.head().drop(columns=['math_score_predicted']))
+        
+        # Mostrar las predicciones por páginas: solo la página visible llega al navegador
+        with st.expander("🔮 Ver datos con predicciones de math_score"):
+            mostrar_resultados_paginados(lote)
+            
+            # Descarga: el archivo solo se genera en el formato elegido y cuando se pide
+            mostrar_descarga(df_con_predicciones)
+    if datos_desde_url is not None and st.button("🗑️ Descartar datos cargados"):
+        for clave in ('clave_lote', 'datos_desde_url', 'descarga_preparada'):
+            st.session_state.pop(clave, None)
+        st.rerun()
+    
     st.markdown("---")
     st.subheader("✏️ Ingresar datos manualmente")
     
@@ -238,6 +562,7 @@ def main():
     
     # Botón de predicción
     if st.button("🔮 Predecir Calificación Matemática", type="primary"):
+        inicio_prediccion = time.perf_counter()
         try:
             # Usar datos desde URL si están disponibles, sino usar datos del formulario
             if datos_desde_url is not None:
@@ -266,7 +591,8 @@ def main():
             datos_validados, df_validado = validar_datos(datos)
             
             # Hacer predicción
-            resultado_prediccion = hacer_prediccion(datos_validados, modelo)
+            resultado_prediccion = hacer_prediccion(datos_validados, predictor)
+            registrar_tiempo('prediccion_formulario_total', time.perf_counter() - inicio_prediccion)
             
             # Mostrar resultados
             st.markdown('<div class="prediction-box">', unsafe_allow_html=True)
@@ -285,7 +611,8 @@ def main():
             with col2:
                 st.metric(
                     label="🎯 Confianza del Modelo",
-                    value=f"{resultado_prediccion['confidence']*100:.1f}%",
+                    value=("sin métrica" if resultado_prediccion['confidence'] is None
+                           else f"{resultado_prediccion['confidence']*100:.1f}%"),
                     delta=None
                 )
             
@@ -338,6 +665,10 @@ def main():
         except Exception as e:
             st.error(f"❌ Error al realizar la predicción: {str(e)}")
     
+    # Tiempos por etapa (solo con METRICAS=1); se pinta al final para incluir esta ejecución
+    if metricas_activas():
+        mostrar_metricas()
+    
     # Información adicional en la parte inferior
     st.markdown("---")
     st.subheader("ℹ️ Información del Modelo")
@@ -345,10 +676,10 @@ def main():
     col1, col2 = st.columns(2)
     
     with col1:
-        st.info("""
+        st.info(f"""
         **Características del Modelo:**
         - Tipo: Regresión Lineal Optimizada
-        - Precisión: 87.2% (R² = 0.872)
+        - Precisión: {texto_precision(puntuador)}
         - Variables de entrada: 7
         - Escala de calificaciones: 0-100
         """)